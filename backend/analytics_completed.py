@@ -1,10 +1,21 @@
 # -*- coding: utf-8 -*-
-"""已结案工单统计分析（学校后勤场景）。"""
+"""已结案工单统计分析（学校后勤场景）。
+
+违规细分与事故标记在工单结案（状态变为 resolved/closed）时计算一次并写入 tickets 表，
+统计时在 SQL 中 GROUP BY 汇总，不再逐条加载工单。统计接口只读：绕过 ORM 写入、尚未补算的
+已结案工单在统计时按关键词临时分类，存量数据补算：
+
+执行方式：
+    cd backend
+    python analytics_completed.py backfill
+"""
 from __future__ import annotations
 
+import argparse
 from collections import Counter
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Type
 
+from sqlalchemy import event, func, inspect
 from sqlalchemy.orm import Session
 
 
@@ -35,15 +46,72 @@ def _is_accident(event_type: str, description: str) -> bool:
     return any(w in text for w in accident_words)
 
 
+COMPLETED_STATUSES = ("resolved", "closed")
+UNKNOWN_LOCATION = "未填写/未识别校内位置"
+
+_models: Dict[str, Any] = {}
+
+
+def install(session_cls: Type[Session], ticket_model) -> None:
+    """注册 before_flush 钩子：工单结案或结案后修改类型/描述时写入违规细分与事故标记。"""
+    _models["ticket"] = ticket_model
+    event.listen(session_cls, "before_flush", _before_flush)
+
+
+def classify_ticket(ticket) -> None:
+    et = _as_text(ticket.event_type) or "未分类"
+    desc = _as_text(ticket.description)
+    ticket.violation_category = _classify_violation(et, desc)
+    ticket.is_accident = _is_accident(et, desc)
+
+
+def _before_flush(session: Session, flush_context, instances) -> None:
+    Ticket = _models["ticket"]
+    for obj in session.new:
+        if isinstance(obj, Ticket) and obj.status in COMPLETED_STATUSES:
+            classify_ticket(obj)
+    for obj in session.dirty:
+        if not isinstance(obj, Ticket) or obj.status not in COMPLETED_STATUSES:
+            continue
+        attrs = inspect(obj).attrs
+        if obj.violation_category is None or any(
+            attrs[name].history.has_changes() for name in ("status", "event_type", "description")
+        ):
+            classify_ticket(obj)
+
+
+def backfill(db: Session, batch_size: int = 500) -> int:
+    """补算尚未分类的已结案工单（按 id 分批提交），返回处理条数。"""
+    Ticket = _models["ticket"]
+    done = 0
+    last_id = 0
+    while True:
+        batch = (
+            db.query(Ticket)
+            .filter(
+                Ticket.status.in_(COMPLETED_STATUSES),
+                Ticket.violation_category.is_(None),
+                Ticket.id > last_id,
+            )
+            .order_by(Ticket.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            return done
+        for t in batch:
+            classify_ticket(t)
+        last_id = batch[-1].id
+        done += len(batch)
+        db.commit()
+
+
 def build_completed_tickets_analytics(db: Session) -> Dict[str, Any]:
     from app import Ticket as TModel
 
-    tickets = (
-        db.query(TModel)
-        .filter(TModel.status.in_(["resolved", "closed"]))
-        .all()
-    )
-    total = len(tickets)
+    completed = TModel.status.in_(COMPLETED_STATUSES)
+    classified = TModel.violation_category.isnot(None)
+    total = db.query(func.count(TModel.id)).filter(completed).scalar() or 0
     if total == 0:
         return {
             "total_completed": 0,
@@ -57,29 +125,51 @@ def build_completed_tickets_analytics(db: Session) -> Dict[str, Any]:
             ],
         }
 
-    type_counter: Counter = Counter()
-    violation_counter: Counter = Counter()
-    loc_counter: Counter = Counter()
-    accident_loc_counter: Counter = Counter()
-    dept_counter: Counter = Counter()
+    type_col = func.coalesce(func.nullif(func.trim(TModel.event_type), ""), "未分类")
+    loc_col = func.coalesce(
+        func.nullif(func.substr(func.trim(TModel.location), 1, 100), ""), UNKNOWN_LOCATION
+    )
+    n = func.count(TModel.id)
+
+    def grouped(col, *criteria, limit=None):
+        q = (
+            db.query(col, n)
+            .filter(completed, *criteria)
+            .group_by(col)
+            .order_by(n.desc(), col)
+        )
+        return q.limit(limit).all() if limit else q.all()
 
-    for t in tickets:
-        et = _as_text(t.event_type) or "未分类"
-        desc = _as_text(t.description)
-        type_counter[et] += 1
+    # 绕过 ORM 写入的工单（批量导入、手工改库）尚未分类：只读取这部分，在内存中分类，不写库
+    unclassified = (
+        db.query(TModel.event_type, TModel.description, loc_col)
+        .filter(completed, TModel.violation_category.is_(None))
+        .all()
+    )
+
+    type_counter = Counter(dict(grouped(type_col)))
+    violation_counter = Counter(dict(grouped(TModel.violation_category, classified)))
+    loc_counter = Counter(dict(grouped(loc_col, limit=20)))
+    accident_loc_counter = Counter(dict(grouped(
+        loc_col, classified, TModel.is_accident.is_(True), limit=None if unclassified else 10
+    )))
+    for event_type, description, location in unclassified:
+        et = _as_text(event_type) or "未分类"
+        desc = _as_text(description)
         violation_counter[_classify_violation(et, desc)] += 1
-        loc = _as_text(t.location)
-        loc_key = loc[:100] if loc else "未填写/未识别校内位置"
-        loc_counter[loc_key] += 1
         if _is_accident(et, desc):
-            accident_loc_counter[loc_key] += 1
-        if t.assigned_department:
-            du = f"{t.assigned_department}"
-            if t.assigned_unit:
-                du += f" · {t.assigned_unit}"
-            dept_counter[du] += 1
+            accident_loc_counter[location] += 1
+
+    dept_counter: Counter = Counter()
+    for dept, unit, count in (
+        db.query(TModel.assigned_department, TModel.assigned_unit, n)
+        .filter(completed)
+        .group_by(TModel.assigned_department, TModel.assigned_unit)
+    ):
+        if dept:
+            dept_counter[f"{dept} · {unit}" if unit else f"{dept}"] += count
         else:
-            dept_counter["未指派部门"] += 1
+            dept_counter["未指派部门"] += count
 
     by_type: List[Dict[str, Any]] = [
         {"event_type": k, "count": v, "ratio": round(v / total, 4)}
@@ -151,3 +241,26 @@ def build_completed_tickets_analytics(db: Session) -> Dict[str, Any]:
         "by_department": by_department,
         "suggestions": suggestions,
     }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="已结案工单分析：违规细分与事故标记")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_backfill = sub.add_parser("backfill", help="补算存量已结案工单")
+    p_backfill.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    from app import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print(f"已补算 {backfill(db, batch_size=args.batch_size)} 条已结案工单")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
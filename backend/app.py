@@ -2,47 +2,78 @@
 """
 基于多模态大模型的学校后勤事件协同平台 - 后端API
 """
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends, Request, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, Enum as SQLEnum, DECIMAL, JSON
+from fastapi.responses import Response, FileResponse, StreamingResponse, RedirectResponse
+from sqlalchemy import create_engine, Column, Integer, BigInteger, Boolean, String, Text, DateTime, ForeignKey, Index, Enum as SQLEnum, DECIMAL, JSON
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session, relationship
-from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker, Session, relationship, selectinload, joinedload, contains_eager
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
 from dotenv import load_dotenv
 from pathlib import Path
-from typing import Optional, List
+from typing import Callable, Optional, List, Tuple
+from email.utils import format_datetime
 import base64
 import logging
 import json
-import uuid
 from model_providers import create_provider, ModelProvider
 from auth import (
-    get_password_hash, verify_password, create_access_token,
+    get_password_hash_async, verify_password_async, create_access_token,
     get_current_user, get_current_public_user, get_current_admin_user,
     get_current_staff_user,
 )
 from event_recognition import recognize_event_with_model, auto_review_report
 from local_yolo_detector import has_local_models, recognize_with_local_pt
+from image_derivatives import (
+    ensure_derivative, generate_derivatives_many, thumbnail_paths, derivative_path, derivative_source,
+)
 from object_storage import (
     init_storage,
-    save_upload,
+    save_upload_stream,
     read_upload,
+    stat_upload,
+    iter_upload,
     public_upload_url_path,
     suffix_and_mime,
     UPLOAD_DIR,
     using_minio,
+    StoredUpload,
+    UploadTooLarge,
+    cache_stats,
+    set_key_resolver,
+    presigned_enabled,
+    presigned_upload_url,
+    delete_upload,
 )
+from blob_store import register_upload, resolve_blob_key
+from db_metrics import install as install_db_metrics, pool_stats, track_queries
+from pagination import paginate
+from compression import ENABLED as COMPRESSION_ENABLED, CompressionMiddleware
+from serializers import FastJSONResponse, RowSerializer, dumps
+from chat_history import SUMMARY_WITH_MODEL, fold_summary, load_window, model_summarizer
+import stats_rollup
+import trends
+import search
+import list_views
+import etags
+import dispatch_rules
+from log_config import HOT, configure_logging
+from analytics_completed import install as install_completed_analytics, build_completed_tickets_analytics
 
-# 配置日志（需要在其他配置之前）
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # 加载环境变量文件（明确指定 env 文件路径）
 BASE_DIR = Path(__file__).parent
 env_path = BASE_DIR / "env"
 load_dotenv(env_path, override=True)  # override=True 确保覆盖已有环境变量
+# 队列日志管线（级别、格式、SQL 输出按 APP_ENV 配置，见 log_config）
+configure_logging()
 logger.info(f"加载环境变量文件: {env_path}")
 if env_path.exists():
     logger.info(f"环境变量文件存在，文件大小: {env_path.stat().st_size} 字节")
@@ -79,6 +110,10 @@ LOCAL_PT_MODEL_FILES = [
     if item.strip()
 ]
 LOCAL_PT_CONF = float(os.getenv("LOCAL_PT_CONF", "0.25"))
+# 智能初审置信度阈值（调整后可用 rereview.py 对存量人工复核举报批量重审）
+AUTO_REVIEW_THRESHOLD = float(os.getenv("AUTO_REVIEW_THRESHOLD", "0.6"))
+# 同时写入对象存储的上传数（多图举报并发上传）
+UPLOAD_CONCURRENCY = max(int(os.getenv("UPLOAD_CONCURRENCY", "4")), 1)
 
 # 初始化模型提供者
 model_provider = None
@@ -91,9 +126,47 @@ except Exception as e:
     model_provider = None
     logger.warning("模型提供者为 None，后续调用将失败")
 
+# 异步引擎 URL：默认由 DATABASE_URL 换成对应的异步驱动（aiomysql / aiosqlite）
+def _async_database_url(url: str) -> str:
+    for sync_prefix, async_prefix in (
+        ("mysql+pymysql://", "mysql+aiomysql://"),
+        ("mysql://", "mysql+aiomysql://"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+    ):
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_database_url(DATABASE_URL)
+
+
+# 连接池配置（同步、异步引擎各自一套池，参数相同；SQLite 不适用）
+def _pool_options(url: str) -> dict:
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": True,
+    }
+
+
+class AppSession(Session):
+    """同步会话与异步会话（AsyncSession 内部）共用的 Session 类，写入钩子注册在此类上。"""
+
+
 # 数据库设置
-engine = create_engine(DATABASE_URL, echo=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+engine = create_engine(DATABASE_URL, **_pool_options(DATABASE_URL))
+install_db_metrics(engine, "sync")
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=AppSession)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_pool_options(ASYNC_DATABASE_URL))
+install_db_metrics(async_engine.sync_engine, "async")
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False, sync_session_class=AppSession
+)
 Base = declarative_base()
 
 
@@ -103,6 +176,9 @@ class ChatSession(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=True)
+    # 滚动摘要：id <= summary_upto_id 的消息已并入 summary（见 chat_history）
+    summary = Column(Text, nullable=True)
+    summary_upto_id = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     messages = relationship("Message", back_populates="session", cascade="all, delete-orphan")
@@ -137,6 +213,13 @@ class User(Base):
 
 class Report(Base):
     __tablename__ = "reports"
+    __table_args__ = (
+        # 列表按状态筛选 + 时间倒序（游标分页）
+        Index("idx_reports_status_created", "status", "created_at"),
+        # 全文检索（MySQL ngram 分词；其他数据库使用 search_terms 倒排索引）
+        Index("ft_reports_text", "description", "location",
+              mysql_prefix="FULLTEXT", mysql_with_parser="ngram").ddl_if(dialect="mysql"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
@@ -165,12 +248,18 @@ class ReportImage(Base):
     report_id = Column(Integer, ForeignKey("reports.id"), nullable=False, index=True)
     image_url = Column(String(500), nullable=False)
     image_order = Column(Integer, nullable=False, default=0)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     report = relationship("Report", back_populates="images")
 
 
 class Ticket(Base):
     __tablename__ = "tickets"
+    __table_args__ = (
+        Index("idx_tickets_status_created", "status", "created_at"),
+        Index("idx_tickets_status_violation", "status", "violation_category"),
+        Index("ft_tickets_text", "description", "location",
+              mysql_prefix="FULLTEXT", mysql_with_parser="ngram").ddl_if(dialect="mysql"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     report_id = Column(Integer, ForeignKey("reports.id"), nullable=False, unique=True, index=True)
@@ -187,6 +276,9 @@ class Ticket(Base):
     unit_code = Column(String(64), nullable=True)
     priority = Column(SQLEnum('low', 'medium', 'high', 'urgent', name='ticket_priority'),
                       nullable=False, default='medium')
+    # 结案时由 analytics_completed 计算写入
+    violation_category = Column(String(50), nullable=True)
+    is_accident = Column(Boolean, nullable=False, default=False)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     report = relationship("Report", back_populates="ticket")
@@ -195,6 +287,10 @@ class Ticket(Base):
 
 class ModelRecognitionResult(Base):
     __tablename__ = "model_recognition_results"
+    __table_args__ = (
+        Index("ft_recognition_answer", "answer",
+              mysql_prefix="FULLTEXT", mysql_with_parser="ngram").ddl_if(dialect="mysql"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     report_id = Column(Integer, ForeignKey("reports.id"), nullable=False, index=True)
@@ -235,11 +331,156 @@ class TicketRecord(Base):
     ticket = relationship("Ticket", back_populates="records")
 
 
+class UploadBlob(Base):
+    """内容寻址存储的对象（按 SHA-256 去重），ref_count 为引用它的库中路径数。"""
+    __tablename__ = "upload_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    object_key = Column(String(500), nullable=False, unique=True)
+    size = Column(BigInteger, nullable=False, default=0)
+    content_type = Column(String(100), nullable=True)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class UploadRef(Base):
+    """库中路径（ReportImage.image_url、Message.image_url 等）-> 内容寻址对象。"""
+    __tablename__ = "upload_refs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    image_url = Column(String(500), nullable=False, unique=True, index=True)
+    blob_sha256 = Column(String(64), ForeignKey("upload_blobs.sha256"), nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class StatCounter(Base):
+    """管理端统计计数汇总（由 stats_rollup 在写入举报/工单时同事务维护）。"""
+    __tablename__ = "stat_counters"
+
+    scope = Column(String(32), primary_key=True)
+    name = Column(String(100), primary_key=True, default="")
+    value = Column(BigInteger, nullable=False, default=0)
+
+
+class TrendBucket(Base):
+    """趋势预聚合：按小时/天、指标、维度值计数（由 trends 在写入举报/工单时同事务维护）。"""
+    __tablename__ = "trend_buckets"
+
+    granularity = Column(String(8), primary_key=True)
+    metric = Column(String(16), primary_key=True)
+    dimension = Column(String(16), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    value = Column(String(100), primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+
+
+class SearchTerm(Base):
+    """全文检索二字倒排索引（仅非 MySQL 环境使用，见 search）。"""
+    __tablename__ = "search_terms"
+    __table_args__ = (
+        Index("idx_search_terms_doc", "doc_type", "doc_id"),
+    )
+
+    doc_type = Column(String(8), primary_key=True)
+    term = Column(String(8), primary_key=True)
+    doc_id = Column(Integer, primary_key=True)
+
+
+class ReportListItem(Base):
+    """管理端举报列表投影：列表接口返回的全部字段（由 list_views 随写入同事务维护）。"""
+    __tablename__ = "report_list_items"
+    __table_args__ = (
+        Index("idx_report_list_status_created", "status", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    username = Column(String(50), nullable=True)
+    event_type = Column(String(100), nullable=True)
+    location = Column(String(255), nullable=True)
+    description = Column(Text, nullable=True)
+    status = Column(String(32), nullable=False)
+    images = Column(JSON, nullable=True)
+    recognition_results = Column(JSON, nullable=True)
+    auto_review_result = Column(String(50), nullable=True)
+    auto_review_confidence = Column(DECIMAL(5, 2), nullable=True)
+    created_at = Column(DateTime, nullable=True, index=True)
+
+
+class TicketListItem(Base):
+    """管理端工单列表投影（由 list_views 随写入同事务维护）。"""
+    __tablename__ = "ticket_list_items"
+    __table_args__ = (
+        Index("idx_ticket_list_status_created", "status", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    ticket_no = Column(String(50), nullable=False)
+    report_id = Column(Integer, nullable=False)
+    event_type = Column(String(100), nullable=True)
+    location = Column(String(255), nullable=True)
+    description = Column(Text, nullable=True)
+    status = Column(String(32), nullable=False)
+    priority = Column(String(16), nullable=True)
+    assigned_to = Column(Integer, nullable=True)
+    assigned_department = Column(String(200), nullable=True)
+    assigned_unit = Column(String(200), nullable=True)
+    department_code = Column(String(64), nullable=True)
+    unit_code = Column(String(64), nullable=True)
+    images = Column(JSON, nullable=True)
+    created_at = Column(DateTime, nullable=True, index=True)
+    updated_at = Column(DateTime, nullable=True)
+
+
+class DispatchRule(Base):
+    """工单指派规则（由 dispatch_rules 编译为进程内索引，修改后各进程自动重新加载）。"""
+    __tablename__ = "dispatch_rules"
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String(100), nullable=True)
+    match_mode = Column(String(16), nullable=False, default="exact")
+    location_pattern = Column(String(255), nullable=True)
+    start_minute = Column(Integer, nullable=True)
+    end_minute = Column(Integer, nullable=True)
+    weekdays = Column(String(7), nullable=True)
+    department_code = Column(String(64), nullable=False)
+    unit_code = Column(String(64), nullable=False)
+    priority = Column(Integer, nullable=False, default=0)
+    enabled = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class DataVersion(Base):
+    """数据变更计数（由 etags 在写入时同事务加一），用于管理端读接口的 ETag。"""
+    __tablename__ = "data_versions"
+
+    name = Column(String(32), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+
 # 创建表
 Base.metadata.create_all(bind=engine)
+set_key_resolver(resolve_blob_key)
+stats_rollup.install(AppSession, StatCounter, Report, Ticket)
+install_completed_analytics(AppSession, Ticket)
+trends.install(AppSession, TrendBucket, Report, Ticket)
+search.install(AppSession, engine.dialect.name, SearchTerm, Report, Ticket, ModelRecognitionResult)
+list_views.install(AppSession, {
+    "report": Report, "ticket": Ticket, "image": ReportImage, "result": ModelRecognitionResult,
+    "user": User, "report_view": ReportListItem, "ticket_view": TicketListItem,
+})
+etags.install(AppSession, DataVersion, {
+    # 举报列表含用户名、图片与识别结果；工单列表含举报图片
+    "reports": (Report, ReportImage, ModelRecognitionResult, User),
+    "tickets": (Ticket, ReportImage),
+    dispatch_rules.VERSION_NAME: (DispatchRule,),
+})
+dispatch_rules.install(DispatchRule)
 
 # FastAPI 应用
-app = FastAPI(title="Traffix API")
+# 默认 orjson 编码；大列表接口直接返回 FastJSONResponse，跳过 jsonable_encoder
+app = FastAPI(title="Traffix API", default_response_class=FastJSONResponse)
 
 # CORS 配置
 app.add_middleware(
@@ -248,8 +489,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-DB-Query-Count", "X-DB-Query-Time-Ms", "X-DB-Conn-Held-Ms"],
 )
 
+# 响应压缩（zstd / br / gzip 协商，超过阈值才压缩，大响应体在线程池中压缩）
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# 调试：在响应头中返回本次请求执行的 SQL 条数与耗时
+DB_DEBUG_HEADERS = os.getenv("DB_DEBUG_HEADERS", "false").lower() in ("1", "true", "yes", "on")
+if DB_DEBUG_HEADERS:
+    @app.middleware("http")
+    async def db_query_stats_headers(request: Request, call_next):
+        with track_queries() as stats:
+            response = await call_next(request)
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Query-Time-Ms"] = str(stats.elapsed_ms)
+        response.headers["X-DB-Conn-Held-Ms"] = str(stats.held_ms)
+        return response
+
 # 数据库依赖
 def get_db():
     db = SessionLocal()
@@ -259,6 +517,12 @@ def get_db():
         db.close()
 
 
+# 异步数据库依赖：查询不阻塞事件循环；复用同步查询代码时用 await db.run_sync(fn)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 # 辅助函数：从各种格式中提取文本内容
 def extract_text_from_content(content):
     """从各种格式中提取纯文本内容（Markdown 格式）"""
@@ -274,14 +538,14 @@ def extract_text_from_content(content):
             elif isinstance(item, str):
                 text_parts.append(item)
         result = '\n'.join(text_parts) if text_parts else ""
-        logger.debug(f"从列表提取文本: {len(result)} 字符")
+        logger.debug("从列表提取文本: %d 字符", len(result), extra=HOT)
         return result
     
     # 如果是字典（Python 对象或 JSON 解析后的对象）
     if isinstance(content, dict):
         if 'text' in content:
             result = str(content['text'])
-            logger.debug(f"从字典提取文本: {len(result)} 字符")
+            logger.debug("从字典提取文本: %d 字符", len(result), extra=HOT)
             return result
         return str(content)
     
@@ -301,8 +565,13 @@ def extract_text_from_content(content):
 
 
 # 调用大模型（统一接口）
-def call_model(user_content: str, image_path: Optional[str] = None, history: list = None):
-    """调用大模型（支持多种提供者）"""
+def call_model(
+    user_content: str,
+    image_path: Optional[str] = None,
+    history: list = None,
+    summary: Optional[str] = None,
+):
+    """调用大模型（支持多种提供者）；history 由调用方按 token 预算截好，summary 为更早对话的摘要"""
     try:
         if not model_provider:
             error_msg = (
@@ -318,10 +587,12 @@ def call_model(user_content: str, image_path: Optional[str] = None, history: lis
             raise Exception(error_msg)
         
         messages = []
+        if summary:
+            messages.append({"role": "system", "content": f"此前对话摘要：\n{summary}"})
         
         # 添加历史消息
         if history:
-            for msg in history[-10:]:  # 只取最近10条消息
+            for msg in history:
                 msg_content = msg.get("content", "")
                 
                 # 确保 content 是字符串类型
@@ -354,7 +625,7 @@ def call_model(user_content: str, image_path: Optional[str] = None, history: lis
                 image_data = base64.b64encode(raw).decode('utf-8')
                 _, mime_type = suffix_and_mime(image_path)
                 image_url = f"data:{mime_type};base64,{image_data}"
-                logger.info(f"图片已加载，大小: {len(image_data)} 字符")
+                logger.debug("图片已加载，大小: %d 字符", len(image_data), extra=HOT)
         
         # 构建消息内容
         if image_url:
@@ -370,9 +641,9 @@ def call_model(user_content: str, image_path: Optional[str] = None, history: lis
         model_to_use = MODEL_NAME
         if image_url and MODEL_PROVIDER == "aliyun" and not model_to_use.startswith('qwen-vl'):
             model_to_use = "qwen-vl-plus"
-            logger.info(f"检测到图片，自动切换到视觉模型: {model_to_use}")
+            logger.debug("检测到图片，自动切换到视觉模型: %s", model_to_use, extra=HOT)
         
-        logger.info(f"调用模型: {model_to_use}, 提供者: {MODEL_PROVIDER}, 消息数量: {len(messages)}")
+        logger.debug("调用模型: %s, 提供者: %s, 消息数量: %d", model_to_use, MODEL_PROVIDER, len(messages), extra=HOT)
         
         # 使用模型提供者调用模型
         content = model_provider.call_model(
@@ -381,7 +652,7 @@ def call_model(user_content: str, image_path: Optional[str] = None, history: lis
             image_path=image_url
         )
         
-        logger.info(f"模型回复长度: {len(content)}")
+        logger.debug("模型回复长度: %d", len(content), extra=HOT)
         return content
     except Exception as e:
         logger.error(f"调用大模型异常: {str(e)}", exc_info=True)
@@ -420,17 +691,249 @@ def recognize_uploaded_image(image_bytes: bytes, image_base64: str, question: st
     )
 
 
+def public_image_url(stored_path: str) -> str:
+    """接口返回的图片地址：预签名模式下为 MinIO 短期直链，否则为库中路径（前端转为 /uploads/...）。"""
+    return presigned_upload_url(stored_path) or stored_path
+
+
+_upload_executor = ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY, thread_name_prefix="upload")
+
+
+def discard_uploads(stored: List[StoredUpload]) -> None:
+    """清理已写入的上传；内容寻址对象可能被其他记录共享，不在此删除。
+
+    未登记到 upload_blobs 的内容寻址对象由 blob_store gc 扫描存储时回收。
+    """
+    for item in stored:
+        if not item.blob_key:
+            delete_upload(item.path)
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """查询参数中的时间统一为 naive UTC（库中时间均为 datetime.utcnow 写入的 naive UTC）；
+    带时区的按时区换算，不带时区的视为 UTC。"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def paginate_list(query, created_col, id_col, **kwargs):
+    """pagination.paginate 的接口封装：游标或计数参数错误时返回 400。"""
+    try:
+        return paginate(query, created_col, id_col, **kwargs)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"分页参数错误: {e}")
+
+
+_TICKET_LIST_FIELDS = (
+    "id", "ticket_no", "report_id", "event_type", "location", "description", "status", "priority",
+    "assigned_to", "assigned_department", "assigned_unit", "department_code", "unit_code",
+    "created_at", "updated_at",
+)
+_REPORT_LIST_FIELDS = (
+    "id", "user_id", "event_type", "location", "description", "status",
+    "auto_review_result", "auto_review_confidence", "created_at",
+)
+# Ticket / TicketListItem、Report / ReportListItem 字段同名，共用同一组序列化器
+_ticket_fields = RowSerializer.for_model(Ticket, _TICKET_LIST_FIELDS)
+_report_fields = RowSerializer.for_model(Report, _REPORT_LIST_FIELDS)
+_recognition_fields = RowSerializer.for_model(
+    ModelRecognitionResult, ("question", "answer", "event_type_detected", "confidence")
+)
+
+
+def ticket_list_row(ticket, images: List[str]) -> dict:
+    """工单列表行（datetime 由 orjson 直接输出 ISO 格式）。
+
+    缩略图返回 /uploads 路径，不逐张检查对象是否存在：由 serve_upload_file 按需生成并重定向。
+    """
+    row = _ticket_fields(ticket)
+    row["images"] = [public_image_url(p) for p in images]
+    row["thumbnails"] = thumbnail_paths(images)
+    return row
+
+
+def report_list_row(report, username: str, images: List[str], recognition_results: List[dict]) -> dict:
+    """举报列表行。"""
+    row = _report_fields(report)
+    row["report_id"] = row["id"]
+    row["username"] = username
+    row["images"] = [public_image_url(p) for p in images]
+    row["thumbnails"] = thumbnail_paths(images)
+    row["recognition_results"] = recognition_results
+    return row
+
+
+async def build_list_rows(build: Callable[[], List[dict]]) -> List[dict]:
+    """构造列表行。预签名时解析内容寻址 key 可能同步查库，放到线程池执行，不阻塞事件循环。"""
+    if presigned_enabled():
+        return await run_in_threadpool(build)
+    return build()
+
+
+async def store_upload_files(uploads: List[UploadFile], db: Optional[Session] = None) -> List[StoredUpload]:
+    """并发将多个 UploadFile 流式写入存储（有界线程池），任一失败则清理全部并抛出。
+
+    超过大小上限返回 413。内容寻址模式下在 db 的当前事务中登记引用，随调用方一起提交；
+    不传 db 时由调用方在写入阶段自行 register_upload。
+    """
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(
+        *(
+            loop.run_in_executor(_upload_executor, save_upload_stream, upload.file, upload.filename)
+            for upload in uploads
+        ),
+        return_exceptions=True,
+    )
+    failed = next((r for r in results if isinstance(r, BaseException)), None)
+    if failed is not None:
+        done = [r for r in results if isinstance(r, StoredUpload)]
+        await loop.run_in_executor(_upload_executor, discard_uploads, done)
+        if isinstance(failed, UploadTooLarge):
+            raise HTTPException(status_code=413, detail=str(failed))
+        raise failed
+    if db is not None:
+        for stored in results:
+            register_upload(db, stored)
+    return results
+
+
+async def store_upload_file(upload: UploadFile, db: Optional[Session] = None) -> StoredUpload:
+    """单个文件的 store_upload_files。"""
+    return (await store_upload_files([upload], db))[0]
+
+
+def apply_auto_review(
+    db: Session,
+    report: "Report",
+    recognition_result: dict,
+    review_result: str,
+    review_comment: str,
+    confidence: float,
+    reviewer_id: int,
+) -> Optional["Ticket"]:
+    """将智能初审结论写入举报：更新状态、保存审核记录，自动通过时创建工单。"""
+    if review_result == "approved":
+        report.status = "auto_approved"
+    elif review_result == "rejected":
+        report.status = "auto_rejected"
+    else:
+        report.status = "manual_review"
+
+    report.auto_review_result = review_result
+    report.auto_review_confidence = float(confidence)
+
+    db.add(ReviewRecord(
+        report_id=report.id,
+        reviewer_id=reviewer_id,
+        review_type="auto",
+        review_result=review_result,
+        review_comment=review_comment
+    ))
+
+    if review_result != "approved" or report.ticket is not None:
+        return None
+    ticket = Ticket(
+        report_id=report.id,
+        ticket_no=f"T{datetime.now().strftime('%Y%m%d%H%M%S')}{report.id:06d}",
+        event_type=recognition_result.get("event_type") or report.event_type,
+        location=report.location or (recognition_result.get("structured_data") or {}).get("location"),
+        description=report.description or recognition_result.get("answer", ""),
+        status="pending",
+        priority="medium"
+    )
+    db.add(ticket)
+    return ticket
+
+
+# 上传文件名带时间戳与随机前缀，内容不会变化，可长期缓存
+UPLOAD_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _parse_byte_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """解析单段 Range（bytes=a-b / a- / -n），返回闭区间；多段或格式不符时忽略。"""
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            suffix = int(last)
+            if suffix <= 0:
+                raise ValueError
+            start, end = max(size - suffix, 0), size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Range Not Satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, min(end, size - 1)
+
+
 # API 路由
 @app.get("/uploads/{filename}")
-def serve_upload_file(filename: str):
-    """从本地目录或 MinIO 提供上传图片（仅允许单层文件名，防路径穿越）。"""
+def serve_upload_file(filename: str, request: Request):
+    """从本地目录或 MinIO 提供上传图片（仅允许单层文件名，防路径穿越）。
+
+    支持 If-None-Match（304）与单段 Range（206）；MinIO 对象按块流式转发，本地文件交给 FileResponse。
+    缩略图等派生图（*.thumb.webp / *.medium.webp）不存在时按需生成。
+    """
     if Path(filename).name != filename or ".." in filename:
         raise HTTPException(status_code=404, detail="Not found")
-    data = read_upload(f"uploads/{filename}")
-    if not data:
+    stored = f"uploads/{filename}"
+    if presigned_enabled():
+        # 预签名模式：重定向到 MinIO，图片字节不经过本进程
+        is_derivative = derivative_source(filename) is not None
+        url = presigned_upload_url(stored, must_exist=is_derivative)
+        if url is None and is_derivative and ensure_derivative(filename):
+            url = presigned_upload_url(stored)
+        if url is None:
+            raise HTTPException(status_code=404, detail="Not found")
+        return RedirectResponse(url, status_code=307, headers={"Cache-Control": "private, max-age=60"})
+    st = stat_upload(stored)
+    if not st and ensure_derivative(filename):
+        st = stat_upload(stored)
+    if not st:
         raise HTTPException(status_code=404, detail="Not found")
     _, mime = suffix_and_mime(filename)
-    return Response(content=data, media_type=mime)
+    headers = {
+        "ETag": st.etag,
+        "Last-Modified": format_datetime(st.last_modified, usegmt=True),
+        "Cache-Control": UPLOAD_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or st.etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == st.etag):
+        byte_range = _parse_byte_range(range_header, st.size)
+
+    if byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        headers["Content-Range"] = f"bytes {start}-{end}/{st.size}"
+        headers["Content-Length"] = str(length)
+        return StreamingResponse(
+            iter_upload(stored, start, length), status_code=206, media_type=mime, headers=headers
+        )
+
+    if st.local_path:
+        return FileResponse(st.local_path, media_type=mime, headers=headers)
+    headers["Content-Length"] = str(st.size)
+    return StreamingResponse(iter_upload(stored), media_type=mime, headers=headers)
 
 
 @app.get("/")
@@ -490,90 +993,110 @@ def get_messages(session_id: int, db: Session = Depends(get_db)):
     ]
 
 
+_chat_summarizer = (
+    model_summarizer(lambda messages: model_provider.call_model(messages=messages, model=MODEL_NAME))
+    if SUMMARY_WITH_MODEL and model_provider
+    else None
+)
+
+
+def _chat_reply(user_content: str, image_url: Optional[str], history: list, summary: Optional[str], evicted: list):
+    """并入新裁掉的历史后调用模型，返回 (摘要, 回复文本)；不访问数据库。"""
+    if evicted:
+        summary = fold_summary(summary, evicted, _chat_summarizer)
+    try:
+        reply = call_model(
+            user_content=user_content,
+            image_path=image_url,
+            history=history,
+            summary=summary,
+        )
+        # 使用辅助函数确保提取纯文本（处理可能的 JSON 字符串格式）
+        return summary, extract_text_from_content(reply)
+    except Exception as e:
+        return summary, f"抱歉，处理您的请求时出现错误: {str(e)}"
+
+
 @app.post("/api/sessions/{session_id}/messages")
 async def send_message(
     session_id: int,
     content: str = Form(""),
     image: Optional[UploadFile] = File(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """发送消息并获取AI回复"""
-    # 验证会话存在
-    session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    # 保存用户消息
-    image_url = None
-    if image:
-        content_data = await image.read()
-        image_url = save_upload(content_data, image.filename)
+    """发送消息并获取AI回复
+
+    分三段执行，模型调用期间不持有数据库连接：写入用户消息并读取上下文 -> 线程池中调用模型 -> 写入回复。
+    """
+    # 先写入图片（不访问数据库）
+    stored = await store_upload_file(image) if image else None
+    image_url = stored.path if stored else None
     
     # 确保 content 是字符串类型
     user_content_str = str(content) if content else ""
     
-    user_message = Message(
-        session_id=session_id,
-        content=user_content_str,
-        image_url=image_url,
-        role="user"
-    )
-    db.add(user_message)
-    db.commit()
-    
-    # 获取历史消息
-    history_messages = (
-        db.query(Message)
-        .filter(Message.session_id == session_id)
-        .order_by(Message.created_at.asc())
-        .all()
-    )
-    
-    history = [
-        {
-            "role": msg.role,
-            "content": msg.content or ""
-        }
-        for msg in history_messages[:-1]  # 排除刚添加的用户消息
-    ]
-    
-    # 调用大模型
-    try:
-        assistant_content = call_model(
-            user_content=user_content_str,
-            image_path=image_url,
-            history=history
+    # 阶段一：校验会话、保存用户消息、读取历史（最近若干条按 token 预算裁剪，更早的待并入摘要）
+    def begin(sync_db: Session):
+        session = sync_db.query(ChatSession).filter(ChatSession.id == session_id).first()
+        if not session:
+            return None
+        if stored:
+            register_upload(sync_db, stored)
+        user_message = Message(
+            session_id=session_id,
+            content=user_content_str,
+            image_url=image_url,
+            role="user"
         )
-        # 使用辅助函数确保提取纯文本（处理可能的 JSON 字符串格式）
-        assistant_content = extract_text_from_content(assistant_content)
-    except Exception as e:
-        assistant_content = f"抱歉，处理您的请求时出现错误: {str(e)}"
+        sync_db.add(user_message)
+        sync_db.flush()
+        return load_window(sync_db, session, before_id=user_message.id), not session.title
+
+    started = await db.run_sync(begin)
+    if started is None:
+        await db.rollback()
+        if stored:
+            await run_in_threadpool(discard_uploads, [stored])
+        raise HTTPException(status_code=404, detail="Session not found")
+    (summary, history, evicted, evicted_upto), needs_title = started
+    await db.commit()  # 结束事务，连接归还连接池
     
-    # 保存AI回复（确保 content 是字符串）
-    assistant_message = Message(
-        session_id=session_id,
-        content=str(assistant_content) if assistant_content else "",
-        image_url=None,
-        role="assistant"
+    # 阶段二：合并摘要并调用大模型
+    summary, assistant_content = await run_in_threadpool(
+        _chat_reply, user_content_str, image_url, history, summary, evicted
     )
-    db.add(assistant_message)
-    
-    # 更新会话标题（如果是第一条消息）
-    if not session.title and user_content_str:
-        session.title = user_content_str[:50]  # 取前50个字符作为标题
     
-    session.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(assistant_message)
-    
-    return {
-        "id": assistant_message.id,
-        "session_id": assistant_message.session_id,
-        "content": extract_text_from_content(assistant_message.content) if assistant_message.content else "",
-        "image_url": None,
-        "role": assistant_message.role,
-        "created_at": assistant_message.created_at.isoformat()
-    }
+    # 阶段三：保存AI回复（确保 content 是字符串），更新会话标题、摘要与时间
+    def finish(sync_db: Session) -> dict:
+        assistant_message = Message(
+            session_id=session_id,
+            content=str(assistant_content) if assistant_content else "",
+            image_url=None,
+            role="assistant"
+        )
+        sync_db.add(assistant_message)
+
+        values = {ChatSession.updated_at: datetime.utcnow()}
+        if needs_title and user_content_str:
+            values[ChatSession.title] = user_content_str[:50]  # 取前50个字符作为标题
+        if evicted:
+            values[ChatSession.summary] = summary
+            values[ChatSession.summary_upto_id] = evicted_upto
+        sync_db.query(ChatSession).filter(ChatSession.id == session_id).update(values, synchronize_session=False)
+        sync_db.flush()
+
+        return {
+            "id": assistant_message.id,
+            "session_id": assistant_message.session_id,
+            "content": extract_text_from_content(assistant_message.content) if assistant_message.content else "",
+            "image_url": None,
+            "role": assistant_message.role,
+            "created_at": assistant_message.created_at.isoformat()
+        }
+
+    result = await db.run_sync(finish)
+    await db.commit()
+    return result
 
 
 # ==================== 新增API：用户认证 ====================
@@ -584,26 +1107,28 @@ async def register(
     phone: str = Form(...),
     password: str = Form(...),
     real_name: Optional[str] = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """用户注册（公众用户）"""
-    # 检查用户名和手机号是否已存在
-    if db.query(User).filter(User.username == username).first():
+    # 检查用户名和手机号是否已存在（重复注册不计算 bcrypt 哈希）
+    if (await db.execute(select(User.id).where(User.username == username))).first():
         raise HTTPException(status_code=400, detail="用户名已存在")
-    if db.query(User).filter(User.phone == phone).first():
+    if (await db.execute(select(User.id).where(User.phone == phone))).first():
         raise HTTPException(status_code=400, detail="手机号已注册")
+    # 检查完先归还连接，再在 bcrypt 线程池中计算哈希
+    await db.close()
+    password_hash = await get_password_hash_async(password)
     
     # 创建用户
     user = User(
         username=username,
         phone=phone,
-        password_hash=get_password_hash(password),
+        password_hash=password_hash,
         role='public',
         real_name=real_name
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
     
     # 生成token（sub必须是字符串）
     access_token = create_access_token(data={"sub": str(user.id), "role": user.role})
@@ -625,11 +1150,13 @@ async def register(
 async def login(
     username: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """用户登录（支持公众用户和管理员）"""
-    user = db.query(User).filter(User.username == username).first()
-    if not user or not verify_password(password, user.password_hash):
+    user = (await db.execute(select(User).where(User.username == username))).scalar_one_or_none()
+    # 已加载的字段不再访问数据库；bcrypt 校验（约数百毫秒）前先归还连接
+    await db.close()
+    if not user or not await verify_password_async(password, user.password_hash):
         raise HTTPException(status_code=401, detail="用户名或密码错误")
     
     # 生成token（sub必须是字符串）
@@ -651,10 +1178,10 @@ async def login(
 @app.get("/api/auth/me")
 async def get_current_user_info(
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取当前用户信息"""
-    user = db.query(User).filter(User.id == current_user["user_id"]).first()
+    user = await db.get(User, current_user["user_id"])
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在")
     
@@ -669,65 +1196,87 @@ async def get_current_user_info(
 
 # ==================== 新增API：事件上报 ====================
 
+REPORT_RECOGNITION_QUESTION = "图中是否存在校园交通与停车问题（如违停、拥堵、消防通道占用、标识损坏）？请描述位置、类型和风险程度。"
+
+
+def _recognize_report_image(image_url: str, event_type: Optional[str]):
+    """识别举报首图并给出智能初审结论；读不到图片时返回 None。"""
+    first_raw = read_upload(image_url)
+    if not first_raw:
+        return None
+    image_data = base64.b64encode(first_raw).decode('utf-8')
+    _, mime_type = suffix_and_mime(image_url)
+    image_base64 = f"data:{mime_type};base64,{image_data}"
+    
+    # 调用模型识别：优先使用本地 .pt，失败时回退到配置的大模型
+    recognition_result = recognize_uploaded_image(first_raw, image_base64, REPORT_RECOGNITION_QUESTION)
+    
+    # 智能初审
+    review = auto_review_report(
+        user_selected_types=[event_type] if event_type else [],
+        model_result=recognition_result,
+        confidence_threshold=AUTO_REVIEW_THRESHOLD,
+    )
+    return REPORT_RECOGNITION_QUESTION, recognition_result, review
+
+
 @app.post("/api/reports")
 async def create_report(
+    background_tasks: BackgroundTasks,
     event_type: Optional[str] = Form(None),
     location: Optional[str] = Form(None),
     description: Optional[str] = Form(None),
     contact_phone: Optional[str] = Form(None),
     images: List[UploadFile] = File(...),
     current_user: dict = Depends(get_current_public_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建事件举报"""
     if not images:
         raise HTTPException(status_code=400, detail="至少需要上传一张图片")
     
-    # 保存图片
-    image_urls = []
-    for idx, image in enumerate(images):
-        content_data = await image.read()
-        image_urls.append(save_upload(content_data, f"{uuid.uuid4().hex[:8]}_{image.filename}"))
-    
-    # 获取用户信息
-    user = db.query(User).filter(User.id == current_user["user_id"]).first()
-    
-    # 创建举报记录
-    report = Report(
-        user_id=current_user["user_id"],
-        event_type=event_type,
-        location=location,
-        description=description,
-        description_text=description,
-        contact_phone=contact_phone or user.phone,
-        status='pending'
-    )
-    db.add(report)
-    db.flush()
+    # 保存图片（并发上传，任一失败全部清理）；此时尚未访问数据库
+    stored_uploads = await store_upload_files(images)
+    image_urls = [stored.path for stored in stored_uploads]
     
-    # 保存图片记录
-    for idx, image_url in enumerate(image_urls):
-        report_image = ReportImage(
-            report_id=report.id,
-            image_url=image_url,
-            image_order=idx
+    # 使用第一张图片进行模型识别：在线程池中执行，期间不持有数据库连接
+    recognition = None
+    recognition_failed = False
+    try:
+        recognition = await run_in_threadpool(_recognize_report_image, image_urls[0], event_type)
+    except Exception as e:
+        logger.error(f"模型识别失败: {str(e)}", exc_info=True)
+        # 识别失败不影响举报创建，但需要人工复核
+        recognition_failed = True
+    
+    # 写入阶段：举报、图片、识别结果与初审结论在一个短事务内提交
+    def write(sync_db: Session) -> dict:
+        for stored in stored_uploads:
+            register_upload(sync_db, stored)
+        user = sync_db.query(User).filter(User.id == current_user["user_id"]).first()
+        report = Report(
+            user_id=current_user["user_id"],
+            event_type=event_type,
+            location=location,
+            description=description,
+            description_text=description,
+            contact_phone=contact_phone or user.phone,
+            status='manual_review' if recognition_failed else 'pending'
         )
-        db.add(report_image)
-    
-    # 使用第一张图片进行模型识别
-    first_raw = read_upload(image_urls[0])
-    if first_raw:
-        try:
-            image_data = base64.b64encode(first_raw).decode('utf-8')
-            _, mime_type = suffix_and_mime(image_urls[0])
-            image_base64 = f"data:{mime_type};base64,{image_data}"
-            
-            # 调用模型识别：优先使用本地 .pt，失败时回退到配置的大模型
-            question = "图中是否存在校园交通与停车问题（如违停、拥堵、消防通道占用、标识损坏）？请描述位置、类型和风险程度。"
-            recognition_result = recognize_uploaded_image(first_raw, image_base64, question)
-            
-            # 保存识别结果
-            model_result = ModelRecognitionResult(
+        sync_db.add(report)
+        sync_db.flush()
+
+        # 保存图片记录
+        for idx, image_url in enumerate(image_urls):
+            sync_db.add(ReportImage(
+                report_id=report.id,
+                image_url=image_url,
+                image_order=idx
+            ))
+
+        if recognition is not None:
+            question, recognition_result, (review_result, review_comment, confidence) = recognition
+            sync_db.add(ModelRecognitionResult(
                 report_id=report.id,
                 image_url=image_urls[0],
                 question=question,
@@ -735,76 +1284,49 @@ async def create_report(
                 event_type_detected=recognition_result.get("event_type"),
                 confidence=float(recognition_result.get("confidence", 0.0)),
                 structured_data=recognition_result.get("structured_data", {})
-            )
-            db.add(model_result)
-            
-            # 智能初审
-            user_selected_types = [event_type] if event_type else []
-            review_result, review_comment, confidence = auto_review_report(
-                user_selected_types=user_selected_types,
-                model_result=recognition_result
-            )
-            
-            # 更新举报状态
-            if review_result == "approved":
-                report.status = "auto_approved"
-            elif review_result == "rejected":
-                report.status = "auto_rejected"
-            else:
-                report.status = "manual_review"
-            
-            report.auto_review_result = review_result
-            report.auto_review_confidence = float(confidence)
-            
-            # 保存审核记录
-            review_record = ReviewRecord(
-                report_id=report.id,
+            ))
+            apply_auto_review(
+                sync_db,
+                report,
+                recognition_result,
+                review_result,
+                review_comment,
+                confidence,
                 reviewer_id=current_user["user_id"],  # 系统自动审核
-                review_type="auto",
-                review_result=review_result,
-                review_comment=review_comment
             )
-            db.add(review_record)
-            
-            # 如果自动通过，创建工单
-            if review_result == "approved":
-                ticket_no = f"T{datetime.now().strftime('%Y%m%d%H%M%S')}{report.id:06d}"
-                ticket = Ticket(
-                    report_id=report.id,
-                    ticket_no=ticket_no,
-                    event_type=recognition_result.get("event_type") or event_type,
-                    location=location or recognition_result.get("structured_data", {}).get("location"),
-                    description=description or recognition_result.get("answer", ""),
-                    status="pending",
-                    priority="medium"
-                )
-                db.add(ticket)
-        except Exception as e:
-            logger.error(f"模型识别失败: {str(e)}", exc_info=True)
-            # 识别失败不影响举报创建，但需要人工复核
-            report.status = "manual_review"
-    
-    db.commit()
-    db.refresh(report)
+        return {
+            "id": report.id,
+            "status": report.status,
+            "auto_review_result": report.auto_review_result,
+            "auto_review_confidence": float(report.auto_review_confidence) if report.auto_review_confidence else None,
+            "created_at": report.created_at.isoformat()
+        }
+
+    try:
+        result = await db.run_sync(write)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        await run_in_threadpool(discard_uploads, stored_uploads)
+        raise
+    # 响应返回后再生成管理端列表用的缩略图与预览图
+    background_tasks.add_task(generate_derivatives_many, image_urls)
     
-    return {
-        "id": report.id,
-        "status": report.status,
-        "auto_review_result": report.auto_review_result,
-        "auto_review_confidence": float(report.auto_review_confidence) if report.auto_review_confidence else None,
-        "created_at": report.created_at.isoformat()
-    }
+    return result
 
 
 @app.get("/api/reports/my")
 async def get_my_reports(
     current_user: dict = Depends(get_current_public_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取我的举报记录"""
-    reports = db.query(Report).filter(
-        Report.user_id == current_user["user_id"]
-    ).order_by(Report.created_at.desc()).all()
+    reports = (await db.scalars(
+        select(Report)
+        .options(selectinload(Report.images))
+        .where(Report.user_id == current_user["user_id"])
+        .order_by(Report.created_at.desc())
+    )).all()
     
     result = []
     for report in reports:
@@ -833,8 +1355,11 @@ async def recognize_image(
     db: Session = Depends(get_db)
 ):
     """图片事件识别接口（问答形式）"""
+    stored = (await store_upload_file(image, db)).path
+    db.commit()
+    # 识别需要完整图片，从已落盘的临时文件回读
+    await image.seek(0)
     content_data = await image.read()
-    stored = save_upload(content_data, f"{uuid.uuid4().hex[:8]}_{image.filename}")
     image_data = base64.b64encode(content_data).decode('utf-8')
     _, mime_type = suffix_and_mime(stored)
     image_base64 = f"data:{mime_type};base64,{image_data}"
@@ -845,7 +1370,7 @@ async def recognize_image(
     
     # 调用模型识别：优先使用本地 .pt，失败时回退到配置的大模型
     try:
-        recognition_result = recognize_uploaded_image(content_data, image_base64, question)
+        recognition_result = await run_in_threadpool(recognize_uploaded_image, content_data, image_base64, question)
         if not recognition_result.get("success"):
             raise HTTPException(
                 status_code=503,
@@ -872,67 +1397,76 @@ async def recognize_image(
 
 @app.get("/api/admin/tickets")
 async def get_tickets(
+    request: Request,
     status: Optional[str] = None,
     page: int = 1,
     page_size: int = 10,
+    cursor: Optional[str] = None,
+    count: str = "exact",
     current_user: dict = Depends(get_current_staff_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """获取工单列表（管理端）- 支持分页和状态筛选"""
-    from sqlalchemy import func
-    
-    # 构建查询
-    query = db.query(Ticket)
-    if status:
-        query = query.filter(Ticket.status == status)
-    
-    # 总数
-    total = query.count()
-    
-    # 分页
-    offset = (page - 1) * page_size
-    tickets = query.order_by(Ticket.created_at.desc()).offset(offset).limit(page_size).all()
-    
-    result = []
-    for ticket in tickets:
-        report = ticket.report
-        images = [img.image_url for img in report.images] if report else []
-        result.append({
-            "id": ticket.id,
-            "ticket_no": ticket.ticket_no,
-            "report_id": ticket.report_id,
-            "event_type": ticket.event_type,
-            "location": ticket.location,
-            "description": ticket.description,
-            "status": ticket.status,
-            "priority": ticket.priority,
-            "assigned_to": ticket.assigned_to,
-            "assigned_department": ticket.assigned_department,
-            "assigned_unit": ticket.assigned_unit,
-            "department_code": ticket.department_code,
-            "unit_code": ticket.unit_code,
-            "images": images,
-            "created_at": ticket.created_at.isoformat(),
-            "updated_at": ticket.updated_at.isoformat()
-        })
-    
-    return {
-        "items": result,
-        "total": total,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": (total + page_size - 1) // page_size
-    }
+    """获取工单列表（管理端）- 支持分页和状态筛选
+
+    传 cursor（首页传空串）时按 (created_at, id) 游标分页，下一页使用返回的 next_cursor；
+    count 可选 exact / approx / none。工单数据未变化且 If-None-Match 命中时返回 304。
+    """
+    etag = await db.run_sync(etags.list_etag, request, ("tickets",))
+    if etags.not_modified(request, etag):
+        return etags.not_modified_response(etag)
+
+    def load(sync_db: Session):
+        # 投影表单表范围扫描；否则查明细表（举报与图片批量预加载，避免逐行懒加载）
+        model = TicketListItem if list_views.ENABLED else Ticket
+        query = sync_db.query(model)
+        if status:
+            query = query.filter(model.status == status)
+        if model is Ticket:
+            query = query.options(selectinload(Ticket.report).selectinload(Report.images))
+        return paginate_list(
+            query,
+            model.created_at,
+            model.id,
+            page=page,
+            page_size=page_size,
+            cursor=cursor,
+            count=count,
+            table=model.__tablename__,
+            filtered=bool(status),
+        )
+
+    tickets, page_info = await db.run_sync(load)
+
+    def rows() -> List[dict]:
+        result = []
+        for ticket in tickets:
+            if isinstance(ticket, TicketListItem):
+                images = ticket.images or []
+            else:
+                images = [img.image_url for img in ticket.report.images] if ticket.report else []
+            result.append(ticket_list_row(ticket, images))
+        return result
+
+    result = await build_list_rows(rows)
+    return etags.tag(FastJSONResponse({"items": result, **page_info}), etag)
 
 
 @app.get("/api/admin/tickets/{ticket_id}")
 async def get_ticket_detail(
     ticket_id: int,
     current_user: dict = Depends(get_current_staff_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取工单详情（管理端）"""
-    ticket = db.query(Ticket).filter(Ticket.id == ticket_id).first()
+    ticket = await db.scalar(
+        select(Ticket)
+        .options(
+            selectinload(Ticket.report).selectinload(Report.images),
+            selectinload(Ticket.report).selectinload(Report.recognition_results),
+            selectinload(Ticket.report).selectinload(Report.review_records),
+        )
+        .where(Ticket.id == ticket_id)
+    )
     if not ticket:
         raise HTTPException(status_code=404, detail="工单不存在")
     
@@ -976,6 +1510,7 @@ async def get_ticket_detail(
         "department_code": ticket.department_code,
         "unit_code": ticket.unit_code,
         "images": images,
+        "thumbnails": thumbnail_paths(images),
         "recognition_results": recognition_results,
         "review_records": review_records,
         "report": {
@@ -999,48 +1534,50 @@ async def review_report(
     review_result: str = Form(...),
     review_comment: Optional[str] = Form(None),
     current_user: dict = Depends(get_current_staff_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """人工复核举报（管理端）"""
     if review_result not in ["approved", "rejected", "need_review"]:
         raise HTTPException(status_code=400, detail="无效的审核结果")
+
+    def apply(sync_db: Session) -> None:
+        report = sync_db.query(Report).filter(Report.id == report_id).first()
+        if not report:
+            raise HTTPException(status_code=404, detail="举报不存在")
     
-    report = db.query(Report).filter(Report.id == report_id).first()
-    if not report:
-        raise HTTPException(status_code=404, detail="举报不存在")
-    
-    # 更新举报状态
-    if review_result == "approved":
-        report.status = "approved"
-        # 如果还没有工单，创建工单
-        if not report.ticket:
-            ticket_no = f"T{datetime.now().strftime('%Y%m%d%H%M%S')}{report.id:06d}"
-            ticket = Ticket(
-                report_id=report.id,
-                ticket_no=ticket_no,
-                event_type=report.event_type,
-                location=report.location,
-                description=report.description,
-                status="pending",
-                priority="medium"
-            )
-            db.add(ticket)
-    elif review_result == "rejected":
-        report.status = "rejected"
-    else:
-        report.status = "manual_review"
-    
-    # 保存审核记录
-    review_record = ReviewRecord(
-        report_id=report.id,
-        reviewer_id=current_user["user_id"],
-        review_type="manual",
-        review_result=review_result,
-        review_comment=review_comment
-    )
-    db.add(review_record)
+        # 更新举报状态
+        if review_result == "approved":
+            report.status = "approved"
+            # 如果还没有工单，创建工单
+            if not report.ticket:
+                ticket_no = f"T{datetime.now().strftime('%Y%m%d%H%M%S')}{report.id:06d}"
+                ticket = Ticket(
+                    report_id=report.id,
+                    ticket_no=ticket_no,
+                    event_type=report.event_type,
+                    location=report.location,
+                    description=report.description,
+                    status="pending",
+                    priority="medium"
+                )
+                sync_db.add(ticket)
+        elif review_result == "rejected":
+            report.status = "rejected"
+        else:
+            report.status = "manual_review"
     
-    db.commit()
+        # 保存审核记录
+        review_record = ReviewRecord(
+            report_id=report.id,
+            reviewer_id=current_user["user_id"],
+            review_type="manual",
+            review_result=review_result,
+            review_comment=review_comment
+        )
+        sync_db.add(review_record)
+
+    await db.run_sync(apply)
+    await db.commit()
     
     return {"success": True, "message": "审核完成"}
 
@@ -1057,73 +1594,76 @@ async def update_ticket(
     department_code: Optional[str] = Form(None),
     unit_code: Optional[str] = Form(None),
     current_user: dict = Depends(get_current_staff_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新工单状态（管理端），支持指派部门/处室"""
-    ticket = db.query(Ticket).filter(Ticket.id == ticket_id).first()
-    if not ticket:
-        raise HTTPException(status_code=404, detail="工单不存在")
-    
-    old_status = ticket.status
-    
-    # 更新状态
-    if status:
-        if status not in ["pending", "assigned", "processing", "resolved", "closed"]:
-            raise HTTPException(status_code=400, detail="无效的状态")
-        ticket.status = status
-    
-    if assigned_to is not None:
-        ticket.assigned_to = assigned_to if assigned_to > 0 else None
-    
-    if priority:
-        if priority not in ["low", "medium", "high", "urgent"]:
-            raise HTTPException(status_code=400, detail="无效的优先级")
-        ticket.priority = priority
-
-    dept_comment_parts = []
-    if assigned_department is not None:
-        ticket.assigned_department = assigned_department.strip() or None
-        if ticket.assigned_department:
-            dept_comment_parts.append(f"部门:{ticket.assigned_department}")
-    if assigned_unit is not None:
-        ticket.assigned_unit = assigned_unit.strip() or None
-        if ticket.assigned_unit:
-            dept_comment_parts.append(f"处室:{ticket.assigned_unit}")
-    if department_code is not None:
-        ticket.department_code = department_code.strip() or None
-    if unit_code is not None:
-        ticket.unit_code = unit_code.strip() or None
-    if dept_comment_parts and ticket.status == "pending":
-        ticket.status = "assigned"
-    
-    merged_comment = comment
-    if dept_comment_parts:
-        extra = "；".join(dept_comment_parts)
-        merged_comment = f"{extra}" + (f" | {comment}" if comment else "")
-    
-    # 保存处理记录
-    if (
-        status
-        or assigned_to is not None
-        or priority
-        or comment
-        or assigned_department is not None
-        or assigned_unit is not None
-        or department_code is not None
-        or unit_code is not None
-    ):
-        record = TicketRecord(
-            ticket_id=ticket.id,
-            operator_id=current_user["user_id"],
-            action="update",
-            old_status=old_status,
-            new_status=ticket.status,
-            comment=merged_comment or comment,
-        )
-        db.add(record)
-    
-    db.commit()
-    db.refresh(ticket)
+
+    def apply(sync_db: Session) -> Ticket:
+        ticket = sync_db.query(Ticket).filter(Ticket.id == ticket_id).first()
+        if not ticket:
+            raise HTTPException(status_code=404, detail="工单不存在")
+    
+        old_status = ticket.status
+    
+        # 更新状态
+        if status:
+            if status not in ["pending", "assigned", "processing", "resolved", "closed"]:
+                raise HTTPException(status_code=400, detail="无效的状态")
+            ticket.status = status
+    
+        if assigned_to is not None:
+            ticket.assigned_to = assigned_to if assigned_to > 0 else None
+    
+        if priority:
+            if priority not in ["low", "medium", "high", "urgent"]:
+                raise HTTPException(status_code=400, detail="无效的优先级")
+            ticket.priority = priority
+
+        dept_comment_parts = []
+        if assigned_department is not None:
+            ticket.assigned_department = assigned_department.strip() or None
+            if ticket.assigned_department:
+                dept_comment_parts.append(f"部门:{ticket.assigned_department}")
+        if assigned_unit is not None:
+            ticket.assigned_unit = assigned_unit.strip() or None
+            if ticket.assigned_unit:
+                dept_comment_parts.append(f"处室:{ticket.assigned_unit}")
+        if department_code is not None:
+            ticket.department_code = department_code.strip() or None
+        if unit_code is not None:
+            ticket.unit_code = unit_code.strip() or None
+        if dept_comment_parts and ticket.status == "pending":
+            ticket.status = "assigned"
+    
+        merged_comment = comment
+        if dept_comment_parts:
+            extra = "；".join(dept_comment_parts)
+            merged_comment = f"{extra}" + (f" | {comment}" if comment else "")
+    
+        # 保存处理记录
+        if (
+            status
+            or assigned_to is not None
+            or priority
+            or comment
+            or assigned_department is not None
+            or assigned_unit is not None
+            or department_code is not None
+            or unit_code is not None
+        ):
+            record = TicketRecord(
+                ticket_id=ticket.id,
+                operator_id=current_user["user_id"],
+                action="update",
+                old_status=old_status,
+                new_status=ticket.status,
+                comment=merged_comment or comment,
+            )
+            sync_db.add(record)
+        return ticket
+
+    ticket = await db.run_sync(apply)
+    await db.commit()
     
     return {
         "success": True,
@@ -1144,58 +1684,26 @@ async def update_ticket(
 
 @app.get("/api/admin/statistics")
 async def get_statistics(
+    request: Request,
     current_user: dict = Depends(get_current_staff_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """获取统计数据（管理端）"""
-    from sqlalchemy import func, and_
-    from datetime import datetime, timedelta
-    
-    # 总举报数
-    total_reports = db.query(func.count(Report.id)).scalar() or 0
-    
-    # 总工单数
-    total_tickets = db.query(func.count(Ticket.id)).scalar() or 0
-    
-    # 待处理工单数
-    pending_tickets = db.query(func.count(Ticket.id)).filter(Ticket.status == 'pending').scalar() or 0
-    
-    # 处理中工单数
-    processing_tickets = db.query(func.count(Ticket.id)).filter(Ticket.status == 'processing').scalar() or 0
-    
-    # 已解决工单数
-    resolved_tickets = db.query(func.count(Ticket.id)).filter(Ticket.status == 'resolved').scalar() or 0
-    
-    # 今日举报数
-    today = datetime.utcnow().date()
-    today_reports = db.query(func.count(Report.id)).filter(
-        func.date(Report.created_at) == today
-    ).scalar() or 0
-    
-    # 今日工单数
-    today_tickets = db.query(func.count(Ticket.id)).filter(
-        func.date(Ticket.created_at) == today
-    ).scalar() or 0
-    
-    # 事件类型统计
-    event_type_stats = db.query(
-        Report.event_type,
-        func.count(Report.id).label('count')
-    ).filter(
-        Report.event_type.isnot(None)
-    ).group_by(Report.event_type).all()
-    
+    """获取统计数据（管理端）：读取 stat_counters 汇总计数，一次查询；计数未变化时返回 304"""
+    counters = await db.run_sync(stats_rollup.snapshot)
+    today = datetime.utcnow().date().isoformat()
+    # 响应完全由计数快照与日期决定，直接以其摘要作为 ETag
+    etag = etags.make_etag(today, sorted((scope, sorted(names.items())) for scope, names in counters.items()))
+    if etags.not_modified(request, etag):
+        return etags.not_modified_response(etag)
+
+    ticket_status = counters.get("ticket_status", {})
+
     event_type_list = [
-        {"type": item[0] or "未分类", "count": item[1]}
-        for item in event_type_stats
+        {"type": name or "未分类", "count": count}
+        for name, count in counters.get("report_event_type", {}).items()
+        if count > 0
     ]
     
-    # 工单状态统计
-    status_stats = db.query(
-        Ticket.status,
-        func.count(Ticket.id).label('count')
-    ).group_by(Ticket.status).all()
-    
     status_map = {
         'pending': '待处理',
         'assigned': '已指派',
@@ -1205,104 +1713,159 @@ async def get_statistics(
     }
     
     status_list = [
-        {"status": status_map.get(item[0], item[0]), "count": item[1]}
-        for item in status_stats
+        {"status": status_map.get(status, status), "count": count}
+        for status, count in ticket_status.items()
+        if count > 0
     ]
     
-    return {
-        "total_reports": total_reports,
-        "total_tickets": total_tickets,
-        "pending_tickets": pending_tickets,
-        "processing_tickets": processing_tickets,
-        "resolved_tickets": resolved_tickets,
-        "today_reports": today_reports,
-        "today_tickets": today_tickets,
+    return etags.tag(FastJSONResponse({
+        "total_reports": counters.get("reports_total", {}).get("", 0),
+        "total_tickets": counters.get("tickets_total", {}).get("", 0),
+        "pending_tickets": ticket_status.get("pending", 0),
+        "processing_tickets": ticket_status.get("processing", 0),
+        "resolved_tickets": ticket_status.get("resolved", 0),
+        "today_reports": counters.get("reports_daily", {}).get(today, 0),
+        "today_tickets": counters.get("tickets_daily", {}).get(today, 0),
         "event_type_stats": event_type_list,
         "status_stats": status_list
-    }
+    }), etag)
+
+
+@app.get("/api/admin/search")
+async def search_records(
+    q: str,
+    scope: str = "reports",
+    status: Optional[str] = None,
+    event_type: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    page: int = 1,
+    page_size: int = 20,
+    current_user: dict = Depends(get_current_staff_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """全文检索（管理端）：举报描述/位置/识别结果或工单描述/位置，按相关度排序并返回高亮摘要"""
+    page_size = max(1, min(page_size, 100))
+    try:
+        result = await db.run_sync(
+            search.search, q, scope=scope, status=status, event_type=event_type,
+            date_from=naive_utc(date_from), date_to=naive_utc(date_to), limit=page_size, offset=(max(page, 1) - 1) * page_size,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {**result, "page": page, "page_size": page_size}
+
+
+@app.get("/api/admin/trends")
+async def get_trends(
+    metric: str = "reports",
+    dimension: str = "event_type",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    bucket: str = "auto",
+    top: int = 10,
+    current_user: dict = Depends(get_current_staff_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """趋势数据（管理端）：读取小时/天预聚合桶；默认最近 7 天，bucket=auto 按跨度选择粒度
+
+    start / end 可带时区（如 2024-03-01T08:00:00+08:00），按 UTC 换算；end 需晚于 start，否则 400。
+    """
+    end = naive_utc(end) or datetime.utcnow()
+    start = naive_utc(start) or end - timedelta(days=7)
+    try:
+        return await db.run_sync(
+            trends.query_series, metric, dimension, start, end, granularity=bucket, top=max(1, min(top, 50))
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 # ==================== 新增API：待审核举报列表 ====================
 
 @app.get("/api/admin/reports")
 async def get_reports(
+    request: Request,
     status: Optional[str] = None,
     page: int = 1,
     page_size: int = 10,
+    cursor: Optional[str] = None,
+    count: str = "exact",
     current_user: dict = Depends(get_current_staff_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """获取举报列表（管理端）- 支持分页和状态筛选"""
-    from sqlalchemy import func
-    
-    # 构建查询
-    query = db.query(Report)
-    
-    # 状态筛选
-    if status:
-        if status == 'pending_review':
-            # 待审核：包括 manual_review 和 pending
-            query = query.filter(Report.status.in_(['manual_review', 'pending']))
-        else:
-            query = query.filter(Report.status == status)
-    else:
-        # 默认显示所有状态
-        pass
-    
-    # 总数
-    total = query.count()
-    
-    # 分页
-    offset = (page - 1) * page_size
-    reports = query.order_by(Report.created_at.desc()).offset(offset).limit(page_size).all()
-    
-    result = []
-    for report in reports:
-        user = report.user
-        images = [img.image_url for img in report.images]
-        recognition_results = [
-            {
-                "question": r.question,
-                "answer": r.answer,
-                "event_type_detected": r.event_type_detected,
-                "confidence": float(r.confidence) if r.confidence else None
-            }
-            for r in report.recognition_results
-        ]
-        
-        result.append({
-            "id": report.id,
-            "report_id": report.id,
-            "user_id": report.user_id,
-            "username": user.username if user else "未知用户",
-            "event_type": report.event_type,
-            "location": report.location,
-            "description": report.description,
-            "status": report.status,
-            "images": images,
-            "recognition_results": recognition_results,
-            "auto_review_result": report.auto_review_result,
-            "auto_review_confidence": float(report.auto_review_confidence) if report.auto_review_confidence else None,
-            "created_at": report.created_at.isoformat()
-        })
-    
-    return {
-        "items": result,
-        "total": total,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": (total + page_size - 1) // page_size
-    }
+    """获取举报列表（管理端）- 支持分页和状态筛选（cursor / count / ETag 同工单列表）"""
+    etag = await db.run_sync(etags.list_etag, request, ("reports",))
+    if etags.not_modified(request, etag):
+        return etags.not_modified_response(etag)
+
+    def load(sync_db: Session):
+        model = ReportListItem if list_views.ENABLED else Report
+        query = sync_db.query(model)
+        # 状态筛选
+        if status:
+            if status == 'pending_review':
+                # 待审核：包括 manual_review 和 pending
+                query = query.filter(model.status.in_(['manual_review', 'pending']))
+            else:
+                query = query.filter(model.status == status)
+        if model is Report:
+            query = query.options(
+                joinedload(Report.user),
+                selectinload(Report.images),
+                selectinload(Report.recognition_results),
+            )
+        return paginate_list(
+            query,
+            model.created_at,
+            model.id,
+            page=page,
+            page_size=page_size,
+            cursor=cursor,
+            count=count,
+            table=model.__tablename__,
+            filtered=bool(status),
+        )
+
+    reports, page_info = await db.run_sync(load)
+
+    def rows() -> List[dict]:
+        result = []
+        for report in reports:
+            if isinstance(report, ReportListItem):
+                result.append(report_list_row(
+                    report, report.username, report.images or [], report.recognition_results or []
+                ))
+                continue
+            user = report.user
+            result.append(report_list_row(
+                report,
+                user.username if user else "未知用户",
+                [img.image_url for img in report.images],
+                _recognition_fields.many(report.recognition_results),
+            ))
+        return result
+
+    result = await build_list_rows(rows)
+    return etags.tag(FastJSONResponse({"items": result, **page_info}), etag)
 
 
 @app.get("/api/admin/reports/{report_id}")
 async def get_report_detail(
     report_id: int,
     current_user: dict = Depends(get_current_staff_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取举报详情（管理端）"""
-    report = db.query(Report).filter(Report.id == report_id).first()
+    report = await db.scalar(
+        select(Report)
+        .options(
+            selectinload(Report.user),
+            selectinload(Report.images),
+            selectinload(Report.recognition_results),
+        )
+        .where(Report.id == report_id)
+    )
     if not report:
         raise HTTPException(status_code=404, detail="举报不存在")
     
@@ -1328,6 +1891,7 @@ async def get_report_detail(
         "description": report.description,
         "status": report.status,
         "images": images,
+        "thumbnails": thumbnail_paths(images),
         "recognition_results": recognition_results,
         "auto_review_result": report.auto_review_result,
         "auto_review_confidence": float(report.auto_review_confidence) if report.auto_review_confidence else None,
@@ -1342,21 +1906,21 @@ async def get_users(
     role: Optional[str] = None,
     keyword: Optional[str] = None,
     current_user: dict = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取用户列表（管理端）- 支持角色筛选和关键词搜索"""
     from sqlalchemy import or_
     
-    query = db.query(User)
+    query = select(User)
     
     # 角色筛选
     if role:
-        query = query.filter(User.role == role)
+        query = query.where(User.role == role)
     
     # 关键词搜索（用户名、手机号、姓名）
     if keyword:
         keyword_pattern = f"%{keyword}%"
-        query = query.filter(
+        query = query.where(
             or_(
                 User.username.like(keyword_pattern),
                 User.phone.like(keyword_pattern),
@@ -1364,7 +1928,7 @@ async def get_users(
             )
         )
     
-    users = query.order_by(User.created_at.desc()).all()
+    users = (await db.scalars(query.order_by(User.created_at.desc()))).all()
     
     result = []
     for user in users:
@@ -1403,7 +1967,7 @@ async def admin_create_user(
     user = User(
         username=username,
         phone=phone,
-        password_hash=get_password_hash(password),
+        password_hash=await get_password_hash_async(password),
         role=role,
         real_name=real_name,
     )
@@ -1440,18 +2004,129 @@ async def admin_update_user_role(
 
 
 @app.get("/api/admin/departments")
-async def admin_departments(
+def admin_departments(
     event_type: Optional[str] = None,
+    location: Optional[str] = None,
     current_user: dict = Depends(get_current_staff_user),
+    db: Session = Depends(get_db),
 ):
-    """处置部门树、常用快捷指派、按事件类型的默认建议"""
-    from departments import DEPARTMENT_TREE, list_quick_presets, suggest_assignment
+    """处置部门树、常用快捷指派、按事件类型（及位置、当前时段）的默认建议
+
+    指派规则相关接口使用同步会话，声明为普通 def，由 FastAPI 放到线程池执行，不阻塞事件循环。
+    """
+    from departments import DEPARTMENT_TREE, list_quick_presets
 
+    index = dispatch_rules.reload(db)
     return {
         "tree": DEPARTMENT_TREE,
         "quick_presets": list_quick_presets(),
-        "suggested": suggest_assignment(event_type) if event_type else None,
+        "suggested": index.suggest(event_type, location) if event_type else None,
+    }
+
+
+@app.get("/api/admin/dispatch-rules")
+def list_dispatch_rules(
+    current_user: dict = Depends(get_current_staff_user),
+    db: Session = Depends(get_db),
+):
+    """指派规则列表（表为空时实际使用内置默认规则）"""
+    index = dispatch_rules.reload(db)
+    return {"items": dispatch_rules.list_rules(db), "version": index.version}
+
+
+@app.post("/api/admin/dispatch-rules")
+def save_dispatch_rule(
+    department_code: str = Form(...),
+    unit_code: str = Form(...),
+    rule_id: Optional[int] = Form(None),
+    event_type: Optional[str] = Form(None),
+    match_mode: str = Form("exact"),
+    location_pattern: Optional[str] = Form(None),
+    start_minute: Optional[int] = Form(None),
+    end_minute: Optional[int] = Form(None),
+    weekdays: Optional[str] = Form(None),
+    priority: int = Form(0),
+    enabled: bool = Form(True),
+    current_user: dict = Depends(get_current_admin_user),
+    db: Session = Depends(get_db),
+):
+    """新增或修改（传 rule_id）指派规则，保存后各进程在 DISPATCH_RULES_CHECK_INTERVAL 秒内生效"""
+    fields = {
+        "event_type": (event_type or "").strip() or None,
+        "match_mode": match_mode,
+        "location_pattern": (location_pattern or "").strip() or None,
+        "start_minute": start_minute,
+        "end_minute": end_minute,
+        "weekdays": (weekdays or "").strip() or None,
+        "department_code": department_code.strip(),
+        "unit_code": unit_code.strip(),
+        "priority": priority,
+        "enabled": enabled,
     }
+    try:
+        dispatch_rules.validate(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if rule_id:
+        rule = db.query(DispatchRule).filter(DispatchRule.id == rule_id).first()
+        if not rule:
+            raise HTTPException(status_code=404, detail="规则不存在")
+        for key, value in fields.items():
+            setattr(rule, key, value)
+    else:
+        rule = DispatchRule(**fields)
+        db.add(rule)
+    db.commit()
+    db.refresh(rule)
+    dispatch_rules.reload(db, force=True)
+    return dispatch_rules.rule_dict(rule)
+
+
+@app.delete("/api/admin/dispatch-rules/{rule_id}")
+def delete_dispatch_rule(
+    rule_id: int,
+    current_user: dict = Depends(get_current_admin_user),
+    db: Session = Depends(get_db),
+):
+    """删除指派规则"""
+    rule = db.query(DispatchRule).filter(DispatchRule.id == rule_id).first()
+    if not rule:
+        raise HTTPException(status_code=404, detail="规则不存在")
+    db.delete(rule)
+    db.commit()
+    dispatch_rules.reload(db, force=True)
+    return {"success": True}
+
+
+@app.post("/api/admin/tickets/auto-assign")
+def auto_assign_tickets(
+    limit: int = Form(500),
+    dry_run: bool = Form(False),
+    current_user: dict = Depends(get_current_admin_user),
+    db: Session = Depends(get_db),
+):
+    """按指派规则批量指派未分配部门的待处理工单（dry_run 只返回建议；线程池中分批提交）"""
+    if not 1 <= limit <= 5000:
+        raise HTTPException(status_code=400, detail="limit 应在 1-5000 之间")
+    return dispatch_rules.auto_assign(
+        db, Ticket, TicketRecord, current_user["user_id"], limit=limit, dry_run=dry_run
+    )
+
+
+@app.get("/api/admin/storage/cache")
+async def admin_storage_cache_stats(
+    current_user: dict = Depends(get_current_admin_user),
+):
+    """上传文件进程内读缓存的命中率与占用"""
+    return cache_stats()
+
+
+@app.get("/api/admin/db/pool")
+async def admin_db_pool_stats(
+    current_user: dict = Depends(get_current_admin_user),
+):
+    """数据库连接池：连接占用时长（平均 / 最大 / 长占用次数）与当前池状态"""
+    return pool_stats()
 
 
 @app.get("/api/admin/analytics/completed-tickets")
@@ -1460,61 +2135,151 @@ async def admin_analytics_completed_tickets(
     db: Session = Depends(get_db),
 ):
     """已结案工单分析（类型/校内位置/指派部门分布与建议）"""
-    from analytics_completed import build_completed_tickets_analytics
-
     return build_completed_tickets_analytics(db)
 
 
 # ==================== 新增API：数据管理 ====================
 
-@app.get("/api/admin/data")
-async def get_data_items(
+def _data_items_query(
+    db: Session,
     event_type: Optional[str] = None,
-    current_user: dict = Depends(get_current_staff_user),
-    db: Session = Depends(get_db)
+    model_event_type: Optional[str] = None,
+    min_confidence: Optional[float] = None,
+    max_confidence: Optional[float] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
 ):
-    """获取数据项列表（管理端）- 基于举报图片"""
-    query = db.query(ReportImage).join(Report)
-    
+    """数据项查询：筛选条件全部下推到 SQL；模型相关条件作用于每条举报的第一条识别结果。"""
+    from sqlalchemy import func
+    from sqlalchemy.orm import aliased
+
+    query = (
+        db.query(ReportImage)
+        .join(Report)
+        .options(contains_eager(ReportImage.report).selectinload(Report.recognition_results))
+    )
     if event_type:
         query = query.filter(Report.event_type == event_type)
+    if date_from:
+        query = query.filter(ReportImage.created_at >= date_from)
+    if date_to:
+        query = query.filter(ReportImage.created_at < date_to)
+    if model_event_type or min_confidence is not None or max_confidence is not None:
+        first = aliased(ModelRecognitionResult)
+        first_id = (
+            db.query(func.min(ModelRecognitionResult.id))
+            .filter(ModelRecognitionResult.report_id == Report.id)
+            .correlate(Report)
+            .scalar_subquery()
+        )
+        query = query.join(first, first.id == first_id)
+        if model_event_type:
+            query = query.filter(first.event_type_detected == model_event_type)
+        if min_confidence is not None:
+            query = query.filter(first.confidence >= min_confidence)
+        if max_confidence is not None:
+            query = query.filter(first.confidence <= max_confidence)
+    return query
+
+
+def _data_item_row(img: "ReportImage", presign: bool = True) -> dict:
+    report = img.report
+    recognition_result = None
+    if report and report.recognition_results:
+        # 获取第一个识别结果
+        first_result = min(report.recognition_results, key=lambda r: r.id)
+        recognition_result = {
+            "event_type": first_result.event_type_detected,
+            "confidence": float(first_result.confidence) if first_result.confidence else None,
+            "answer": first_result.answer,
+            "structured_data": first_result.structured_data,
+            "created_at": first_result.created_at.isoformat()
+        }
     
-    images = query.order_by(ReportImage.created_at.desc()).all()
+    confidence_value = None
+    if recognition_result and recognition_result.get("confidence"):
+        confidence_value = float(recognition_result["confidence"])
     
-    result = []
-    for img in images:
-        report = img.report
-        recognition_result = None
-        if report and report.recognition_results:
-            # 获取第一个识别结果
-            first_result = report.recognition_results[0]
-            recognition_result = {
-                "event_type": first_result.event_type_detected,
-                "confidence": float(first_result.confidence) if first_result.confidence else None,
-                "answer": first_result.answer,
-                "structured_data": first_result.structured_data,
-                "created_at": first_result.created_at.isoformat()
-            }
-        
-        confidence_value = None
-        if recognition_result and recognition_result.get("confidence"):
-            confidence_value = float(recognition_result["confidence"])
-        
-        result.append({
-            "id": img.id,
-            "report_id": report.id if report else None,
-            "image_url": img.image_url,
-            "event_type": report.event_type if report else None,
-            "label": report.event_type if report else None,  # 使用举报的事件类型作为标签
-            "confidence": confidence_value,
-            "model_event_type": recognition_result.get("event_type") if recognition_result else None,
-            "model_answer": recognition_result.get("answer") if recognition_result else None,
-            "model_structured_data": recognition_result.get("structured_data") if recognition_result else None,
-            "model_created_at": recognition_result.get("created_at") if recognition_result else None,
-            "created_at": img.created_at.isoformat()
-        })
-    
-    return result
+    thumbnail = derivative_path(img.image_url, "thumb")
+    return {
+        "id": img.id,
+        "report_id": report.id if report else None,
+        "image_url": public_image_url(img.image_url) if presign else img.image_url,
+        "thumbnail_url": thumbnail,
+        "event_type": report.event_type if report else None,
+        "label": report.event_type if report else None,  # 使用举报的事件类型作为标签
+        "confidence": confidence_value,
+        "model_event_type": recognition_result.get("event_type") if recognition_result else None,
+        "model_answer": recognition_result.get("answer") if recognition_result else None,
+        "model_structured_data": recognition_result.get("structured_data") if recognition_result else None,
+        "model_created_at": recognition_result.get("created_at") if recognition_result else None,
+        "created_at": img.created_at.isoformat()
+    }
+
+
+# NDJSON 导出时每批从数据库取出的行数
+DATA_EXPORT_BATCH = 500
+
+
+def _stream_data_items(filters: dict):
+    """逐行输出 NDJSON；独立会话 + yield_per 服务端游标，内存占用与表大小无关。"""
+    db = SessionLocal()
+    try:
+        query = _data_items_query(db, **filters).order_by(ReportImage.created_at.desc(), ReportImage.id.desc())
+        for img in query.yield_per(DATA_EXPORT_BATCH):
+            yield dumps(_data_item_row(img, presign=False)) + b"\n"
+    finally:
+        db.close()
+
+
+@app.get("/api/admin/data")
+async def get_data_items(
+    event_type: Optional[str] = None,
+    model_event_type: Optional[str] = None,
+    min_confidence: Optional[float] = None,
+    max_confidence: Optional[float] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    page_size: int = 50,
+    count: str = "none",
+    format: str = "json",
+    current_user: dict = Depends(get_current_staff_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """获取数据项列表（管理端）- 基于举报图片
+
+    按 (created_at, id) 游标分页，返回 {items, next_cursor, has_more, ...}；不传 cursor 即第一页，
+    下一页传返回的 next_cursor。format=ndjson 时以 application/x-ndjson 流式导出全部匹配数据，供数据集工具使用。
+    """
+    filters = {
+        "event_type": event_type,
+        "model_event_type": model_event_type,
+        "min_confidence": min_confidence,
+        "max_confidence": max_confidence,
+        "date_from": naive_utc(date_from),
+        "date_to": naive_utc(date_to),
+    }
+    if format == "ndjson":
+        return StreamingResponse(_stream_data_items(filters), media_type="application/x-ndjson")
+    if format != "json":
+        raise HTTPException(status_code=400, detail="format 取值应为 json 或 ndjson")
+
+    def load(sync_db: Session):
+        return paginate_list(
+            _data_items_query(sync_db, **filters),
+            ReportImage.created_at,
+            ReportImage.id,
+            page_size=page_size,
+            cursor=cursor or "",
+            count=count,
+            table=ReportImage.__tablename__,
+            filtered=any(v is not None and v != "" for v in filters.values()),
+        )
+
+    images, page_info = await db.run_sync(load)
+    result = await build_list_rows(lambda: [_data_item_row(img) for img in images])
+    return FastJSONResponse({"items": result, **page_info})
 
 
 @app.post("/api/admin/data/{data_id}/label")
@@ -1522,22 +2287,24 @@ async def save_data_label(
     data_id: int,
     label: str = Form(...),
     current_user: dict = Depends(get_current_staff_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """保存数据标签（管理端）"""
-    image = db.query(ReportImage).filter(ReportImage.id == data_id).first()
-    if not image:
-        raise HTTPException(status_code=404, detail="数据项不存在")
-    
-    # 更新对应举报的事件类型
-    report = image.report
-    if report:
-        report.event_type = label
-        db.commit()
+    def apply(sync_db: Session):
+        image = sync_db.query(ReportImage).filter(ReportImage.id == data_id).first()
+        if not image:
+            raise HTTPException(status_code=404, detail="数据项不存在")
+        # 更新对应举报的事件类型
+        if image.report:
+            image.report.event_type = label
+
+    await db.run_sync(apply)
+    await db.commit()
     
     return {"success": True, "message": "标签保存成功"}
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # log_config=None：不让 uvicorn 重新套用自带的 LOGGING_CONFIG，保留 configure_logging 的队列管线
+    uvicorn.run(app, host="0.0.0.0", port=8000, log_config=None)
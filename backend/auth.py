@@ -2,8 +2,13 @@
 认证工具模块
 提供JWT token生成、验证和密码哈希功能
 """
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
+import asyncio
+import threading
+import time
 from jose import JWTError, jwt
 from jose.exceptions import JWTClaimsError, ExpiredSignatureError
 import bcrypt
@@ -20,6 +25,14 @@ SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7天
 
+# bcrypt 成本因子（2^rounds 次迭代，12 约 250ms）；只影响新生成的哈希，已有哈希按其自身成本校验
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt 专用线程池（bcrypt 计算期间释放 GIL），避免登录/注册阻塞事件循环
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+# 已验证 token 的声明缓存：条数上限与秒数（不超过 token 自身过期时间）；TTL 为 0 关闭
+TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = float(os.getenv("AUTH_TOKEN_CACHE_TTL", "300"))
+
 # HTTP Bearer scheme (设置为可选，允许我们手动处理)
 security = HTTPBearer(auto_error=False)
 
@@ -48,7 +61,7 @@ def get_password_hash(password: str) -> str:
             password_bytes = password
         
         # 生成盐并哈希密码
-        salt = bcrypt.gensalt()
+        salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
         hashed = bcrypt.hashpw(password_bytes, salt)
         # 返回字符串格式
         return hashed.decode('utf-8')
@@ -57,6 +70,21 @@ def get_password_hash(password: str) -> str:
         raise ValueError(f"无法生成密码哈希: {e}")
 
 
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """在 bcrypt 线程池中验证密码（供 async 接口使用）"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """在 bcrypt 线程池中生成密码哈希（供 async 接口使用）"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """创建JWT token"""
     to_encode = data.copy()
@@ -66,7 +94,6 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    logger.debug(f"生成token，使用的SECRET_KEY: {SECRET_KEY[:20]}...")
     return encoded_jwt
 
 
@@ -94,11 +121,62 @@ def decode_token(token: str) -> Optional[dict]:
         return None
 
 
+class _TokenCache:
+    """已验证 token -> 声明的有界 TTL 缓存（LRU 淘汰），命中时跳过 JWT 签名校验与解码。"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, token: str) -> Optional[dict]:
+        with self._lock:
+            item = self._items.get(token)
+            if item is None:
+                return None
+            if item[0] <= time.monotonic():
+                del self._items[token]
+                return None
+            self._items.move_to_end(token)
+            return item[1]
+
+    def put(self, token: str, claims: dict) -> None:
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+        expires = time.monotonic() + self.ttl
+        exp = claims.get("exp")
+        if isinstance(exp, (int, float)):
+            # 不超过 token 自身的过期时间
+            expires = min(expires, time.monotonic() + (exp - time.time()))
+        with self._lock:
+            self._items[token] = (expires, claims)
+            self._items.move_to_end(token)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+_token_cache = _TokenCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
+
+
+def verify_token(token: str) -> Optional[dict]:
+    """返回 token 声明（先查缓存，未命中时完整校验并缓存）；无效返回 None。"""
+    claims = _token_cache.get(token)
+    if claims is None:
+        claims = decode_token(token)
+        if claims is not None:
+            _token_cache.put(token, claims)
+    return claims
+
+
 async def get_token_from_request(request: Request, credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)):
     """从请求头获取token（兼容multipart/form-data）"""
     # 首先尝试从HTTPBearer获取
     if credentials:
-        logger.debug("从HTTPBearer获取token")
         return credentials.credentials
     
     # 如果HTTPBearer失败，直接从请求头获取（适用于multipart/form-data）
@@ -120,7 +198,6 @@ async def get_token_from_request(request: Request, credentials: Optional[HTTPAut
                 detail="无法验证凭据：不支持的认证方案",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        logger.debug("从请求头成功获取token")
         return token
     except ValueError as e:
         logger.error(f"Authorization头格式错误: {authorization[:20]}...")
@@ -132,7 +209,7 @@ async def get_token_from_request(request: Request, credentials: Optional[HTTPAut
 
 
 async def get_current_user(token: str = Depends(get_token_from_request)):
-    """获取当前用户（依赖注入）"""
+    """获取当前用户（依赖注入）；已验证的 token 声明短时缓存，见 verify_token"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无法验证凭据，请重新登录",
@@ -143,11 +220,7 @@ async def get_current_user(token: str = Depends(get_token_from_request)):
         logger.error("Token为空")
         raise credentials_exception
     
-    # 记录token信息用于调试（不记录完整token，只记录前20个字符）
-    logger.debug(f"验证token: {token[:20]}...")
-    logger.debug(f"使用的SECRET_KEY: {SECRET_KEY[:20]}... (长度: {len(SECRET_KEY)})")
-    
-    payload = decode_token(token)
+    payload = verify_token(token)
     if payload is None:
         error_msg = (
             "Token验证失败。可能原因：\n"
@@ -175,7 +248,6 @@ async def get_current_user(token: str = Depends(get_token_from_request)):
         logger.error(f"Token中的user_id格式错误: {user_id_str}")
         raise credentials_exception
     
-    logger.debug(f"Token验证成功，用户ID: {user_id}, 角色: {payload.get('role')}")
     return {"user_id": user_id, "role": payload.get("role")}
 
 
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+认证开销基准（不连数据库）：
+
+1. 各 bcrypt 成本因子下单次哈希 / 校验耗时；
+2. 并发登录吞吐：在事件循环中直接 bcrypt.checkpw 与放入 bcrypt 线程池的对比，同时记录事件循环最大停顿；
+3. 每请求鉴权开销：完整 JWT 校验（decode_token）与已验证 token 缓存命中（verify_token）的对比。
+
+执行方式：
+    cd backend
+    python bench_auth.py
+    python bench_auth.py --rounds 10 --logins 40
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import Any, Dict
+
+import bcrypt
+
+import auth
+
+
+def bench_cost(max_rounds: int) -> None:
+    print("bcrypt 成本因子：")
+    for rounds in range(max(4, max_rounds - 3), max_rounds + 2):
+        started = time.perf_counter()
+        hashed = bcrypt.hashpw(b"password123", bcrypt.gensalt(rounds=rounds))
+        hash_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        bcrypt.checkpw(b"password123", hashed)
+        check_ms = (time.perf_counter() - started) * 1000
+        print(f"  rounds={rounds:>2}: hash {hash_ms:7.1f} ms  verify {check_ms:7.1f} ms")
+
+
+async def _heartbeat(stop: asyncio.Event, interval: float = 0.005) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst * 1000
+
+
+async def _logins(hashed: str, n: int, offload: bool) -> Dict[str, Any]:
+    async def login() -> bool:
+        if offload:
+            return await auth.verify_password_async("password123", hashed)
+        return auth.verify_password("password123", hashed)
+
+    stop = asyncio.Event()
+    beat = asyncio.create_task(_heartbeat(stop))
+    started = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(n)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    assert all(results)
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "logins_per_s": round(n / elapsed, 1),
+        "max_loop_stall_ms": round(await beat, 1),
+    }
+
+
+def bench_logins(rounds: int, n: int) -> None:
+    hashed = bcrypt.hashpw(b"password123", bcrypt.gensalt(rounds=rounds)).decode("utf-8")
+    print(f"\n并发登录 {n} 次（rounds={rounds}，线程池 {auth.PASSWORD_HASH_WORKERS} 线程）：")
+    for name, offload in (("事件循环内", False), ("bcrypt 线程池", True)):
+        print(f"  {name:>12}: {asyncio.run(_logins(hashed, n, offload))}")
+
+
+def bench_tokens(iterations: int) -> None:
+    token = auth.create_access_token({"sub": "1", "role": "admin"})
+    auth._token_cache.clear()
+    print(f"\n每请求鉴权（{iterations} 次）：")
+    for name, fn in (("decode_token", auth.decode_token), ("verify_token", auth.verify_token)):
+        fn(token)  # 预热（verify_token 写入缓存）
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn(token)
+        per_call_us = (time.perf_counter() - started) / iterations * 1_000_000
+        print(f"  {name:>12}: {per_call_us:7.2f} us/次")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="认证开销基准")
+    parser.add_argument("--rounds", type=int, default=auth.BCRYPT_ROUNDS, help="登录压测使用的 bcrypt 成本因子")
+    parser.add_argument("--logins", type=int, default=20, help="并发登录次数")
+    parser.add_argument("--iterations", type=int, default=20000, help="鉴权压测次数")
+    args = parser.parse_args()
+
+    bench_cost(args.rounds)
+    bench_logins(args.rounds, args.logins)
+    bench_tokens(args.iterations)
+
+
+if __name__ == "__main__":
+    main()
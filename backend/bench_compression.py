@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+响应压缩：各编码 / 级别的 CPU 耗时与节省字节对比。
+
+默认用仿真的管理端响应（含中文识别回答的举报列表、数据导出、工单分析），也可用 --file 传入
+从浏览器保存的真实响应 JSON（可多次指定）。对每个载荷输出压缩后大小、压缩比、压缩 / 解压耗时，
+以及在 --mbps 带宽下节省的传输时间与压缩耗时的对比。
+
+执行方式：
+    cd backend
+    python bench_compression.py
+    python bench_compression.py --file reports.json --file data.json --mbps 5
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_ANSWERS = (
+    "图片中可见一辆白色小型轿车停放在非机动车道内，车身完全占用车道，周边有电动车被迫绕行，判断为违章停车。",
+    "画面中一名骑电动车的人员未佩戴安全头盔，正在路口等待通行，属于未按规定佩戴头盔的违法行为。",
+    "路口信号灯为红灯，一辆电动自行车越过停止线继续行驶，疑似闯红灯，建议人工复核。",
+    "未发现明显交通违法行为，车辆均在规定车道内正常行驶。",
+)
+_EVENT_TYPES = ("违章停车", "未戴头盔", "闯红灯", "逆行", "其他")
+_LOCATIONS = ("学府路与长江路交叉口", "图书馆东侧停车场", "二号教学楼南门", "校医院门前", "北门外非机动车道")
+
+
+def _reports(n: int) -> List[Dict]:
+    rnd = random.Random(1)
+    base = datetime(2024, 3, 1, 8, 0, 0)
+    items = []
+    for i in range(n):
+        images = [f"/uploads/reports/2024/03/{i:06d}_{k}.jpg" for k in range(rnd.randint(1, 3))]
+        items.append({
+            "id": i, "report_id": i, "user_id": rnd.randint(1, 500), "username": f"student{rnd.randint(1, 500)}",
+            "event_type": rnd.choice(_EVENT_TYPES), "location": rnd.choice(_LOCATIONS),
+            "description": rnd.choice(_ANSWERS)[: rnd.randint(10, 40)],
+            "status": rnd.choice(("pending", "manual_review", "approved")),
+            "images": images, "thumbnails": [p.replace(".jpg", "_thumb.jpg") for p in images],
+            "recognition_results": [{
+                "question": "请判断图片中是否存在交通违法行为，并说明违法类型。",
+                "answer": rnd.choice(_ANSWERS), "event_type_detected": rnd.choice(_EVENT_TYPES),
+                "confidence": round(rnd.uniform(0.5, 0.99), 2),
+            }],
+            "auto_review_result": rnd.choice(("approved", "need_review")),
+            "auto_review_confidence": round(rnd.uniform(0.5, 0.99), 2),
+            "created_at": (base + timedelta(minutes=7 * i)).isoformat(),
+        })
+    return items
+
+
+def _data_items(n: int) -> List[Dict]:
+    rnd = random.Random(2)
+    base = datetime(2024, 3, 1, 8, 0, 0)
+    return [{
+        "id": i, "report_id": i // 2,
+        "image_url": f"/uploads/reports/2024/03/{i:06d}.jpg", "thumbnail_url": f"/uploads/reports/2024/03/{i:06d}_thumb.jpg",
+        "event_type": rnd.choice(_EVENT_TYPES), "label": rnd.choice(_EVENT_TYPES),
+        "confidence": round(rnd.uniform(0.5, 0.99), 2),
+        "recognition_result": {
+            "event_type": rnd.choice(_EVENT_TYPES), "confidence": round(rnd.uniform(0.5, 0.99), 2),
+            "answer": rnd.choice(_ANSWERS),
+            "structured_data": {"plate": None, "helmet": rnd.random() > 0.5, "vehicle": "电动自行车"},
+            "created_at": (base + timedelta(minutes=3 * i)).isoformat(),
+        },
+        "created_at": (base + timedelta(minutes=3 * i)).isoformat(),
+    } for i in range(n)]
+
+
+def _analytics() -> Dict:
+    rnd = random.Random(3)
+    days = [(datetime(2024, 1, 1) + timedelta(days=d)).date().isoformat() for d in range(180)]
+    return {
+        "summary": {"total": 12840, "accidents": 312},
+        "by_category": {c: rnd.randint(100, 3000) for c in _EVENT_TYPES},
+        "by_location": {loc: rnd.randint(50, 900) for loc in _LOCATIONS},
+        "daily": [{"date": d, **{c: rnd.randint(0, 40) for c in _EVENT_TYPES}} for d in days],
+    }
+
+
+def payloads(files: List[str]) -> List[Tuple[str, bytes]]:
+    if files:
+        result = []
+        for path in files:
+            with open(path, "rb") as f:
+                result.append((os.path.basename(path), f.read()))
+        return result
+
+    def encode(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    return [
+        ("reports page=20", encode({"items": _reports(20), "total": 5000})),
+        ("reports page=200", encode({"items": _reports(200), "total": 5000})),
+        ("data items 1000", encode({"items": _data_items(1000), "next_cursor": "x"})),
+        ("analytics", encode(_analytics())),
+    ]
+
+
+def codecs() -> List[Tuple[str, Callable[[bytes], bytes], Callable[[bytes], bytes]]]:
+    result = [
+        (f"gzip-{lv}", (lambda d, lv=lv: gzip.compress(d, compresslevel=lv, mtime=0)), gzip.decompress)
+        for lv in (1, 6, 9)
+    ]
+    if brotli is not None:
+        result += [
+            (f"br-{q}", (lambda d, q=q: brotli.compress(d, quality=q)), brotli.decompress)
+            for q in (1, 4, 6, 11)
+        ]
+    if zstandard is not None:
+        dctx = zstandard.ZstdDecompressor()
+        result += [
+            (f"zstd-{lv}", zstandard.ZstdCompressor(level=lv).compress, dctx.decompress)
+            for lv in (1, 3, 9, 19)
+        ]
+    return result
+
+
+def _median_ms(fn: Callable[[], object], rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return samples[len(samples) // 2] * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="响应压缩 CPU 耗时与节省字节对比")
+    parser.add_argument("--file", action="append", default=[], help="真实响应 JSON 文件，可多次指定")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--mbps", type=float, default=10.0, help="估算传输时间使用的带宽（Mbit/s）")
+    args = parser.parse_args()
+
+    missing = [name for name, mod in (("brotli", brotli), ("zstandard", zstandard)) if mod is None]
+    if missing:
+        print(f"未安装 {', '.join(missing)}，跳过对应编码")
+    bytes_per_ms = args.mbps * 1_000_000 / 8 / 1000
+
+    for name, body in payloads(args.file):
+        print(f"\n{name}: {len(body)} bytes（传输约 {len(body) / bytes_per_ms:.1f} ms @ {args.mbps:g} Mbit/s）")
+        print(f"{'codec':>8} {'bytes':>9} {'ratio':>6} {'comp ms':>8} {'decomp ms':>9} {'saved ms':>9}")
+        for codec, compress, decompress in codecs():
+            data = compress(body)
+            assert decompress(data) == body
+            comp_ms = _median_ms(lambda: compress(body), args.rounds)
+            decomp_ms = _median_ms(lambda: decompress(data), args.rounds)
+            # 节省的传输时间减去压缩与解压耗时，正数表示整体更快
+            saved_ms = (len(body) - len(data)) / bytes_per_ms - comp_ms - decomp_ms
+            print(
+                f"{codec:>8} {len(data):>9} {len(body) / len(data):>6.1f} "
+                f"{comp_ms:>8.2f} {decomp_ms:>9.2f} {saved_ms:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+对比在 async 接口中使用同步 Session 与 AsyncSession 的并发表现。
+
+模拟 N 个并发请求，每个请求执行若干次查询；同时运行一个心跳协程，记录事件循环的最大停顿。
+同步 Session 在协程中直接查询会阻塞事件循环，请求只能串行；AsyncSession 查询期间让出事件循环。
+
+执行方式：
+    cd backend
+    python bench_db.py                                   # 使用 env 中的 DATABASE_URL（MySQL，默认 SELECT SLEEP(0.01)）
+    python bench_db.py --url sqlite:///bench.db          # SQLite 替身（需 pip install aiosqlite）
+    python bench_db.py --concurrency 50 --queries 5 --sql "SELECT COUNT(*) FROM reports"
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Dict
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+# SQLite 没有 SLEEP，用递归 CTE 制造一段查询耗时
+_SQLITE_SQL = (
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 20000) "
+    "SELECT COUNT(*) FROM c"
+)
+_MYSQL_SQL = "SELECT SLEEP(0.01)"
+
+
+def _async_url(url: str) -> str:
+    for sync_prefix, async_prefix in (("mysql+pymysql://", "mysql+aiomysql://"), ("sqlite://", "sqlite+aiosqlite://")):
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
+
+
+async def _heartbeat(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """返回事件循环最大停顿（毫秒）。"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst * 1000
+
+
+def _pool(url: str, size: int) -> Dict[str, Any]:
+    return {} if url.startswith("sqlite") else {"pool_size": size, "max_overflow": 0}
+
+
+async def bench_sync(url: str, sql: str, concurrency: int, queries: int, pool: int) -> Dict[str, Any]:
+    engine = create_engine(url, **_pool(url, pool))
+
+    async def request() -> None:
+        with engine.connect() as conn:
+            for _ in range(queries):
+                conn.execute(text(sql)).all()
+
+    return await _run(request, concurrency, engine.dispose)
+
+
+async def bench_async(url: str, sql: str, concurrency: int, queries: int, pool: int) -> Dict[str, Any]:
+    async_url = os.getenv("ASYNC_DATABASE_URL") or _async_url(url)
+    engine = create_async_engine(async_url, **_pool(async_url, pool))
+
+    async def request() -> None:
+        async with engine.connect() as conn:
+            for _ in range(queries):
+                (await conn.execute(text(sql))).all()
+
+    result = await _run(request, concurrency, None)
+    await engine.dispose()
+    return result
+
+
+async def _run(request, concurrency: int, dispose) -> Dict[str, Any]:
+    await request()  # 预热连接池
+    stop = asyncio.Event()
+    beat = asyncio.create_task(_heartbeat(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(request() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    max_stall = await beat
+    if dispose:
+        dispose()
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(concurrency / elapsed, 1),
+        "max_loop_stall_ms": round(max_stall, 1),
+    }
+
+
+def main() -> None:
+    load_dotenv(os.path.join(os.path.dirname(__file__), "env"))
+    parser = argparse.ArgumentParser(description="同步 Session vs AsyncSession 并发对比")
+    parser.add_argument("--url", default=os.getenv("DATABASE_URL", "sqlite:///bench.db"), help="同步 URL；异步 URL 自动换驱动")
+    parser.add_argument("--sql", default=None, help="每次查询执行的 SQL")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=3, help="每个请求的查询次数")
+    parser.add_argument("--pool-size", type=int, default=int(os.getenv("DB_POOL_SIZE", "10")))
+    args = parser.parse_args()
+    sql = args.sql or (_SQLITE_SQL if args.url.startswith("sqlite") else _MYSQL_SQL)
+
+    print(f"url={args.url.split('@')[-1]} concurrency={args.concurrency} queries={args.queries}")
+    for name, bench in (("sync Session", bench_sync), ("AsyncSession", bench_async)):
+        result = asyncio.run(bench(args.url, sql, args.concurrency, args.queries, args.pool_size))
+        print(f"{name:>13}: {result}")
+
+
+if __name__ == "__main__":
+    main()
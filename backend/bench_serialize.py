@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+工单列表序列化耗时对比（不连数据库，使用内存中的仿真行）。
+
+    dict+jsonable_encoder+json   原实现：逐行 isoformat 构造 dict，FastAPI 默认 jsonable_encoder + json.dumps
+    dict+orjson                  同样构造 dict，直接返回 FastJSONResponse（跳过 jsonable_encoder）
+    RowSerializer+orjson         预编译字段序列化器，datetime 交给 orjson 编码
+
+执行方式：
+    cd backend
+    python bench_serialize.py                     # 默认 1000 行 × 50 轮
+    python bench_serialize.py --rows 1000 --rounds 200
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+
+from serializers import RowSerializer, dumps
+
+_FIELDS = (
+    "id", "ticket_no", "report_id", "event_type", "location", "description", "status", "priority",
+    "assigned_to", "assigned_department", "assigned_unit", "department_code", "unit_code",
+    "created_at", "updated_at",
+)
+
+
+def make_rows(n: int) -> List[Any]:
+    base = datetime(2024, 1, 1, 8, 0, 0)
+    return [
+        SimpleNamespace(
+            id=i,
+            ticket_no=f"T{20240101000000 + i}",
+            report_id=i,
+            event_type="违章停车",
+            location=f"学府路与长江路交叉口东侧 {i % 97} 号",
+            description="机动车占用非机动车道停放，影响通行。" * 2,
+            status=("pending", "assigned", "processing", "resolved")[i % 4],
+            priority="medium",
+            assigned_to=None,
+            assigned_department="交警支队",
+            assigned_unit="第一大队",
+            department_code="JJ",
+            unit_code="JJ-01",
+            created_at=base + timedelta(minutes=i, microseconds=i),
+            updated_at=base + timedelta(minutes=i + 5),
+            images=[f"/uploads/reports/{i}_0.jpg", f"/uploads/reports/{i}_1.jpg"],
+        )
+        for i in range(n)
+    ]
+
+
+def _legacy_row(t) -> Dict[str, Any]:
+    return {
+        "id": t.id,
+        "ticket_no": t.ticket_no,
+        "report_id": t.report_id,
+        "event_type": t.event_type,
+        "location": t.location,
+        "description": t.description,
+        "status": t.status,
+        "priority": t.priority,
+        "assigned_to": t.assigned_to,
+        "assigned_department": t.assigned_department,
+        "assigned_unit": t.assigned_unit,
+        "department_code": t.department_code,
+        "unit_code": t.unit_code,
+        "images": list(t.images),
+        "created_at": t.created_at.isoformat(),
+        "updated_at": t.updated_at.isoformat(),
+    }
+
+
+def legacy(rows) -> bytes:
+    content = jsonable_encoder({"items": [_legacy_row(t) for t in rows], "total": len(rows)})
+    # 与 starlette JSONResponse.render 参数一致
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def dict_orjson(rows) -> bytes:
+    return dumps({"items": [_legacy_row(t) for t in rows], "total": len(rows)})
+
+
+_serializer = RowSerializer(_FIELDS)
+
+
+def precomputed(rows) -> bytes:
+    items = []
+    for t in rows:
+        row = _serializer(t)
+        row["images"] = list(t.images)
+        items.append(row)
+    return dumps({"items": items, "total": len(rows)})
+
+
+def _time(fn: Callable[[List[Any]], bytes], rows, rounds: int) -> Dict[str, Any]:
+    fn(rows)  # 预热
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        body = fn(rows)
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return {
+        "median_ms": round(samples[len(samples) // 2] * 1000, 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1] * 1000, 3),
+        "bytes": len(body),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="工单列表序列化耗时对比")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    # 三种实现输出内容一致
+    assert json.loads(legacy(rows)) == json.loads(dict_orjson(rows)) == json.loads(precomputed(rows))
+
+    print(f"rows={args.rows} rounds={args.rounds}")
+    for name, fn in (
+        ("dict+jsonable_encoder+json", legacy),
+        ("dict+orjson", dict_orjson),
+        ("RowSerializer+orjson", precomputed),
+    ):
+        print(f"{name:>27}: {_time(fn, rows, args.rounds)}")
+
+
+if __name__ == "__main__":
+    main()
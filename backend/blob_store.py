@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+内容寻址上传存储（UPLOAD_CAS=true）：引用登记、存量迁移与引用计数垃圾回收。
+
+对象按 SHA-256 存为 uploads/cas_<sha256><ext>；库中各表保存的 image_url 仍是每次上传唯一的
+逻辑路径，经 upload_refs 映射到 upload_blobs。重复上传只新增一条引用记录。
+
+执行方式：
+    cd backend
+    python blob_store.py migrate --dry-run       # 统计可迁移的存量对象
+    python blob_store.py migrate                 # 将 uploads/ 下存量对象改写为内容寻址 key
+    python blob_store.py gc --grace-hours 24     # 回收无引用的对象与未登记的孤立对象
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import exists
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from object_storage import (
+    StoredUpload,
+    blob_key,
+    cas_enabled,
+    delete_upload,
+    is_blob_key,
+    list_upload_keys,
+    list_upload_objects,
+    read_upload,
+    stat_upload,
+    suffix_and_mime,
+    write_upload,
+)
+
+
+def register_upload(db: Session, stored: StoredUpload) -> None:
+    """在当前事务中登记 库中路径 -> blob，并增加引用计数；非内容寻址上传直接跳过。"""
+    from app import UploadBlob, UploadRef
+
+    if not stored.blob_key:
+        return
+    if db.get(UploadBlob, stored.sha256) is None:
+        try:
+            with db.begin_nested():
+                db.add(UploadBlob(
+                    sha256=stored.sha256,
+                    object_key=stored.blob_key,
+                    size=stored.size,
+                    content_type=suffix_and_mime(stored.blob_key)[1],
+                    ref_count=0,
+                ))
+        except IntegrityError:
+            # 并发上传了相同内容，对方已登记
+            pass
+    db.add(UploadRef(image_url=stored.path, blob_sha256=stored.sha256))
+    db.query(UploadBlob).filter(UploadBlob.sha256 == stored.sha256).update(
+        {UploadBlob.ref_count: UploadBlob.ref_count + 1}, synchronize_session=False
+    )
+
+
+def resolve_blob_key(key: str) -> Optional[str]:
+    """库中路径 -> 内容寻址对象 key（供 object_storage 读取时解析）。"""
+    from app import SessionLocal, UploadBlob, UploadRef
+
+    db = SessionLocal()
+    try:
+        row = (
+            db.query(UploadBlob.object_key)
+            .join(UploadRef, UploadRef.blob_sha256 == UploadBlob.sha256)
+            .filter(UploadRef.image_url == key)
+            .first()
+        )
+        return row[0] if row else None
+    finally:
+        db.close()
+
+
+def migrate(dry_run: bool = False, keep_originals: bool = False, batch_size: int = 200) -> Dict[str, Any]:
+    """将 uploads/ 下按时间戳命名的存量对象改写为内容寻址对象。
+
+    原路径登记为引用，库中已有 image_url 无需改动；提交后删除原对象（--keep-originals 保留）。
+    """
+    from app import SessionLocal, UploadRef
+    from image_derivatives import derivative_source
+
+    if not cas_enabled():
+        raise RuntimeError("请先在 env 中设置 UPLOAD_CAS=true，否则迁移后的旧路径无法解析")
+
+    stats = {"scanned": 0, "migrated": 0, "deduplicated": 0, "skipped": 0, "bytes_saved": 0}
+    pending: List[str] = []
+    db = SessionLocal()
+    try:
+        for key in list_upload_keys():
+            name = Path(key).name
+            if is_blob_key(key) or name.startswith("tmp_") or derivative_source(name):
+                continue
+            stats["scanned"] += 1
+            if db.query(exists().where(UploadRef.image_url == key)).scalar():
+                stats["skipped"] += 1
+                continue
+            data = read_upload(key)
+            if data is None:
+                stats["skipped"] += 1
+                continue
+
+            sha = hashlib.sha256(data).hexdigest()
+            target = blob_key(sha, Path(name).suffix)
+            if stat_upload(target):
+                stats["deduplicated"] += 1
+                stats["bytes_saved"] += len(data)
+            elif not dry_run:
+                write_upload(target, data)
+            stats["migrated"] += 1
+            if dry_run:
+                continue
+
+            register_upload(db, StoredUpload(path=key, size=len(data), sha256=sha, blob_key=target))
+            pending.append(key)
+            if len(pending) >= batch_size:
+                _commit_migrated(db, pending, keep_originals)
+        if not dry_run:
+            _commit_migrated(db, pending, keep_originals)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return stats
+
+
+def _commit_migrated(db: Session, keys: List[str], keep_originals: bool) -> None:
+    db.commit()
+    if not keep_originals:
+        for key in keys:
+            delete_upload(key)
+    keys.clear()
+
+
+def gc(grace_hours: float = 24, dry_run: bool = False) -> Dict[str, Any]:
+    """引用计数回收。
+
+    1. 删除已无任何记录使用的引用（超过宽限期），并递减对应 blob 的 ref_count；
+    2. 删除 ref_count 归零且超过宽限期的 blob：逐行条件删除（仍为零引用才删），删到行的才删对象；
+    3. 扫描存储：没有 upload_blobs 记录的 cas_* 对象（上传失败、事务回滚）与残留的 tmp_* 对象，
+       超过宽限期的一并删除。
+    先提交数据库再删对象：中断时最多残留孤立对象（下次由第 3 步回收），不会出现指向空对象的记录。
+    """
+    from app import Message, ModelRecognitionResult, ReportImage, SessionLocal, UploadBlob, UploadRef
+    from image_derivatives import VARIANTS, derivative_path
+
+    cutoff = datetime.utcnow() - timedelta(hours=grace_hours)
+    stats = {"refs_removed": 0, "blobs_removed": 0, "orphans_removed": 0, "bytes_freed": 0}
+    db = SessionLocal()
+    try:
+        stale_refs = (
+            db.query(UploadRef)
+            .filter(
+                UploadRef.created_at < cutoff,
+                ~exists().where(ReportImage.image_url == UploadRef.image_url),
+                ~exists().where(Message.image_url == UploadRef.image_url),
+                ~exists().where(ModelRecognitionResult.image_url == UploadRef.image_url),
+            )
+            .all()
+        )
+        stale_keys = [r.image_url for r in stale_refs]
+        stats["refs_removed"] = len(stale_refs)
+        for ref in stale_refs:
+            db.query(UploadBlob).filter(UploadBlob.sha256 == ref.blob_sha256).update(
+                {UploadBlob.ref_count: UploadBlob.ref_count - 1}, synchronize_session=False
+            )
+            db.delete(ref)
+        db.flush()
+
+        candidates = (
+            db.query(UploadBlob.sha256, UploadBlob.object_key, UploadBlob.size)
+            .filter(UploadBlob.ref_count <= 0, UploadBlob.created_at < cutoff)
+            .all()
+        )
+        dead: Dict[str, str] = {}
+        for sha, key, size in candidates:
+            # 条件删除：期间若有新上传登记了同一内容，影响行数为 0，对象保留
+            removed = (
+                db.query(UploadBlob)
+                .filter(
+                    UploadBlob.sha256 == sha,
+                    UploadBlob.ref_count <= 0,
+                    ~exists().where(UploadRef.blob_sha256 == sha),
+                )
+                .delete(synchronize_session=False)
+            )
+            if removed:
+                dead[sha] = key
+                stats["blobs_removed"] += 1
+                stats["bytes_freed"] += int(size or 0)
+
+        if dry_run:
+            db.rollback()
+            stats["orphans_removed"] = len(_orphan_objects(db, cutoff, stats))
+            return stats
+        db.commit()
+
+        for key in stale_keys:
+            for variant in VARIANTS:
+                delete_upload(derivative_path(key, variant))
+        for sha, key in dead.items():
+            # 提交后到删除前又有相同内容上传并重新登记时保留对象
+            if db.get(UploadBlob, sha) is None:
+                delete_upload(key)
+
+        for key in _orphan_objects(db, cutoff, stats):
+            delete_upload(key)
+            stats["orphans_removed"] += 1
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return stats
+
+
+def _orphan_objects(db: Session, cutoff: datetime, stats: Dict[str, Any], batch_size: int = 500) -> List[str]:
+    """存储中早于 cutoff 的 tmp_* 对象与没有 upload_blobs 记录的 cas_* 对象；大小计入 bytes_freed。"""
+    from app import UploadBlob
+    from image_derivatives import derivative_source
+
+    cutoff = cutoff.replace(tzinfo=timezone.utc)
+    orphans: List[str] = []
+    pending: Dict[str, int] = {}
+
+    def check() -> None:
+        known = {
+            k for (k,) in db.query(UploadBlob.object_key).filter(UploadBlob.object_key.in_(list(pending)))
+        }
+        for key, size in pending.items():
+            if key not in known:
+                orphans.append(key)
+                stats["bytes_freed"] += size
+        pending.clear()
+
+    for key, size, modified in list_upload_objects():
+        if modified >= cutoff:
+            continue
+        name = Path(key).name
+        if name.startswith("tmp_"):
+            orphans.append(key)
+            stats["bytes_freed"] += size
+        elif is_blob_key(key) and not derivative_source(name):
+            pending[key] = size
+            if len(pending) >= batch_size:
+                check()
+    if pending:
+        check()
+    return orphans
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="内容寻址上传存储：迁移与垃圾回收")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_migrate = sub.add_parser("migrate", help="将存量 uploads/ 对象改写为内容寻址 key")
+    p_migrate.add_argument("--dry-run", action="store_true")
+    p_migrate.add_argument("--keep-originals", action="store_true", help="迁移后保留原对象")
+    p_migrate.add_argument("--batch-size", type=int, default=200)
+    p_gc = sub.add_parser("gc", help="回收无引用的对象")
+    p_gc.add_argument("--dry-run", action="store_true")
+    p_gc.add_argument("--grace-hours", type=float, default=24)
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        result = migrate(dry_run=args.dry_run, keep_originals=args.keep_originals, batch_size=args.batch_size)
+    else:
+        result = gc(grace_hours=args.grace_hours, dry_run=args.dry_run)
+    print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""对话上下文：按条数上限取最近消息、按 token 预算裁剪，裁掉的早期轮次并入会话滚动摘要。
+
+摘要与已并入的最大消息 id 存在 chat_sessions 上，每轮只处理新裁掉的消息，
+单轮开销不随会话长度增长。读取（load_window）与合并摘要（fold_summary）分开，
+便于调用方在模型调用期间不持有数据库连接。默认摘要为抽取式（截取每条消息开头），
+CHAT_SUMMARY_WITH_MODEL=true 时调用模型压缩。
+"""
+from __future__ import annotations
+
+import os
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+HISTORY_MAX_MESSAGES = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", "40"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "3000"))
+SUMMARY_MAX_CHARS = int(os.getenv("CHAT_SUMMARY_MAX_CHARS", "1200"))
+SUMMARY_WITH_MODEL = os.getenv("CHAT_SUMMARY_WITH_MODEL", "false").lower() in ("1", "true", "yes", "on")
+# 抽取式摘要中每条消息保留的字符数
+_EXCERPT_CHARS = 80
+
+_CJK = re.compile(r"[　-〿㐀-鿿豈-﫿＀-￯]")
+_ROLE_LABEL = {"user": "用户", "assistant": "助手"}
+
+Summarizer = Callable[[str, List[Dict[str, str]]], str]
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中日韩字符按 1 个，其余按 4 个字符 1 个。"""
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _entry(msg) -> Dict[str, str]:
+    return {"role": msg.role, "content": msg.content or ""}
+
+
+def _extractive(summary: str, turns: List[Dict[str, str]]) -> str:
+    lines = [summary] if summary else []
+    for t in turns:
+        text = " ".join(t["content"].split())
+        if not text:
+            continue
+        excerpt = text[:_EXCERPT_CHARS] + ("…" if len(text) > _EXCERPT_CHARS else "")
+        lines.append(f"{_ROLE_LABEL.get(t['role'], t['role'])}：{excerpt}")
+    merged = "\n".join(lines)
+    # 超长时丢弃最早的内容
+    return merged[-SUMMARY_MAX_CHARS:] if len(merged) > SUMMARY_MAX_CHARS else merged
+
+
+def load_window(
+    db: Session,
+    chat_session,
+    before_id: int,
+) -> Tuple[Optional[str], List[Dict[str, str]], List[Dict[str, str]], Optional[int]]:
+    """读取 id < before_id 的最近若干条消息，按条数上限与 token 预算裁剪。
+
+    超出条数上限或 token 预算的未并入消息都计入待并入部分，不会既不发送也不进摘要。
+    返回 (当前摘要, 保留的历史, 需并入摘要的消息, 并入后的 summary_upto_id)；只读，不修改会话。
+    """
+    from app import Message
+
+    upto = chat_session.summary_upto_id or 0
+    unfolded = db.query(Message).filter(
+        Message.session_id == chat_session.id, Message.id < before_id, Message.id > upto
+    )
+    # 多取一条判断是否超出条数上限
+    recent = unfolded.order_by(Message.id.desc()).limit(HISTORY_MAX_MESSAGES + 1).all()
+    overflow: List = []
+    if len(recent) > HISTORY_MAX_MESSAGES:
+        recent = recent[:HISTORY_MAX_MESSAGES]
+        overflow = unfolded.filter(Message.id < recent[-1].id).order_by(Message.id.desc()).all()
+
+    budget = HISTORY_TOKEN_BUDGET - estimate_tokens(chat_session.summary or "")
+    kept: List = []
+    used = 0
+    for msg in recent:  # 从新到旧
+        cost = estimate_tokens(msg.content or "") + 4
+        if kept and used + cost > budget:
+            break
+        kept.append(msg)
+        used += cost
+    evicted = recent[len(kept):] + overflow  # 从新到旧
+
+    return (
+        chat_session.summary or None,
+        [_entry(m) for m in reversed(kept)],
+        [_entry(m) for m in reversed(evicted)],
+        evicted[0].id if evicted else None,
+    )
+
+
+def fold_summary(summary: Optional[str], turns: List[Dict[str, str]], summarizer: Optional[Summarizer] = None) -> str:
+    """把新裁掉的消息并入摘要；模型摘要失败时退回抽取式。"""
+    if summarizer is not None:
+        try:
+            return summarizer(summary or "", turns)[:SUMMARY_MAX_CHARS]
+        except Exception:
+            pass
+    return _extractive(summary or "", turns)
+
+
+def model_summarizer(call: Callable[[List[Dict]], str]) -> Summarizer:
+    """用模型压缩摘要；call 接收 messages 返回文本。"""
+
+    def summarize(summary: str, turns: List[Dict[str, str]]) -> str:
+        dialogue = "\n".join(f"{_ROLE_LABEL.get(t['role'], t['role'])}：{t['content']}" for t in turns)
+        prompt = (
+            f"请将以下对话要点合并进已有摘要，保留用户诉求、地点、事件和已给出的结论，"
+            f"不超过 {SUMMARY_MAX_CHARS // 2} 字，只输出摘要正文。\n\n"
+            f"已有摘要：\n{summary or '（无）'}\n\n新增对话：\n{dialogue}"
+        )
+        return call([{"role": "user", "content": prompt}]).strip()
+
+    return summarize
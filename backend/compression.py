@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+响应压缩中间件：按 Accept-Encoding 协商 zstd / br / gzip，仅压缩超过阈值的文本类响应。
+
+- 单块响应体小于 COMPRESSION_MIN_SIZE 原样返回；不小于 COMPRESSION_THREAD_MIN_SIZE 时在线程池中压缩，
+  不阻塞事件循环。
+- 流式响应（如 NDJSON 导出）使用增量压缩器逐块输出。
+- 已带 Content-Encoding、非文本类型（图片、文件下载等）或 Range 请求不处理。
+
+brotli、zstandard 为可选依赖，未安装时不参与协商，gzip 始终可用。
+"""
+from __future__ import annotations
+
+import gzip
+import os
+import zlib
+from typing import Callable, Dict, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+THREAD_MIN_SIZE = int(os.getenv("COMPRESSION_THREAD_MIN_SIZE", "65536"))
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+# 服务端偏好顺序（客户端 q 值相同时按此顺序选择）
+PREFERENCE = tuple(
+    e.strip() for e in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",") if e.strip()
+)
+
+_COMPRESSIBLE = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+
+
+class _Stream:
+    """增量压缩器统一接口：compress(chunk) / flush()。"""
+
+    def __init__(self, compress: Callable[[bytes], bytes], flush: Callable[[], bytes]):
+        self.compress = compress
+        self.flush = flush
+
+
+def _gzip_stream() -> _Stream:
+    c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return _Stream(c.compress, c.flush)
+
+
+def _br_stream() -> _Stream:
+    c = brotli.Compressor(quality=BROTLI_QUALITY)
+    return _Stream(c.process, c.finish)
+
+
+def _zstd_stream() -> _Stream:
+    c = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return _Stream(c.compress, c.flush)
+
+
+# 编码 -> (整块压缩, 增量压缩器工厂)
+CODECS: Dict[str, Tuple[Callable[[bytes], bytes], Callable[[], _Stream]]] = {
+    "gzip": (lambda data: gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0), _gzip_stream),
+}
+if brotli is not None:
+    CODECS["br"] = (lambda data: brotli.compress(data, quality=BROTLI_QUALITY), _br_stream)
+if zstandard is not None:
+    CODECS["zstd"] = (lambda data: zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data), _zstd_stream)
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """按客户端 q 值与服务端偏好选择编码；无可用编码返回 None。"""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+    best, best_q = None, 0.0
+    for encoding in PREFERENCE:
+        if encoding not in CODECS:
+            continue
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "").lower()
+    return content_type.startswith(_COMPRESSIBLE)
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = MIN_SIZE, thread_minimum_size: int = THREAD_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_minimum_size = thread_minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        encoding = None if "range" in headers else negotiate(headers.get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _Responder(self, encoding, send).run(scope, receive)
+
+
+class _Responder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.app = middleware.app
+        self.minimum_size = middleware.minimum_size
+        self.thread_minimum_size = middleware.thread_minimum_size
+        self.encoding = encoding
+        self.send = send
+        self.start: Optional[Message] = None
+        self.active = False
+        self.stream: Optional[_Stream] = None
+
+    async def run(self, scope: Scope, receive: Receive) -> None:
+        await self.app(scope, receive, self.handle)
+
+    def _headers(self, length: Optional[int]) -> None:
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(length)
+
+    async def handle(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # 等到第一块响应体再决定是否压缩
+            self.start = message
+            self.active = 200 <= message["status"] < 300 and message["status"] != 204 and _compressible(
+                Headers(raw=message["headers"])
+            )
+            if not self.active:
+                await self.send(message)
+            return
+        if message["type"] != "http.response.body" or not self.active:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.stream is None and not more_body:
+            # 单块响应
+            if len(body) < self.minimum_size:
+                await self.send(self.start)
+                await self.send(message)
+                return
+            compress = CODECS[self.encoding][0]
+            if len(body) >= self.thread_minimum_size:
+                data = await anyio.to_thread.run_sync(compress, body)
+            else:
+                data = compress(body)
+            self._headers(len(data))
+            await self.send(self.start)
+            await self.send({"type": "http.response.body", "body": data})
+            return
+
+        if self.stream is None:
+            # 流式响应：长度未知，去掉 Content-Length
+            self.stream = CODECS[self.encoding][1]()
+            self._headers(None)
+            await self.send(self.start)
+        data = self.stream.compress(body) if body else b""
+        if not more_body:
+            data += self.stream.flush()
+        if data or not more_body:
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
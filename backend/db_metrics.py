@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""按请求统计 SQL 条数与耗时（SQLAlchemy 事件 + contextvars），用于发现 N+1 查询；
+并统计连接池连接的占用时长（checkout -> checkin），用于发现跨模型调用等 I/O 持有连接。"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# 单次占用超过该时长计为长占用
+LONG_HOLD_SECONDS = float(os.getenv("DB_POOL_LONG_HOLD_MS", "1000")) / 1000
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    elapsed: float = 0.0
+    # 本请求内连接占用总时长（已归还的连接）
+    held: float = 0.0
+
+    @property
+    def elapsed_ms(self) -> float:
+        return round(self.elapsed * 1000, 2)
+
+    @property
+    def held_ms(self) -> float:
+        return round(self.held * 1000, 2)
+
+
+@dataclass
+class PoolStats:
+    checkouts: int = 0
+    in_use: int = 0
+    held_total: float = 0.0
+    held_max: float = 0.0
+    long_holds: int = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["held_avg_ms"] = round(self.held_total / self.checkouts * 1000, 2) if self.checkouts else 0.0
+        data["held_max_ms"] = round(data.pop("held_max") * 1000, 2)
+        data["held_total_ms"] = round(data.pop("held_total") * 1000, 2)
+        return data
+
+
+_pools: Dict[str, Any] = {}
+_pool_lock = threading.Lock()
+
+
+# 请求级可变统计对象：同步接口在线程池中执行时会复制上下文，共享同一个对象
+_current: ContextVar[Optional[QueryStats]] = ContextVar("db_query_stats", default=None)
+
+
+def install(engine: Engine, name: str = "default") -> None:
+    """在引擎上注册计数钩子（未处于统计范围内的语句不计数）与连接池占用统计。"""
+    pool_stats = PoolStats()
+    _pools[name] = (engine, pool_stats)
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_conn, record, proxy):
+        record.info["_checkout_at"] = time.perf_counter()
+        record.info["_checkout_stats"] = _current.get()
+        with _pool_lock:
+            pool_stats.checkouts += 1
+            pool_stats.in_use += 1
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_conn, record):
+        started = record.info.pop("_checkout_at", None)
+        request_stats = record.info.pop("_checkout_stats", None)
+        if started is None:
+            return
+        held = time.perf_counter() - started
+        with _pool_lock:
+            pool_stats.in_use -= 1
+            pool_stats.held_total += held
+            pool_stats.held_max = max(pool_stats.held_max, held)
+            if held >= LONG_HOLD_SECONDS:
+                pool_stats.long_holds += 1
+        if request_stats is not None:
+            request_stats.held += held
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stats = _current.get()
+        started = conn.info.get("_query_started")
+        if stats is None or not started:
+            return
+        stats.count += 1
+        stats.elapsed += time.perf_counter() - started.pop()
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """各引擎连接池的占用统计与当前状态。"""
+    with _pool_lock:
+        result = {name: stats.snapshot() for name, (_, stats) in _pools.items()}
+    for name, (engine, _) in _pools.items():
+        result[name]["pool"] = engine.pool.status()
+    return result
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """统计代码块内执行的 SQL，例如：
+
+        with track_queries() as stats:
+            ...
+        assert stats.count <= 3
+    """
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
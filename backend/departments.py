@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 """学校后勤调度部门树与事件类型默认指派建议。"""
 
+from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 # 部门 code -> 下级处室（可按本单位组织架构改）
@@ -69,6 +70,8 @@ _EVENT_DEFAULT: Dict[str, tuple] = {
     "设施": ("logistics_office", "facility_maintenance"),
     "其他": ("other", "other_contact"),
 }
+# 均不命中时的兜底事件类型
+FALLBACK_EVENT = "其他"
 
 
 def _find_names(dept_code: str, unit_code: str) -> Optional[Dict[str, str]]:
@@ -81,28 +84,33 @@ def _find_names(dept_code: str, unit_code: str) -> Optional[Dict[str, str]]:
     return None
 
 
-def suggest_assignment(event_type: Optional[str]) -> Optional[Dict[str, str]]:
-    """根据事件类型给出默认部门/处室（可人工修改）。"""
-    if not event_type:
-        return None
-    et = event_type.strip()
-    codes = _EVENT_DEFAULT.get(et)
-    if not codes:
-        for k, v in _EVENT_DEFAULT.items():
-            if k in et or et in k:
-                codes = v
-                break
-    if not codes:
-        codes = _EVENT_DEFAULT["其他"]
-    names = _find_names(codes[0], codes[1])
-    if not names:
-        return None
-    return {
-        "department_code": codes[0],
-        "unit_code": codes[1],
-        "department_name": names["department"],
-        "unit_name": names["unit"],
-    }
+def builtin_rules() -> List[Dict[str, Any]]:
+    """内置默认规则（dispatch_rules 表为空时使用，也用于 seed）：关键词先精确匹配，再按上表顺序包含匹配。"""
+    rules: List[Dict[str, Any]] = []
+    for mode in ("exact", "contains"):
+        for keyword, (dept, unit) in _EVENT_DEFAULT.items():
+            if mode == "contains" and keyword == FALLBACK_EVENT:
+                continue
+            rules.append({
+                "event_type": keyword,
+                "match_mode": mode,
+                "department_code": dept,
+                "unit_code": unit,
+                "priority": 0,
+                "enabled": True,
+            })
+    return rules
+
+
+def suggest_assignment(
+    event_type: Optional[str],
+    location: Optional[str] = None,
+    at: Optional[datetime] = None,
+) -> Optional[Dict[str, Any]]:
+    """根据事件类型（及位置、时间）给出默认部门/处室（可人工修改），规则见 dispatch_rules。"""
+    from dispatch_rules import current
+
+    return current().suggest(event_type, location, at)
 
 
 # 常用一键指派（供 API 返回给前端做快捷按钮）
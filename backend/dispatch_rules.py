@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+工单指派规则引擎：规则存于 dispatch_rules 表（事件类型、位置关键词、时段、星期 -> 部门 / 处室），
+编译为进程内索引后匹配，单次建议为字典查找 + 少量候选过滤。
+
+规则匹配：
+    event_type     为空匹配全部；match_mode=exact 精确匹配，contains 为双向包含（与原硬编码规则一致）
+    location_pattern  关键词，以 | 或逗号分隔，任一出现在位置中即匹配；为空匹配全部
+    start_minute / end_minute  当天分钟数 [start, end)，start > end 表示跨零点，二者不能相等；为空不限
+    weekdays       1-7（周一为 1），如 "12345"；为空不限
+候选按 priority 与具体程度（精确事件 > 包含 > 通配，限定位置、时段再加分）预先排序，取第一个满足条件者；
+均不命中时使用「其他」对应的兜底规则。
+
+热更新：规则写入时 data_versions 的 dispatch_rules 计数加一（见 etags），各进程至多每
+DISPATCH_RULES_CHECK_INTERVAL 秒读一次计数，变化时重新编译。表为空时使用 departments 中的内置默认规则。
+
+执行方式：
+    cd backend
+    python dispatch_rules.py seed                       # 把内置默认规则写入数据库（表为空时）
+    python dispatch_rules.py auto-assign --operator-id 1 [--limit 500] [--dry-run]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Tuple, Type
+
+from sqlalchemy.orm import Session
+
+from departments import DEPARTMENT_TREE, FALLBACK_EVENT, builtin_rules
+
+VERSION_NAME = "dispatch_rules"
+CHECK_INTERVAL = float(os.getenv("DISPATCH_RULES_CHECK_INTERVAL", "5"))
+MATCH_MODES = ("exact", "contains")
+
+_SPLIT = re.compile(r"[|,，]")
+
+# (部门 code, 处室 code) -> 名称；替代逐层遍历部门树
+_NAMES: Dict[Tuple[str, str], Dict[str, str]] = {
+    (d["code"], c["code"]): {"department": d["name"], "unit": c["name"]}
+    for d in DEPARTMENT_TREE
+    for c in d.get("children") or []
+}
+
+_models: Dict[str, Any] = {}
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    id: Optional[int]
+    event_type: Optional[str]
+    match_mode: str
+    location: Optional[Pattern]
+    start_minute: Optional[int]
+    end_minute: Optional[int]
+    weekdays: Optional[frozenset]
+    department_code: str
+    unit_code: str
+    score: int
+
+    def accepts(self, location: str, minute: int, weekday: int) -> bool:
+        if self.location is not None and not self.location.search(location):
+            return False
+        if self.weekdays is not None and weekday not in self.weekdays:
+            return False
+        if self.start_minute is not None and self.end_minute is not None:
+            if self.start_minute <= self.end_minute:
+                return self.start_minute <= minute < self.end_minute
+            return minute >= self.start_minute or minute < self.end_minute
+        return True
+
+
+def compile_rule(rule: Dict[str, Any]) -> CompiledRule:
+    keywords = [k.strip() for k in _SPLIT.split(rule.get("location_pattern") or "") if k.strip()]
+    weekdays = {int(c) for c in (rule.get("weekdays") or "") if c in "1234567"}
+    event_type = (rule.get("event_type") or "").strip() or None
+    match_mode = rule.get("match_mode") or "exact"
+    windowed = rule.get("start_minute") is not None and rule.get("end_minute") is not None
+    specificity = (4 if match_mode == "exact" else 2) if event_type else 0
+    specificity += (2 if keywords else 0) + (1 if windowed or weekdays else 0)
+    return CompiledRule(
+        id=rule.get("id"),
+        event_type=event_type,
+        match_mode=match_mode,
+        location=re.compile("|".join(re.escape(k) for k in keywords)) if keywords else None,
+        start_minute=rule.get("start_minute") if windowed else None,
+        end_minute=rule.get("end_minute") if windowed else None,
+        weekdays=frozenset(weekdays) if weekdays else None,
+        department_code=rule["department_code"],
+        unit_code=rule["unit_code"],
+        score=int(rule.get("priority") or 0) * 10 + specificity,
+    )
+
+
+class RuleIndex:
+    """编译后的规则索引：精确事件类型字典 + 包含类规则 + 通配规则，按事件类型缓存合并后的候选列表。"""
+
+    def __init__(self, rules: Iterable[Dict[str, Any]], version: int = 0):
+        # 同分候选保持规则顺序（id 或传入顺序），排序为稳定排序
+        self.version = version
+        self._exact: Dict[str, List[CompiledRule]] = defaultdict(list)
+        self._contains: List[CompiledRule] = []
+        self._wildcard: List[CompiledRule] = []
+        for raw in rules:
+            rule = compile_rule(raw)
+            if rule.event_type is None:
+                self._wildcard.append(rule)
+            elif rule.match_mode == "contains":
+                self._contains.append(rule)
+            else:
+                self._exact[rule.event_type].append(rule)
+        self._fallback = [r for r in self._exact.get(FALLBACK_EVENT, []) if r.location is None]
+        # 事件类型取值有限，候选列表按需生成后缓存
+        self._candidates: Dict[str, List[CompiledRule]] = {}
+
+    def candidates(self, event_type: str) -> List[CompiledRule]:
+        found = self._candidates.get(event_type)
+        if found is None:
+            found = list(self._exact.get(event_type, ()))
+            found += [r for r in self._contains if r.event_type in event_type or event_type in r.event_type]
+            found += self._wildcard
+            found.sort(key=lambda r: (-r.score, r.id or 0))
+            if len(self._candidates) < 10000:
+                self._candidates[event_type] = found
+        return found
+
+    def match(self, event_type: Optional[str], location: Optional[str] = None, at: Optional[datetime] = None) -> Optional[CompiledRule]:
+        et = (event_type or "").strip()
+        if not et:
+            return None
+        when = at or datetime.now()
+        minute, weekday = when.hour * 60 + when.minute, when.isoweekday()
+        loc = location or ""
+        for rule in self.candidates(et):
+            if rule.accepts(loc, minute, weekday):
+                return rule
+        for rule in self._fallback:
+            if rule.accepts(loc, minute, weekday):
+                return rule
+        return None
+
+    def suggest(self, event_type: Optional[str], location: Optional[str] = None, at: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        rule = self.match(event_type, location, at)
+        if rule is None:
+            return None
+        names = _NAMES.get((rule.department_code, rule.unit_code))
+        if not names:
+            return None
+        return {
+            "department_code": rule.department_code,
+            "unit_code": rule.unit_code,
+            "department_name": names["department"],
+            "unit_name": names["unit"],
+            "rule_id": rule.id,
+        }
+
+
+_lock = threading.Lock()
+# 版本 -1：首次 reload 必定读库
+_index = RuleIndex(builtin_rules(), version=-1)
+_checked_at = 0.0
+
+
+def install(rule_model) -> None:
+    _models["rule"] = rule_model
+
+
+def current() -> RuleIndex:
+    return _index
+
+
+def rule_dict(rule) -> Dict[str, Any]:
+    return {
+        "id": rule.id,
+        "event_type": rule.event_type,
+        "match_mode": rule.match_mode,
+        "location_pattern": rule.location_pattern,
+        "start_minute": rule.start_minute,
+        "end_minute": rule.end_minute,
+        "weekdays": rule.weekdays,
+        "department_code": rule.department_code,
+        "unit_code": rule.unit_code,
+        "priority": rule.priority,
+        "enabled": rule.enabled,
+        "updated_at": rule.updated_at.isoformat() if rule.updated_at else None,
+    }
+
+
+def reload(db: Session, force: bool = False) -> RuleIndex:
+    """计数变化（或 force）时从数据库重新编译索引；至多每 CHECK_INTERVAL 秒读一次计数。"""
+    global _index, _checked_at
+    from etags import versions
+
+    now = time.monotonic()
+    if not force and now - _checked_at < CHECK_INTERVAL:
+        return _index
+    with _lock:
+        if not force and now - _checked_at < CHECK_INTERVAL:
+            return _index
+        version = versions(db, (VERSION_NAME,))[VERSION_NAME]
+        if force or version != _index.version:
+            R = _models["rule"]
+            rules = [rule_dict(r) for r in db.query(R).filter(R.enabled.is_(True)).order_by(R.id)]
+            _index = RuleIndex(rules or builtin_rules(), version)
+        _checked_at = now
+    return _index
+
+
+def list_rules(db: Session) -> List[Dict[str, Any]]:
+    R = _models["rule"]
+    return [rule_dict(r) for r in db.query(R).order_by(R.priority.desc(), R.id)]
+
+
+def validate(rule: Dict[str, Any]) -> None:
+    """校验规则字段并规范化 weekdays（去重、升序），错误时抛出 ValueError。"""
+    if rule.get("match_mode") not in MATCH_MODES:
+        raise ValueError(f"match_mode 取值应为 {', '.join(MATCH_MODES)}")
+    if (rule["department_code"], rule["unit_code"]) not in _NAMES:
+        raise ValueError("部门 / 处室 code 不存在")
+    for key in ("start_minute", "end_minute"):
+        value = rule.get(key)
+        if value is not None and not 0 <= value <= 1440:
+            raise ValueError(f"{key} 应在 0-1440 之间")
+    if (rule.get("start_minute") is None) != (rule.get("end_minute") is None):
+        raise ValueError("start_minute 与 end_minute 需同时填写")
+    if rule.get("start_minute") is not None and rule["start_minute"] == rule["end_minute"]:
+        raise ValueError("start_minute 与 end_minute 不能相等（全天生效请留空）")
+    weekdays = rule.get("weekdays") or ""
+    if len(weekdays) > 7:
+        raise ValueError("weekdays 最多 7 位")
+    if any(c not in "1234567" for c in weekdays):
+        raise ValueError("weekdays 只能包含 1-7")
+    rule["weekdays"] = "".join(sorted(set(weekdays))) or None
+
+
+def seed(db: Session) -> int:
+    """表为空时写入内置默认规则，返回写入条数。"""
+    R = _models["rule"]
+    if db.query(R.id).first() is not None:
+        return 0
+    rules = builtin_rules()
+    for rule in rules:
+        db.add(R(**rule))
+    db.commit()
+    return len(rules)
+
+
+def suggest_many(tickets: Iterable[Any], at: Optional[datetime] = None) -> Dict[int, Optional[Dict[str, Any]]]:
+    """批量建议：{工单 id: 建议}；时段规则按 at（默认当前本地时间，即指派时刻）匹配。"""
+    index = _index
+    when = at or datetime.now()
+    return {t.id: index.suggest(t.event_type, t.location, when) for t in tickets}
+
+
+def auto_assign(
+    db: Session,
+    ticket_model: Type,
+    record_model: Type,
+    operator_id: int,
+    limit: int = 500,
+    dry_run: bool = False,
+    batch_size: int = 200,
+) -> Dict[str, Any]:
+    """为未指派部门的待处理工单按规则批量指派（写处理记录），返回指派明细。
+
+    按 id 分批读取与提交，单个事务（及 after_flush 计数钩子）只覆盖一批工单。
+    """
+    reload(db, force=True)
+    T = ticket_model
+    assigned = []
+    scanned = 0
+    last_id = 0
+    while scanned < limit:
+        tickets = (
+            db.query(T)
+            .filter(T.status == "pending", T.department_code.is_(None), T.id > last_id)
+            .order_by(T.id)
+            .limit(min(batch_size, limit - scanned))
+            .all()
+        )
+        if not tickets:
+            break
+        scanned += len(tickets)
+        last_id = tickets[-1].id
+        suggestions = suggest_many(tickets)
+        for ticket in tickets:
+            s = suggestions[ticket.id]
+            if not s:
+                continue
+            assigned.append({"ticket_id": ticket.id, **s})
+            if dry_run:
+                continue
+            ticket.department_code = s["department_code"]
+            ticket.unit_code = s["unit_code"]
+            ticket.assigned_department = s["department_name"]
+            ticket.assigned_unit = s["unit_name"]
+            ticket.status = "assigned"
+            db.add(record_model(
+                ticket_id=ticket.id,
+                operator_id=operator_id,
+                action="auto_assign",
+                old_status="pending",
+                new_status="assigned",
+                comment=f"部门:{s['department_name']}；处室:{s['unit_name']}（规则 {s['rule_id'] or '内置'}）",
+            ))
+        if not dry_run:
+            db.commit()
+    return {"scanned": scanned, "assigned": len(assigned), "dry_run": dry_run, "items": assigned}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="工单指派规则")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("seed", help="表为空时写入内置默认规则")
+    p_assign = sub.add_parser("auto-assign", help="按规则批量指派待处理工单")
+    p_assign.add_argument("--operator-id", type=int, required=True, help="处理记录中的操作人（管理员用户 id）")
+    p_assign.add_argument("--limit", type=int, default=500)
+    p_assign.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    from app import SessionLocal, Ticket, TicketRecord
+
+    db = SessionLocal()
+    try:
+        if args.command == "seed":
+            print(f"已写入 {seed(db)} 条规则")
+        else:
+            result = auto_assign(db, Ticket, TicketRecord, args.operator_id, limit=args.limit, dry_run=args.dry_run)
+            print(f"扫描 {result['scanned']} 个工单，指派 {result['assigned']} 个" + ("（试运行）" if args.dry_run else ""))
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+管理端读接口的 ETag / 条件 GET。
+
+data_versions 表为每类数据保存一个全局变更计数（reports、tickets），任何相关行的写入都会在
+同一事务内加一（after_flush）。列表接口先读计数（主键查询）生成 ETag，与 If-None-Match
+一致时直接返回 304，不再执行列表查询与序列化。
+
+ETag 在读取数据之前生成：读取期间若有新写入，返回的数据只会比 ETag 新，下次轮询得到新的
+ETag，不会把旧数据当作最新。
+"""
+from __future__ import annotations
+
+import hashlib
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Sequence, Type
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from object_storage import presign_epoch
+from stats_rollup import increment
+
+# 304 / 200 均返回；no-cache 让浏览器每次带 If-None-Match 重新验证
+CACHE_CONTROL = "private, no-cache"
+
+_models: Dict[str, Any] = {}
+# 版本名 -> 影响该版本的模型
+_watched: Dict[str, Sequence[type]] = {}
+
+
+def install(session_cls: Type[Session], version_model, watched: Dict[str, Sequence[type]]) -> None:
+    """登记版本表与各版本关注的模型，注册 after_flush 钩子。"""
+    _models["version"] = version_model
+    _watched.update(watched)
+    event.listen(session_cls, "after_flush", _after_flush)
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    changed = set()
+    dirty = [obj for obj in session.dirty if session.is_modified(obj, include_collections=False)]
+    for obj in list(session.new) + dirty + list(session.deleted):
+        for name, models in _watched.items():
+            if isinstance(obj, tuple(models)):
+                changed.add(name)
+    if changed:
+        increment(
+            session.connection(),
+            _models["version"].__table__,
+            ("name",),
+            [{"name": name, "version": 1} for name in sorted(changed)],
+            value_col="version",
+        )
+
+
+def versions(db: Session, names: Iterable[str]) -> Dict[str, int]:
+    V = _models["version"]
+    names = list(names)
+    result: Dict[str, int] = defaultdict(int)
+    for name, version in db.query(V.name, V.version).filter(V.name.in_(names)):
+        result[name] = int(version)
+    return {name: result[name] for name in names}
+
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def list_etag(db: Session, request: Request, names: Sequence[str]) -> str:
+    """由数据版本与请求路径、查询参数生成弱 ETag（不同筛选 / 分页各自独立）。
+
+    列表中的图片可能是短期预签名地址，ETag 同时包含预签名时间分段，地址过期前换新。
+    """
+    stamp = versions(db, names)
+    return make_etag(
+        request.url.path,
+        sorted(request.query_params.multi_items()),
+        sorted(stamp.items()),
+        presign_epoch(),
+    )
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # 弱比较：忽略 W/ 前缀
+    tags = {_opaque(t) for t in header.split(",")}
+    return _opaque(etag) in tags
+
+
+def _opaque(etag: str) -> str:
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def tag(response: Response, etag: str) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""上传图片的 WebP 缩略图 / 中等预览图，与原图同目录存放（uploads/<原文件名>.<规格>.webp）。"""
+from __future__ import annotations
+
+import io
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from object_storage import public_upload_url_path, read_upload, stat_upload, write_upload
+
+logger = logging.getLogger(__name__)
+
+# 规格 -> (最长边像素, WebP 质量)
+VARIANTS: Dict[str, Tuple[int, int]] = {
+    "thumb": (320, 70),
+    "medium": (1280, 80),
+}
+
+_SOURCE_SUFFIXES = (".jpg", ".jpeg", ".png", ".gif", ".webp")
+
+
+def derivative_path(stored_path: str, variant: str) -> str:
+    """原图库中路径 -> 派生图库中路径。"""
+    name = Path(public_upload_url_path(stored_path)).name
+    return f"uploads/{name}.{variant}.webp"
+
+
+def derivative_source(filename: str) -> Optional[Tuple[str, str]]:
+    """若文件名是派生图，返回 (原图库中路径, 规格)。"""
+    for variant in VARIANTS:
+        suffix = f".{variant}.webp"
+        if filename.endswith(suffix):
+            original = filename[: -len(suffix)]
+            if original.lower().endswith(_SOURCE_SUFFIXES):
+                return f"uploads/{original}", variant
+    return None
+
+
+def thumbnail_paths(stored_paths: Iterable[str]) -> List[str]:
+    return [derivative_path(p, "thumb") for p in stored_paths]
+
+
+def _render(raw: bytes, variant: str) -> bytes:
+    max_edge, quality = VARIANTS[variant]
+    with Image.open(io.BytesIO(raw)) as img:
+        # JPEG 可直接按目标尺寸降采样解码，避免解出整张大图
+        img.draft("RGB", (max_edge, max_edge))
+        img = ImageOps.exif_transpose(img)
+        has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+        img = img.convert("RGBA" if has_alpha else "RGB")
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, format="WEBP", quality=quality, method=4)
+        return out.getvalue()
+
+
+def generate_derivatives(
+    stored_path: str,
+    variants: Iterable[str] = VARIANTS,
+    raw: Optional[bytes] = None,
+) -> Dict[str, str]:
+    """生成并保存派生图（已存在的跳过），返回 规格 -> 库中路径；失败只记日志。"""
+    out: Dict[str, str] = {}
+    for variant in variants:
+        target = derivative_path(stored_path, variant)
+        if stat_upload(target):
+            out[variant] = target
+            continue
+        if raw is None:
+            raw = read_upload(stored_path)
+            if not raw:
+                logger.warning("派生图生成失败，原图不存在: %s", stored_path)
+                return out
+        try:
+            write_upload(target, _render(raw, variant), "image/webp")
+        except Exception as e:
+            logger.warning("派生图生成失败 %s (%s): %s", stored_path, variant, e)
+            continue
+        out[variant] = target
+    return out
+
+
+def generate_derivatives_many(stored_paths: Iterable[str]) -> None:
+    """上传后的后台任务：为一组原图生成全部规格。"""
+    for p in stored_paths:
+        generate_derivatives(p)
+
+
+def ensure_derivative(filename: str) -> bool:
+    """首次请求派生图时按需生成；filename 不是派生图或原图缺失时返回 False。"""
+    parsed = derivative_source(filename)
+    if not parsed:
+        return False
+    original, variant = parsed
+    return variant in generate_derivatives(original, [variant])
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+管理端举报 / 工单队列的列表投影表（report_list_items、ticket_list_items）。
+
+每行保存列表接口返回的全部字段（含图片列表与识别结果摘要），列表页只需对单表做
+(status, created_at) 索引范围扫描。投影随举报、图片、识别结果、工单、用户名的写入
+在同一事务内刷新（after_flush 中按受影响 id 重新计算）。
+
+LIST_PROJECTION=true 时列表接口读取投影表；上线前先执行 rebuild 回填存量数据。
+
+执行方式：
+    cd backend
+    python list_views.py rebuild
+"""
+from __future__ import annotations
+
+import argparse
+import os
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Set, Type
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+ENABLED = os.getenv("LIST_PROJECTION", "false").lower() in ("1", "true", "yes", "on")
+
+_models: Dict[str, Any] = {}
+
+
+def install(session_cls: Type[Session], models: Dict[str, Any]) -> None:
+    """登记模型（report、ticket、image、result、user 与两张投影表）并注册 after_flush 钩子。"""
+    _models.update(models)
+    event.listen(session_cls, "after_flush", _after_flush)
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    Report, Ticket, Image, Result, User = (
+        _models["report"], _models["ticket"], _models["image"], _models["result"], _models["user"]
+    )
+    report_ids: Set[int] = set()
+    ticket_ids: Set[int] = set()
+    renamed: Dict[int, str] = {}
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Report):
+            report_ids.add(obj.id)
+        elif isinstance(obj, Ticket):
+            ticket_ids.add(obj.id)
+        elif isinstance(obj, (Image, Result)):
+            report_ids.add(obj.report_id)
+        elif isinstance(obj, User) and obj not in session.new:
+            if inspect(obj).attrs.username.history.has_changes():
+                renamed[obj.id] = obj.username
+
+    conn = session.connection()
+    if renamed:
+        table = _models["report_view"].__table__
+        for user_id, username in renamed.items():
+            conn.execute(table.update().where(table.c.user_id == user_id).values(username=username))
+    if report_ids:
+        refresh_reports(conn, report_ids)
+        # 图片变化同样影响对应工单行
+        ticket_ids |= set(conn.execute(
+            select(Ticket.id).where(Ticket.report_id.in_(report_ids))
+        ).scalars())
+    if ticket_ids:
+        refresh_tickets(conn, ticket_ids)
+
+
+def _images_by_report(conn, report_ids: Iterable[int]) -> Dict[int, List[str]]:
+    Image = _models["image"]
+    images: Dict[int, List[str]] = defaultdict(list)
+    for report_id, url in conn.execute(
+        select(Image.report_id, Image.image_url)
+        .where(Image.report_id.in_(list(report_ids)))
+        .order_by(Image.report_id, Image.image_order, Image.id)
+    ):
+        images[report_id].append(url)
+    return images
+
+
+def _replace(conn, table, ids: Set[int], rows: List[Dict[str, Any]]) -> None:
+    conn.execute(table.delete().where(table.c.id.in_(list(ids))))
+    if rows:
+        conn.execute(table.insert(), rows)
+
+
+def refresh_reports(conn, report_ids: Set[int]) -> None:
+    """按 id 重新计算举报投影行（举报已删除则删除投影行）。"""
+    Report, Result, User = _models["report"], _models["result"], _models["user"]
+    ids = {i for i in report_ids if i is not None}
+    if not ids:
+        return
+    images = _images_by_report(conn, ids)
+    results: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    for r in conn.execute(
+        select(Result.report_id, Result.question, Result.answer, Result.event_type_detected, Result.confidence)
+        .where(Result.report_id.in_(list(ids)))
+        .order_by(Result.report_id, Result.id)
+    ):
+        results[r.report_id].append({
+            "question": r.question,
+            "answer": r.answer,
+            "event_type_detected": r.event_type_detected,
+            "confidence": float(r.confidence) if r.confidence else None,
+        })
+
+    rows = []
+    for r in conn.execute(
+        select(Report.__table__, User.username.label("username"))
+        .select_from(Report.__table__.outerjoin(User.__table__, User.id == Report.user_id))
+        .where(Report.id.in_(list(ids)))
+    ).mappings():
+        rows.append({
+            "id": r["id"],
+            "user_id": r["user_id"],
+            "username": r["username"] or "未知用户",
+            "event_type": r["event_type"],
+            "location": r["location"],
+            "description": r["description"],
+            "status": r["status"],
+            "images": images.get(r["id"], []),
+            "recognition_results": results.get(r["id"], []),
+            "auto_review_result": r["auto_review_result"],
+            "auto_review_confidence": r["auto_review_confidence"],
+            "created_at": r["created_at"],
+        })
+    _replace(conn, _models["report_view"].__table__, ids, rows)
+
+
+def refresh_tickets(conn, ticket_ids: Set[int]) -> None:
+    """按 id 重新计算工单投影行（工单已删除则删除投影行）。"""
+    Ticket = _models["ticket"]
+    ids = {i for i in ticket_ids if i is not None}
+    if not ids:
+        return
+    tickets = list(conn.execute(select(Ticket.__table__).where(Ticket.id.in_(list(ids)))).mappings())
+    images = _images_by_report(conn, {t["report_id"] for t in tickets})
+    rows = []
+    for t in tickets:
+        rows.append({
+            "id": t["id"],
+            "ticket_no": t["ticket_no"],
+            "report_id": t["report_id"],
+            "event_type": t["event_type"],
+            "location": t["location"],
+            "description": t["description"],
+            "status": t["status"],
+            "priority": t["priority"],
+            "assigned_to": t["assigned_to"],
+            "assigned_department": t["assigned_department"],
+            "assigned_unit": t["assigned_unit"],
+            "department_code": t["department_code"],
+            "unit_code": t["unit_code"],
+            "images": images.get(t["report_id"], []),
+            "created_at": t["created_at"],
+            "updated_at": t["updated_at"],
+        })
+    _replace(conn, _models["ticket_view"].__table__, ids, rows)
+
+
+def rebuild(db: Session, batch_size: int = 500) -> Dict[str, int]:
+    """按 id 分批全量重建两张投影表。"""
+    counts = {}
+    for key, refresh in (("report", refresh_reports), ("ticket", refresh_tickets)):
+        model = _models[key]
+        view = _models[f"{key}_view"]
+        db.query(view).delete(synchronize_session=False)
+        last_id, done = 0, 0
+        while True:
+            ids = [
+                row[0] for row in
+                db.query(model.id).filter(model.id > last_id).order_by(model.id).limit(batch_size)
+            ]
+            if not ids:
+                break
+            refresh(db.connection(), set(ids))
+            last_id = ids[-1]
+            done += len(ids)
+            db.commit()
+        counts[f"{key}s"] = done
+    db.commit()
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="管理端列表投影表")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_rebuild = sub.add_parser("rebuild", help="由明细表全量重建投影")
+    p_rebuild.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    from app import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print(rebuild(db, batch_size=args.batch_size))
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
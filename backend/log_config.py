@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+日志管线：请求线程只把日志记录放入内存队列（QueueHandler），由后台 QueueListener 线程格式化并写出，
+磁盘 / 终端 I/O 不在请求路径上。
+
+按 APP_ENV（development / production / test）取默认值，可用环境变量单独覆盖：
+    LOG_LEVEL          根日志级别
+    LOG_FORMAT         json（每行一个 JSON 对象）或 text
+    LOG_SAMPLE_RATE    热点日志采样率（0-1），只作用于带 extra=HOT 且低于 WARNING 的记录
+    DB_ECHO            输出每条 SQL（sqlalchemy.engine 记 INFO，同样走队列）
+
+热点路径上的调试日志写法：logger.debug("...", arg, extra=HOT)。级别未开启时不产生记录，
+开启时按 LOG_SAMPLE_RATE 抽样入队。
+"""
+from __future__ import annotations
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+ENV_DEFAULTS: Dict[str, Dict[str, str]] = {
+    "development": {"LOG_LEVEL": "INFO", "LOG_FORMAT": "text", "LOG_SAMPLE_RATE": "1", "DB_ECHO": "false"},
+    "production": {"LOG_LEVEL": "INFO", "LOG_FORMAT": "json", "LOG_SAMPLE_RATE": "0.01", "DB_ECHO": "false"},
+    "test": {"LOG_LEVEL": "WARNING", "LOG_FORMAT": "text", "LOG_SAMPLE_RATE": "0", "DB_ECHO": "false"},
+}
+
+# 热点日志标记：logger.debug(..., extra=HOT)
+HOT = {"hot_path": True}
+
+# LogRecord 自带属性，JSON 输出时其余属性（extra）作为附加字段
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "hot_path"}
+# 由 uvicorn 自行挂处理器的日志器，改为经队列输出
+_UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _setting(env: str, key: str) -> str:
+    return os.getenv(key) or ENV_DEFAULTS.get(env, ENV_DEFAULTS["development"])[key]
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """带 hot_path 标记的记录按比例保留；WARNING 及以上级别与其余记录不受影响。"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not getattr(record, "hot_path", False):
+            return True
+        return self.rate >= 1 or (self.rate > 0 and random.random() < self.rate)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 入队前合并参数、展开异常文本，避免后台线程引用请求中的可变对象；保留 extra 字段
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging() -> None:
+    """安装队列日志管线（重复调用无副作用）；应在加载 env 文件之后调用。"""
+    global _listener
+    if _listener is not None:
+        return
+    env = os.getenv("APP_ENV", "development").lower()
+    level = _setting(env, "LOG_LEVEL").upper()
+    json_format = _setting(env, "LOG_FORMAT").lower() == "json"
+    sample_rate = float(_setting(env, "LOG_SAMPLE_RATE"))
+    db_echo = _setting(env, "DB_ECHO").lower() in ("1", "true", "yes", "on")
+
+    output = logging.StreamHandler()
+    output.setFormatter(
+        JsonFormatter() if json_format else logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    )
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = _QueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(sample_rate))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    for name in _UVICORN_LOGGERS:
+        logger = logging.getLogger(name)
+        logger.handlers.clear()
+        logger.propagate = True
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO if db_echo else logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -12,6 +12,7 @@ import requests
 import dashscope
 from dashscope import Generation, MultiModalConversation
 
+
 # 禁用代理（避免代理连接问题）
 # 设置环境变量，让 requests 和 dashscope 不使用代理
 no_proxy_list = 'dashscope.aliyuncs.com,*.aliyuncs.com,api.minimax.io,localhost,127.0.0.1'
@@ -35,7 +36,7 @@ logger = logging.getLogger(__name__)
 
 # 如果有代理被移除，记录日志
 if original_proxies:
-    logger.warning(f"检测到系统代理设置，已临时移除: {original_proxies}")
+    logger.warning("检测到系统代理设置，已临时移除: %s", original_proxies)
     logger.info("已设置 NO_PROXY，dashscope 将直接连接阿里云")
 
 # 模型提供者类型
@@ -78,9 +79,10 @@ class AliyunProvider(ModelProvider):
         except Exception as e:
             error_msg = str(e)
             if 'proxy' in error_msg.lower() or 'ProxyError' in error_msg or 'SSLError' in error_msg:
-                logger.error(f"代理/SSL 连接错误: {e}")
-                logger.error("提示: 系统可能设置了代理，但代理配置有问题。")
-                logger.error("解决方案: 1) 检查系统代理设置 2) 临时禁用代理 3) 配置正确的代理")
+                logger.error(
+                    "代理/SSL 连接错误: %s（系统可能设置了代理但配置有问题：检查系统代理设置、临时禁用代理或配置正确的代理）",
+                    e,
+                )
                 raise Exception(f"连接阿里云 API 时出现代理错误。请检查系统代理设置。原始错误: {e}")
             raise
         
@@ -2,22 +2,180 @@
 """本地文件或 MinIO(S3 兼容) 对象存储，上传与读取统一入口。"""
 from __future__ import annotations
 
+import hashlib
 import io
 import os
 import re
-from datetime import datetime
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
 
 from minio import Minio
+from minio.commonconfig import CopySource
 from minio.error import S3Error
 
 BASE_DIR = Path(__file__).resolve().parent
 UPLOAD_DIR = BASE_DIR / "uploads"
 
+# MinIO 分片上传的最小分片为 5 MiB；单次上传的峰值内存约等于一个分片
+_MIN_PART_SIZE = 5 * 1024 * 1024
+# 下载/响应时的读取块大小
+_STREAM_CHUNK = 64 * 1024
+
 _minio_client: Optional[Minio] = None
 _bucket: str = "traffix"
 _use_minio: bool = False
+_chunk_size: int = _MIN_PART_SIZE
+_max_upload_bytes: int = 20 * 1024 * 1024
+# 内容寻址模式：对象按 SHA-256 存为 uploads/cas_<sha256><ext>，库中路径经解析函数映射到对象
+_cas_enabled: bool = False
+_key_resolver: Optional[Callable[[str], Optional[str]]] = None
+_aliases: "OrderedDict[str, Tuple[Optional[str], float]]" = OrderedDict()
+_aliases_lock = threading.Lock()
+_ALIAS_LIMIT = 100_000
+_ALIAS_NEGATIVE_TTL = 60.0
+# 预签名直链模式：浏览器直接从 MinIO 取图，签名缓存到过期前
+_presign_enabled: bool = False
+_presign_ttl: int = 900
+_presign_client: Optional[Minio] = None
+_presigned: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+_presigned_lock = threading.Lock()
+_PRESIGNED_LIMIT = 50_000
+
+
+class UploadTooLarge(ValueError):
+    """上传内容超过 UPLOAD_MAX_BYTES。"""
+
+
+@dataclass
+class StoredUpload:
+    """流式保存的结果：库中路径、字节数与 SHA-256。"""
+
+    path: str
+    size: int
+    sha256: str
+    # 内容寻址模式下实际存放内容的对象
+    blob_key: Optional[str] = None
+
+
+@dataclass
+class UploadStat:
+    """对象元数据（last_modified 为 UTC 时间）；本地存储时带文件路径。"""
+
+    size: int
+    etag: str
+    last_modified: datetime
+    local_path: Optional[Path] = None
+
+
+class _ByteCache:
+    """按总字节数限额的 LRU 缓存，缓存最近写入/读取的小对象，线程安全。"""
+
+    def __init__(self, max_bytes: int = 0, max_object_bytes: int = 0):
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_bytes = max_bytes
+        self.max_object_bytes = max_object_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, max_bytes: int, max_object_bytes: int) -> None:
+        with self._lock:
+            self.max_bytes = max_bytes
+            self.max_object_bytes = min(max_object_bytes, max_bytes)
+            self._evict()
+
+    def accepts(self, size: int) -> bool:
+        return 0 < size <= self.max_object_bytes
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._items.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if not self.accepts(len(data)):
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self._items[key] = data
+            self.bytes += len(data)
+            self._evict()
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+
+    def _evict(self) -> None:
+        while self._items and self.bytes > self.max_bytes:
+            _, old = self._items.popitem(last=False)
+            self.bytes -= len(old)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._items),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "max_object_bytes": self.max_object_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_cache = _ByteCache()
+
+
+class _HashingReader:
+    """边读边计算哈希与长度，超过上限时中断读取；对象不超过 keep_bytes 时保留内容供缓存。"""
+
+    def __init__(self, raw: BinaryIO, max_bytes: int, keep_bytes: int = 0):
+        self._raw = raw
+        self._max = max_bytes
+        self._keep = keep_bytes
+        self._chunks: Optional[List[bytes]] = [] if keep_bytes > 0 else None
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._raw.read(size if size and size > 0 else _chunk_size)
+        if chunk:
+            self.size += len(chunk)
+            if self._max and self.size > self._max:
+                raise UploadTooLarge(f"文件超过大小上限 {self._max} 字节")
+            self._hash.update(chunk)
+            if self._chunks is not None:
+                if self.size > self._keep:
+                    self._chunks = None
+                else:
+                    self._chunks.append(chunk)
+        return chunk
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+    def kept(self) -> Optional[bytes]:
+        return b"".join(self._chunks) if self._chunks is not None else None
 
 
 def _env_bool(name: str, default: str = "false") -> bool:
@@ -44,11 +202,73 @@ def _object_key(stored_path: str) -> str:
     return _normalize_stored_path(stored_path)
 
 
+def cas_enabled() -> bool:
+    return _cas_enabled
+
+
+def blob_key(sha256: str, suffix: str = "") -> str:
+    return f"uploads/cas_{sha256}{suffix.lower()}"
+
+
+def is_blob_key(key: str) -> bool:
+    return Path(key).name.startswith("cas_")
+
+
+def set_key_resolver(resolver: Optional[Callable[[str], Optional[str]]]) -> None:
+    """注册「库中路径 -> 内容寻址对象」的解析函数（由数据库引用表提供）。"""
+    global _key_resolver
+    _key_resolver = resolver
+
+
+def _remember_alias(key: str, target: Optional[str]) -> None:
+    with _aliases_lock:
+        _aliases[key] = (target, 0.0 if target else time.monotonic() + _ALIAS_NEGATIVE_TTL)
+        _aliases.move_to_end(key)
+        while len(_aliases) > _ALIAS_LIMIT:
+            _aliases.popitem(last=False)
+
+
+def _resolve_key(stored_path: str) -> str:
+    """将库中路径解析为实际对象 key；映射不可变，命中后常驻，未命中短时缓存。"""
+    key = _object_key(stored_path)
+    if not _cas_enabled or _key_resolver is None or is_blob_key(key):
+        return key
+    with _aliases_lock:
+        hit = _aliases.get(key)
+    if hit is not None:
+        target, expires = hit
+        if target:
+            return target
+        if expires > time.monotonic():
+            return key
+    target = _key_resolver(key)
+    _remember_alias(key, target)
+    return target or key
+
+
+def max_upload_bytes() -> int:
+    return _max_upload_bytes
+
+
+def cache_stats() -> Dict[str, Any]:
+    """读缓存命中率等计数。"""
+    return _cache.stats()
+
+
 def init_storage() -> None:
-    global _minio_client, _bucket, _use_minio
+    global _minio_client, _bucket, _use_minio, _chunk_size, _max_upload_bytes, _cas_enabled
+    global _presign_enabled, _presign_ttl, _presign_client
     # 默认使用 MinIO；仅本地无对象存储时设 USE_MINIO=false
     _use_minio = _env_bool("USE_MINIO", "true")
     _bucket = os.getenv("MINIO_BUCKET", "traffix").strip() or "traffix"
+    _chunk_size = max(int(os.getenv("UPLOAD_CHUNK_SIZE", str(_MIN_PART_SIZE))), _MIN_PART_SIZE)
+    _max_upload_bytes = int(os.getenv("UPLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+    _cas_enabled = _env_bool("UPLOAD_CAS", "false")
+    # 进程内读缓存：UPLOAD_CACHE_MAX_BYTES=0 关闭
+    _cache.configure(
+        int(os.getenv("UPLOAD_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+        int(os.getenv("UPLOAD_CACHE_MAX_OBJECT_BYTES", str(8 * 1024 * 1024))),
+    )
     UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
     if not _use_minio:
@@ -72,53 +292,313 @@ def init_storage() -> None:
     except S3Error as e:
         raise RuntimeError(f"MinIO 初始化失败（检查 MINIO_ENDPOINT 与服务是否启动）: {e}") from e
 
+    _presign_enabled = _env_bool("MINIO_PRESIGNED", "false")
+    _presign_ttl = max(int(os.getenv("MINIO_PRESIGN_EXPIRES", "900")), 60)
+    # 签名包含主机名：浏览器访问 MinIO 的地址与后端不同时，用单独的客户端离线签名
+    public_endpoint = os.getenv("MINIO_PUBLIC_ENDPOINT", "").strip()
+    _presign_client = None
+    if public_endpoint:
+        _presign_client = Minio(
+            public_endpoint,
+            access_key=access,
+            secret_key=secret,
+            secure=_env_bool("MINIO_PUBLIC_USE_SSL", "true" if secure else "false"),
+            region=os.getenv("MINIO_REGION", "us-east-1"),
+        )
+
 
 def save_upload(data: bytes, original_filename: Optional[str]) -> str:
     """保存文件到 MinIO（USE_MINIO=true）或本地 uploads/，返回库中路径 uploads/文件名。"""
+    return save_upload_stream(io.BytesIO(data), original_filename).path
+
+
+def save_upload_stream(
+    fileobj: BinaryIO,
+    original_filename: Optional[str],
+    max_bytes: Optional[int] = None,
+) -> StoredUpload:
+    """按分片从文件对象流式写入 MinIO（分片上传）或本地文件，不在内存中缓存整个文件。
+
+    超过 max_bytes（默认 UPLOAD_MAX_BYTES）时抛出 UploadTooLarge，并清理已写入的部分。
+    内容寻址模式（UPLOAD_CAS=true）下先写临时对象，算出哈希后落到 cas_ 对象，重复内容只保留一份；
+    调用方需把返回的 path -> blob_key 登记到引用表。
+    该函数会阻塞，在异步接口中应放到线程池执行。
+    """
     safe = _safe_filename(original_filename)
-    name = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{safe}"
+    # 随机段避免同一秒内截断后的同名文件互相覆盖
+    name = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}_{safe}"
     rel = f"uploads/{name}"
+    suffix = Path(safe).suffix.lower()
+    reader = _HashingReader(
+        fileobj,
+        _max_upload_bytes if max_bytes is None else max_bytes,
+        keep_bytes=_cache.max_object_bytes,
+    )
 
+    if not _cas_enabled:
+        _write_stream(rel, reader, _guess_content_type(safe))
+        return _stored(rel, reader)
+
+    tmp = f"uploads/tmp_{uuid.uuid4().hex}{suffix}"
+    _write_stream(tmp, reader, _guess_content_type(safe))
+    target = blob_key(reader.hexdigest(), suffix)
+    _promote(tmp, target)
+    _remember_alias(rel, target)
+    return _stored(rel, reader, target)
+
+
+def _write_stream(key: str, reader: _HashingReader, content_type: str) -> None:
     if _use_minio and _minio_client:
+        # length=-1 时 minio 按 part_size 读取并走分片上传，失败会中止该次上传
         _minio_client.put_object(
             _bucket,
-            rel,
+            key,
+            reader,
+            length=-1,
+            part_size=_chunk_size,
+            content_type=content_type,
+        )
+        return
+
+    path = BASE_DIR / key.replace("/", os.sep)
+    try:
+        with open(path, "wb") as out:
+            while True:
+                chunk = reader.read(_chunk_size)
+                if not chunk:
+                    break
+                out.write(chunk)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+
+
+def _promote(tmp: str, target: str) -> None:
+    """临时对象 -> 内容寻址对象；目标已存在（重复内容）时直接丢弃临时对象。"""
+    if _use_minio and _minio_client:
+        try:
+            _minio_client.stat_object(_bucket, target)
+        except S3Error:
+            _minio_client.copy_object(_bucket, target, CopySource(_bucket, tmp))
+        _minio_client.remove_object(_bucket, tmp)
+        return
+
+    tmp_path = BASE_DIR / tmp.replace("/", os.sep)
+    target_path = BASE_DIR / target.replace("/", os.sep)
+    if target_path.is_file():
+        tmp_path.unlink(missing_ok=True)
+    else:
+        os.replace(tmp_path, target_path)
+
+
+def _stored(rel: str, reader: _HashingReader, target: Optional[str] = None) -> StoredUpload:
+    """写入成功后：小对象写入缓存（write-through），并返回保存结果。"""
+    data = reader.kept()
+    if data is not None:
+        _cache.put(target or rel, data)
+    return StoredUpload(path=rel, size=reader.size, sha256=reader.hexdigest(), blob_key=target)
+
+
+def write_upload(stored_path: str, data: bytes, content_type: Optional[str] = None) -> str:
+    """按指定库中路径写入（用于派生文件等固定命名的对象），返回规范化后的路径。"""
+    key = _object_key(stored_path)
+    if _use_minio and _minio_client:
+        _minio_client.put_object(
+            _bucket,
+            key,
             io.BytesIO(data),
             length=len(data),
-            content_type=_guess_content_type(safe),
+            content_type=content_type or _guess_content_type(key),
         )
-        return rel
+    else:
+        path = BASE_DIR / key.replace("/", os.sep)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".part")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+    _cache.put(key, data)
+    return key
+
+
+def _local_path(stored_path: str) -> Optional[Path]:
+    """本地：支持 uploads/foo 或历史 Windows 反斜杠。"""
+    local = BASE_DIR / Path(stored_path)
+    if local.is_file():
+        return local
+    alt = BASE_DIR / _object_key(stored_path).replace("/", os.sep)
+    if alt.is_file():
+        return alt
+    return None
+
 
-    path = UPLOAD_DIR / name
-    path.write_bytes(data)
-    return rel
+def _resolved_local_path(stored_path: str, key: str) -> Optional[Path]:
+    """本地文件：库中路径被解析到内容寻址对象时按解析结果查找。"""
+    return _local_path(stored_path if key == _object_key(stored_path) else key)
 
 
 def read_upload(stored_path: str) -> Optional[bytes]:
-    """按库中存储的路径读取二进制内容。"""
+    """按库中存储的路径读取二进制内容（优先命中进程内缓存）。"""
     if not stored_path:
         return None
-    key = _object_key(stored_path)
+    key = _resolve_key(stored_path)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
 
+    data: Optional[bytes] = None
     if _use_minio and _minio_client:
         try:
             resp = _minio_client.get_object(_bucket, key)
             try:
-                return resp.read()
+                data = resp.read()
             finally:
                 resp.close()
                 resp.release_conn()
         except S3Error:
             return None
+    else:
+        local = _resolved_local_path(stored_path, key)
+        data = local.read_bytes() if local else None
 
-    # 本地：支持 uploads/foo 或历史 Windows 反斜杠
-    local = BASE_DIR / Path(stored_path)
-    if local.is_file():
-        return local.read_bytes()
-    alt = BASE_DIR / key.replace("/", os.sep)
-    if alt.is_file():
-        return alt.read_bytes()
-    return None
+    if data is not None:
+        _cache.put(key, data)
+    return data
+
+
+def stat_upload(stored_path: str) -> Optional[UploadStat]:
+    """读取对象大小、ETag 与修改时间，不下载内容；不存在时返回 None。"""
+    if not stored_path:
+        return None
+    key = _resolve_key(stored_path)
+    if _use_minio and _minio_client:
+        try:
+            st = _minio_client.stat_object(_bucket, key)
+        except S3Error:
+            return None
+        return UploadStat(size=st.size, etag=f'"{st.etag}"', last_modified=st.last_modified)
+
+    local = _resolved_local_path(stored_path, key)
+    if not local:
+        return None
+    st = local.stat()
+    return UploadStat(
+        size=st.st_size,
+        etag=f'"{st.st_mtime_ns:x}-{st.st_size:x}"',
+        last_modified=datetime.fromtimestamp(st.st_mtime, timezone.utc),
+        local_path=local,
+    )
+
+
+def iter_upload(stored_path: str, start: int = 0, length: Optional[int] = None) -> Iterator[bytes]:
+    """按块读取对象的 [start, start+length) 区间，供流式响应使用。"""
+    key = _resolve_key(stored_path)
+    if _use_minio and _minio_client:
+        resp = _minio_client.get_object(_bucket, key, offset=start, length=length or 0)
+        try:
+            yield from resp.stream(_STREAM_CHUNK)
+        finally:
+            resp.close()
+            resp.release_conn()
+        return
+
+    local = _resolved_local_path(stored_path, key)
+    if not local:
+        return
+    remaining = length
+    with open(local, "rb") as f:
+        f.seek(start)
+        while remaining is None or remaining > 0:
+            chunk = f.read(_STREAM_CHUNK if remaining is None else min(_STREAM_CHUNK, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+def presigned_enabled() -> bool:
+    return _presign_enabled and _minio_client is not None
+
+
+def presign_epoch() -> int:
+    """预签名地址的时间分段（每段 1/4 有效期）；未开启预签名时恒为 0。
+
+    含预签名地址的响应把它计入 ETag：返回的地址剩余有效期不少于一半，ETag 最多沿用 1/4 有效期，
+    304 续用的旧响应里的地址不会过期。
+    """
+    if not presigned_enabled():
+        return 0
+    return int(time.time() // (_presign_ttl / 4))
+
+
+def presigned_upload_url(stored_path: str, must_exist: bool = False) -> Optional[str]:
+    """返回对象的短期预签名 GET 地址；未开启或 must_exist 时对象不存在返回 None。
+
+    同一对象的签名在剩余有效期不少于一半时复用，避免每次列表请求都重新签名。
+    """
+    if not stored_path or not presigned_enabled():
+        return None
+    key = _resolve_key(stored_path)
+    now = time.monotonic()
+    with _presigned_lock:
+        hit = _presigned.get(key)
+    if hit and hit[1] > now:
+        return hit[0]
+    if must_exist:
+        try:
+            _minio_client.stat_object(_bucket, key)
+        except S3Error:
+            return None
+    url = (_presign_client or _minio_client).presigned_get_object(
+        _bucket,
+        key,
+        expires=timedelta(seconds=_presign_ttl),
+        response_headers={"response-cache-control": f"private, max-age={_presign_ttl}"},
+    )
+    with _presigned_lock:
+        _presigned[key] = (url, now + _presign_ttl * 0.5)
+        _presigned.move_to_end(key)
+        while len(_presigned) > _PRESIGNED_LIMIT:
+            _presigned.popitem(last=False)
+    return url
+
+
+def delete_upload(stored_path: str) -> None:
+    """删除对象（不解析引用，按给定 key 删除）；不存在时忽略。"""
+    key = _object_key(stored_path)
+    _cache.discard(key)
+    with _aliases_lock:
+        _aliases.pop(key, None)
+    with _presigned_lock:
+        _presigned.pop(key, None)
+    if _use_minio and _minio_client:
+        try:
+            _minio_client.remove_object(_bucket, key)
+        except S3Error:
+            pass
+        return
+    local = _local_path(key)
+    if local:
+        local.unlink(missing_ok=True)
+
+
+def list_upload_objects() -> Iterator[Tuple[str, int, datetime]]:
+    """遍历 uploads/ 下全部对象（不含子目录），返回 (key, 大小, UTC 修改时间)，不逐个 stat。"""
+    if _use_minio and _minio_client:
+        for obj in _minio_client.list_objects(_bucket, prefix="uploads/"):
+            if not obj.is_dir:
+                yield obj.object_name, int(obj.size or 0), obj.last_modified
+        return
+    for path in sorted(UPLOAD_DIR.iterdir()):
+        if path.is_file():
+            st = path.stat()
+            yield f"uploads/{path.name}", st.st_size, datetime.fromtimestamp(st.st_mtime, timezone.utc)
+
+
+def list_upload_keys() -> Iterator[str]:
+    """遍历 uploads/ 下全部对象 key（不含子目录）。"""
+    for key, _, _ in list_upload_objects():
+        yield key
 
 
 def public_upload_url_path(stored_path: str) -> str:
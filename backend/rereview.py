@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+按当前智能初审逻辑，对存量「人工复核」举报分批重审。
+
+调整 AUTO_REVIEW_THRESHOLD 或更换本地 .pt 模型后使用：默认复用库中已保存的
+ModelRecognitionResult，仅在指定 --reinfer 时重新调用模型识别。每批在一个事务内
+写库，提交后记录检查点，中断后可用 --resume 继续。
+
+执行方式：
+    cd backend
+    python rereview.py --dry-run                 # 仅输出状态变化，不写库
+    python rereview.py --threshold 0.5           # 按新阈值重审并写库
+    python rereview.py --reinfer --chunk-size 50 # 重新识别第一张图片（较慢）
+    python rereview.py --resume                  # 从上次检查点继续
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import selectinload
+
+from app import (
+    AUTO_REVIEW_THRESHOLD,
+    ModelRecognitionResult,
+    Report,
+    SessionLocal,
+    apply_auto_review,
+    recognize_uploaded_image,
+)
+from event_recognition import auto_review_report
+from object_storage import read_upload, suffix_and_mime
+
+DEFAULT_CHECKPOINT = Path(__file__).resolve().parent / "rereview_checkpoint.json"
+REINFER_QUESTION = "图中是否存在校园交通与停车问题（如违停、拥堵、消防通道占用、标识损坏）？请描述位置、类型和风险程度。"
+
+
+def _stored_model_result(row: Optional[ModelRecognitionResult]) -> Dict[str, Any]:
+    """将库中识别记录还原为 auto_review_report 所需的结构。"""
+    if row is None:
+        return {"success": False, "event_type": None, "confidence": 0.0, "structured_data": {}, "answer": ""}
+    return {
+        # 识别失败时 create_report 保存的 answer 为空
+        "success": bool(row.answer),
+        "event_type": row.event_type_detected,
+        "confidence": float(row.confidence) if row.confidence is not None else 0.0,
+        "structured_data": row.structured_data or {},
+        "answer": row.answer or "",
+    }
+
+
+def _reinfer(report: Report) -> Optional[Dict[str, Any]]:
+    """重新识别举报的第一张图片；图片缺失时返回 None。"""
+    images = sorted(report.images, key=lambda img: img.image_order)
+    if not images:
+        return None
+    raw = read_upload(images[0].image_url)
+    if not raw:
+        return None
+    _, mime_type = suffix_and_mime(images[0].image_url)
+    image_base64 = f"data:{mime_type};base64,{base64.b64encode(raw).decode('utf-8')}"
+    result = recognize_uploaded_image(raw, image_base64, REINFER_QUESTION)
+    result["image_url"] = images[0].image_url
+    return result
+
+
+def _load_checkpoint(path: Path) -> Dict[str, Any]:
+    if not path.is_file():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _save_checkpoint(path: Path, state: Dict[str, Any]) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(path)
+
+
+def run(
+    threshold: float = AUTO_REVIEW_THRESHOLD,
+    chunk_size: int = 500,
+    dry_run: bool = False,
+    reinfer: bool = False,
+    include_manual: bool = False,
+    checkpoint: Path = DEFAULT_CHECKPOINT,
+    resume: bool = False,
+    limit: Optional[int] = None,
+) -> Dict[str, Any]:
+    state: Dict[str, Any] = _load_checkpoint(checkpoint) if resume else {}
+    if state and state.get("threshold") != threshold:
+        print(f"注意：检查点阈值为 {state.get('threshold')}，本次使用 {threshold}")
+    last_id = int(state.get("last_id", 0))
+    outcomes: Counter = Counter(state.get("outcomes", {}))
+    processed = int(state.get("processed", 0))
+    started = time.monotonic()
+    seen = 0
+
+    db = SessionLocal()
+    try:
+        while limit is None or seen < limit:
+            size = chunk_size if limit is None else min(chunk_size, limit - seen)
+            reports: List[Report] = (
+                db.query(Report)
+                .options(
+                    selectinload(Report.recognition_results),
+                    selectinload(Report.review_records),
+                    selectinload(Report.ticket),
+                    selectinload(Report.images),
+                )
+                .filter(Report.status == "manual_review", Report.id > last_id)
+                .order_by(Report.id.asc())
+                .limit(size)
+                .all()
+            )
+            if not reports:
+                break
+
+            for report in reports:
+                if not include_manual and any(r.review_type == "manual" for r in report.review_records):
+                    outcomes["skipped_manual"] += 1
+                    continue
+
+                model_result: Optional[Dict[str, Any]] = None
+                if reinfer:
+                    model_result = _reinfer(report)
+                    if model_result is not None and not dry_run:
+                        db.add(ModelRecognitionResult(
+                            report_id=report.id,
+                            image_url=model_result["image_url"],
+                            question=REINFER_QUESTION,
+                            answer=model_result.get("answer", ""),
+                            event_type_detected=model_result.get("event_type"),
+                            confidence=float(model_result.get("confidence", 0.0)),
+                            structured_data=model_result.get("structured_data", {}),
+                        ))
+                if model_result is None:
+                    latest = max(report.recognition_results, key=lambda r: r.id, default=None)
+                    model_result = _stored_model_result(latest)
+
+                review_result, review_comment, confidence = auto_review_report(
+                    user_selected_types=[report.event_type] if report.event_type else [],
+                    model_result=model_result,
+                    confidence_threshold=threshold,
+                )
+                if review_result == "need_review":
+                    outcomes["unchanged"] += 1
+                    continue
+
+                outcomes[review_result] += 1
+                old_status = report.status
+                if dry_run:
+                    print(f"#{report.id}\t{old_status} -> {review_result}\t{review_comment}")
+                    continue
+                apply_auto_review(
+                    db,
+                    report,
+                    model_result,
+                    review_result,
+                    review_comment,
+                    confidence,
+                    reviewer_id=report.user_id,
+                )
+                print(f"#{report.id}\t{old_status} -> {report.status}")
+
+            seen += len(reports)
+            processed += len(reports)
+            last_id = reports[-1].id
+            if dry_run:
+                db.rollback()
+            else:
+                db.commit()
+                _save_checkpoint(checkpoint, {
+                    "last_id": last_id,
+                    "threshold": threshold,
+                    "processed": processed,
+                    "outcomes": dict(outcomes),
+                })
+            db.expunge_all()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    elapsed = time.monotonic() - started
+    summary = {
+        "processed": processed,
+        "last_id": last_id,
+        "outcomes": dict(outcomes),
+        "dry_run": dry_run,
+        "per_minute": round(seen / elapsed * 60) if elapsed > 0 else seen,
+    }
+    print(json.dumps(summary, ensure_ascii=False))
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="批量重审人工复核状态的举报")
+    parser.add_argument("--threshold", type=float, default=AUTO_REVIEW_THRESHOLD, help="初审置信度阈值")
+    parser.add_argument("--chunk-size", type=int, default=500, help="每批处理的举报数")
+    parser.add_argument("--limit", type=int, default=None, help="最多处理的举报数")
+    parser.add_argument("--dry-run", action="store_true", help="只输出状态变化，不写库")
+    parser.add_argument("--reinfer", action="store_true", help="重新识别第一张图片，而非复用已保存的识别结果")
+    parser.add_argument("--include-manual", action="store_true", help="包含已有人工审核记录的举报")
+    parser.add_argument("--checkpoint", type=Path, default=DEFAULT_CHECKPOINT, help="检查点文件路径")
+    parser.add_argument("--resume", action="store_true", help="从检查点记录的位置继续")
+    args = parser.parse_args()
+    run(
+        threshold=args.threshold,
+        chunk_size=args.chunk_size,
+        dry_run=args.dry_run,
+        reinfer=args.reinfer,
+        include_manual=args.include_manual,
+        checkpoint=args.checkpoint,
+        resume=args.resume,
+        limit=args.limit,
+    )
+
+
+if __name__ == "__main__":
+    main()
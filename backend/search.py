@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+"""
+举报 / 工单全文检索：举报描述与位置、识别结果回答、工单描述与位置。
+
+MySQL 使用 ngram 分词的 FULLTEXT 索引（MATCH ... AGAINST，自然语言模式相关度排序）；
+其他数据库（SQLite 开发环境）使用 search_terms 表中的二字倒排索引，随写入在同一事务内维护，
+按命中的查询二字词比例排序。结果带高亮摘要（<mark>）。
+
+筛选条件（状态、类型、时间）与命中条件在同一查询中执行；每个命中来源按相关度只取前 offset + limit 个，
+total 为单独 COUNT 得到的精确命中数。
+
+执行方式：
+    cd backend
+    python search.py rebuild          # 重建 SQLite 等环境下的倒排索引（MySQL 无需执行）
+"""
+from __future__ import annotations
+
+import argparse
+import html
+import math
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Type
+
+from sqlalchemy import event, func, inspect, select, union
+from sqlalchemy.orm import Query, Session
+
+SCOPES = ("reports", "tickets")
+# 倒排索引：最低命中比例
+MIN_MATCH_RATIO = 0.5
+SNIPPET_CHARS = 80
+
+# 参与索引的字段：文档类型 -> (模型键, 字段)
+_FIELDS = {
+    "report": ("report", ("description", "location")),
+    "ticket": ("ticket", ("description", "location")),
+    "result": ("result", ("answer",)),
+}
+_NORMALIZE = re.compile(r"[\W_]+", re.UNICODE)
+
+_models: Dict[str, Any] = {}
+_local_index = False
+
+
+def install(session_cls: Type[Session], dialect: str, term_model, report_model, ticket_model, result_model) -> None:
+    """登记模型；非 MySQL 时注册倒排索引维护钩子。"""
+    global _local_index
+    _models.update(term=term_model, report=report_model, ticket=ticket_model, result=result_model)
+    _local_index = dialect != "mysql"
+    if _local_index:
+        event.listen(session_cls, "after_flush", _after_flush)
+
+
+def bigrams(text: str) -> Set[str]:
+    """规范化（小写、去空白与标点）后切成二字词；单字文本返回该字。"""
+    chars = _NORMALIZE.sub("", (text or "").lower())
+    if len(chars) == 1:
+        return {chars}
+    return {chars[i:i + 2] for i in range(len(chars) - 1)}
+
+
+def _doc_terms(obj, doc_type: str) -> Set[str]:
+    terms: Set[str] = set()
+    for field in _FIELDS[doc_type][1]:
+        terms |= bigrams(getattr(obj, field) or "")
+    return terms
+
+
+def _doc_type(obj) -> Optional[str]:
+    for doc_type, (key, _) in _FIELDS.items():
+        if isinstance(obj, _models[key]):
+            return doc_type
+    return None
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    changed: Dict[Tuple[str, int], Optional[Set[str]]] = {}
+    for obj in session.new:
+        doc_type = _doc_type(obj)
+        if doc_type:
+            changed[(doc_type, obj.id)] = _doc_terms(obj, doc_type)
+    for obj in session.dirty:
+        doc_type = _doc_type(obj)
+        if doc_type and any(
+            inspect(obj).attrs[f].history.has_changes() for f in _FIELDS[doc_type][1]
+        ):
+            changed[(doc_type, obj.id)] = _doc_terms(obj, doc_type)
+    for obj in session.deleted:
+        doc_type = _doc_type(obj)
+        if doc_type:
+            changed[(doc_type, obj.id)] = None
+    if changed:
+        _write_terms(session.connection(), changed)
+
+
+def _write_terms(conn, changed: Dict[Tuple[str, int], Optional[Set[str]]]) -> None:
+    table = _models["term"].__table__
+    for (doc_type, doc_id), terms in changed.items():
+        conn.execute(table.delete().where(table.c.doc_type == doc_type, table.c.doc_id == doc_id))
+        if terms:
+            conn.execute(table.insert(), [
+                {"doc_type": doc_type, "term": t, "doc_id": doc_id} for t in sorted(terms)
+            ])
+
+
+def highlight(text: Optional[str], query: str, width: int = SNIPPET_CHARS) -> Optional[str]:
+    """截取首个命中处附近的片段并用 <mark> 标出命中词（已做 HTML 转义）。"""
+    if not text:
+        return None
+    tokens = [t for t in query.split() if t]
+    lowered = text.lower()
+    hits = [t for t in tokens if t.lower() in lowered]
+    if not hits:
+        hits = [g for g in bigrams(query) if g in lowered]
+    if not hits:
+        return None
+    first = min(lowered.find(t.lower()) for t in hits)
+    start = max(0, first - width // 4)
+    end = min(len(text), start + width)
+    piece = text[start:end]
+    pattern = re.compile("|".join(re.escape(t) for t in sorted(hits, key=len, reverse=True)), re.IGNORECASE)
+    out, last = [], 0
+    for m in pattern.finditer(piece):
+        out.append(html.escape(piece[last:m.start()]))
+        out.append(f"<mark>{html.escape(m.group(0))}</mark>")
+        last = m.end()
+    out.append(html.escape(piece[last:]))
+    return ("…" if start > 0 else "") + "".join(out) + ("…" if end < len(text) else "")
+
+
+def _local_hits(db: Session, doc_type: str, grams: Set[str]):
+    """倒排索引命中子查询：(doc_id, hits)，hits 为命中的查询二字词数。"""
+    T = _models["term"]
+    hits = func.count(T.term)
+    return (
+        db.query(T.doc_id.label("doc_id"), hits.label("hits"))
+        .filter(T.doc_type == doc_type, T.term.in_(sorted(grams)))
+        .group_by(T.doc_id)
+        .having(hits >= max(1, math.ceil(len(grams) * MIN_MATCH_RATIO)))
+        .subquery()
+    )
+
+
+def _mysql_match(columns: Iterable[Any], query: str):
+    from sqlalchemy.dialects.mysql import match
+
+    return match(*columns, against=query).in_natural_language_mode()
+
+
+def _sources(db: Session, scope: str, query: str, criteria: List[Any]) -> List[Tuple[Query, Any, Any]]:
+    """各命中来源：(已带筛选条件的查询, 举报/工单 id 列, 相关度列)；举报的识别结果回答命中计入所属举报。
+
+    倒排索引下相关度为命中的查询二字词占比，MySQL 下为 MATCH 得分。
+    """
+    Report, Ticket, Result = _models["report"], _models["ticket"], _models["result"]
+    model = Report if scope == "reports" else Ticket
+    sources: List[Tuple[Query, Any, Any]] = []
+
+    if _local_index:
+        grams = bigrams(query)
+        if not grams:
+            return []
+        docs = _local_hits(db, scope[:-1], grams)
+        score = docs.c.hits * 1.0 / len(grams)
+        sources.append((
+            db.query(docs.c.doc_id, score).join(model, model.id == docs.c.doc_id).filter(*criteria),
+            docs.c.doc_id,
+            score,
+        ))
+        if scope == "reports":
+            results = _local_hits(db, "result", grams)
+            best = func.max(results.c.hits) * 1.0 / len(grams)
+            sources.append((
+                db.query(Result.report_id, best)
+                .join(results, results.c.doc_id == Result.id)
+                .join(Report, Report.id == Result.report_id)
+                .filter(*criteria)
+                .group_by(Result.report_id),
+                Result.report_id,
+                best,
+            ))
+        return sources
+
+    score = _mysql_match((model.description, model.location), query)
+    sources.append((db.query(model.id, score).filter(score > 0, *criteria), model.id, score))
+    if scope == "reports":
+        answer_score = _mysql_match((Result.answer,), query)
+        best = func.max(answer_score)
+        sources.append((
+            db.query(Result.report_id, best)
+            .join(Report, Report.id == Result.report_id)
+            .filter(answer_score > 0, *criteria)
+            .group_by(Result.report_id),
+            Result.report_id,
+            best,
+        ))
+    return sources
+
+
+def _count(db: Session, sources: List[Tuple[Query, Any, Any]]) -> int:
+    """命中的举报/工单总数（各来源 id 去重）。"""
+    ids = [q.with_entities(id_col).statement for q, id_col, _ in sources]
+    merged = union(*ids).subquery() if len(ids) > 1 else ids[0].subquery()
+    return db.scalar(select(func.count()).select_from(merged)) or 0
+
+
+def search(
+    db: Session,
+    query: str,
+    scope: str = "reports",
+    status: Optional[str] = None,
+    event_type: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> Dict[str, Any]:
+    """全文检索举报或工单，按相关度排序，返回带高亮摘要的结果。"""
+    query = (query or "").strip()
+    if scope not in SCOPES:
+        raise ValueError(f"scope 取值应为 {', '.join(SCOPES)}")
+    if not query:
+        raise ValueError("请输入检索词")
+
+    Report, Ticket, Result = _models["report"], _models["ticket"], _models["result"]
+    model = Report if scope == "reports" else Ticket
+    criteria: List[Any] = []
+    if status:
+        criteria.append(model.status == status)
+    if event_type:
+        criteria.append(model.event_type == event_type)
+    if date_from:
+        criteria.append(model.created_at >= date_from)
+    if date_to:
+        criteria.append(model.created_at <= date_to)
+
+    sources = _sources(db, scope, query, criteria)
+    if not sources:
+        return {"total": 0, "items": []}
+    # 每个来源的前 offset + limit 名合并后即覆盖总排名的前 offset + limit 名（相关度取各来源最大值）
+    scores: Dict[int, float] = {}
+    for q, id_col, score in sources:
+        for doc_id, s in q.order_by(score.desc(), id_col.desc()).limit(offset + limit):
+            scores[doc_id] = max(scores.get(doc_id, 0.0), float(s))
+    if not scores:
+        return {"total": 0, "items": []}
+
+    ranked = sorted(scores, key=lambda k: (-scores[k], -k))
+    page_ids = ranked[offset:offset + limit]
+    by_id = {r.id: r for r in db.query(model).filter(model.id.in_(page_ids))}
+    page = [by_id[i] for i in page_ids if i in by_id]
+
+    answers: Dict[int, str] = {}
+    if scope == "reports" and page:
+        for report_id, answer in (
+            db.query(Result.report_id, Result.answer)
+            .filter(Result.report_id.in_([r.id for r in page]))
+            .order_by(Result.id)
+        ):
+            answers.setdefault(report_id, answer)
+
+    items = []
+    for row in page:
+        snippet, matched_in = None, None
+        for field, text in (
+            ("description", row.description),
+            ("location", row.location),
+            ("recognition", answers.get(row.id)),
+        ):
+            snippet = highlight(text, query)
+            if snippet:
+                matched_in = field
+                break
+        items.append({
+            "type": scope[:-1],
+            "id": row.id,
+            "ticket_no": getattr(row, "ticket_no", None),
+            "score": round(scores[row.id], 4),
+            "status": row.status,
+            "event_type": row.event_type,
+            "location": row.location,
+            "snippet": snippet,
+            "matched_in": matched_in,
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+        })
+    return {"total": _count(db, sources), "items": items}
+
+
+def rebuild(db: Session, batch_size: int = 500) -> int:
+    """全量重建倒排索引（按 id 分批读取），返回索引的文档数。"""
+    T = _models["term"]
+    db.query(T).delete(synchronize_session=False)
+    done = 0
+    for doc_type, (key, fields) in _FIELDS.items():
+        model = _models[key]
+        cols = [model.id] + [getattr(model, f) for f in fields]
+        last_id = 0
+        while True:
+            rows = db.query(*cols).filter(model.id > last_id).order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+            batch: Dict[Tuple[str, int], Optional[Set[str]]] = {}
+            for row in rows:
+                terms: Set[str] = set()
+                for value in row[1:]:
+                    terms |= bigrams(value or "")
+                batch[(doc_type, row[0])] = terms
+            _write_terms(db.connection(), batch)
+            done += len(rows)
+            last_id = rows[-1][0]
+    db.commit()
+    return done
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="举报 / 工单全文检索索引")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_rebuild = sub.add_parser("rebuild", help="重建倒排索引（仅非 MySQL 环境）")
+    p_rebuild.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    from app import SessionLocal
+
+    if not _local_index:
+        print("MySQL 使用 FULLTEXT 索引，无需重建（见 sql/migrate_fulltext_search.sql）")
+        return
+    db = SessionLocal()
+    try:
+        print(f"已索引 {rebuild(db, batch_size=args.batch_size)} 个文档")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
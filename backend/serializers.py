@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+响应序列化：orjson 响应类与按字段预编译的行序列化器。
+
+FastJSONResponse 作为应用默认响应类，直接用 orjson 编码（datetime 原生输出 ISO 8601，
+Decimal 转 float）。接口直接返回 FastJSONResponse 时 FastAPI 不再执行 jsonable_encoder，
+大列表只做一次编码。
+
+RowSerializer 在创建时确定字段与取值方式（attrgetter），ORM 对象与 SQL 结果行（Row）
+均可直接转换，避免逐行逐字段 isoformat / float 转换。
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+from operator import attrgetter
+from typing import Any, Dict, Iterable, List, Sequence
+
+import orjson
+from fastapi.responses import JSONResponse
+from sqlalchemy import Numeric
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode("utf-8", errors="replace")
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """orjson 编码的 JSON 响应。"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class RowSerializer:
+    """按固定字段把 ORM 对象或查询结果行转为 dict；Decimal 字段转 float（空值与 0 记为 None，与原接口一致）。"""
+
+    def __init__(self, fields: Sequence[str], decimal_fields: Iterable[str] = ()):
+        self.fields = tuple(fields)
+        decimals = set(decimal_fields)
+        self._decimal_idx = tuple(i for i, f in enumerate(self.fields) if f in decimals)
+        getter = attrgetter(*self.fields)
+        self._get = getter if len(self.fields) > 1 else (lambda row: (getter(row),))
+
+    @classmethod
+    def for_model(cls, model, fields: Sequence[str]) -> "RowSerializer":
+        """由模型列类型推断需要转换的 Decimal 字段。"""
+        columns = model.__table__.c
+        decimals = [f for f in fields if f in columns and isinstance(columns[f].type, Numeric)]
+        return cls(fields, decimals)
+
+    def __call__(self, row: Any) -> Dict[str, Any]:
+        values = self._get(row)
+        if self._decimal_idx:
+            values = list(values)
+            for i in self._decimal_idx:
+                values[i] = float(values[i]) if values[i] else None
+        return dict(zip(self.fields, values))
+
+    def many(self, rows: Iterable[Any]) -> List[Dict[str, Any]]:
+        return [self(row) for row in rows]
+
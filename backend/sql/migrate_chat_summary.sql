@@ -0,0 +1,4 @@
+-- Traffix 扩展：会话滚动摘要（较早的对话轮次压缩后随请求发送给模型）
+
+ALTER TABLE chat_sessions ADD COLUMN summary TEXT NULL;
+ALTER TABLE chat_sessions ADD COLUMN summary_upto_id INT NULL;
@@ -0,0 +1,7 @@
+-- Traffix 扩展：管理端读接口 ETag 使用的数据变更计数（应用启动时 create_all 也会创建）
+-- 无需回填：计数从 0 开始，首次写入后递增
+
+CREATE TABLE IF NOT EXISTS data_versions (
+    name VARCHAR(32) NOT NULL PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,19 @@
+-- Traffix 扩展：工单指派规则（应用启动时 create_all 也会创建）
+-- 建表后可执行 python dispatch_rules.py seed 写入内置默认规则；表为空时使用内置规则
+
+CREATE TABLE IF NOT EXISTS dispatch_rules (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    event_type VARCHAR(100) NULL,
+    match_mode VARCHAR(16) NOT NULL DEFAULT 'exact',
+    location_pattern VARCHAR(255) NULL,
+    start_minute INT NULL,
+    end_minute INT NULL,
+    weekdays VARCHAR(7) NULL,
+    department_code VARCHAR(64) NOT NULL,
+    unit_code VARCHAR(64) NOT NULL,
+    priority INT NOT NULL DEFAULT 0,
+    enabled TINYINT(1) NOT NULL DEFAULT 1,
+    created_at DATETIME NULL,
+    updated_at DATETIME NULL,
+    INDEX ix_dispatch_rules_id (id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
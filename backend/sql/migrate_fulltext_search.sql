@@ -0,0 +1,6 @@
+-- Traffix 扩展：管理端全文检索（MySQL 5.7.6+ / 8.0 内置 ngram 分词，默认 ngram_token_size=2）
+-- 大表建索引耗时较长，建议在低峰期执行
+
+ALTER TABLE reports ADD FULLTEXT INDEX ft_reports_text (description, location) WITH PARSER ngram;
+ALTER TABLE tickets ADD FULLTEXT INDEX ft_tickets_text (description, location) WITH PARSER ngram;
+ALTER TABLE model_recognition_results ADD FULLTEXT INDEX ft_recognition_answer (answer) WITH PARSER ngram;
@@ -0,0 +1,6 @@
+-- Traffix 扩展：管理端列表游标分页索引（按状态筛选 + created_at 倒序）
+-- InnoDB 二级索引隐含主键 id，(status, created_at) 即可覆盖 (status, created_at, id) 排序
+
+ALTER TABLE reports ADD INDEX idx_reports_status_created (status, created_at);
+ALTER TABLE tickets ADD INDEX idx_tickets_status_created (status, created_at);
+ALTER TABLE report_images ADD INDEX ix_report_images_created_at (created_at);
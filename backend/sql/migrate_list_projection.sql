@@ -0,0 +1,41 @@
+-- Traffix 扩展：管理端举报 / 工单列表投影表（应用启动时 create_all 也会创建）
+-- 建表后执行 python list_views.py rebuild 回填，再设置 LIST_PROJECTION=true
+
+CREATE TABLE IF NOT EXISTS report_list_items (
+    id INT NOT NULL PRIMARY KEY,
+    user_id INT NOT NULL,
+    username VARCHAR(50) NULL,
+    event_type VARCHAR(100) NULL,
+    location VARCHAR(255) NULL,
+    description TEXT NULL,
+    status VARCHAR(32) NOT NULL,
+    images JSON NULL,
+    recognition_results JSON NULL,
+    auto_review_result VARCHAR(50) NULL,
+    auto_review_confidence DECIMAL(5, 2) NULL,
+    created_at DATETIME NULL,
+    INDEX ix_report_list_items_user_id (user_id),
+    INDEX ix_report_list_items_created_at (created_at),
+    INDEX idx_report_list_status_created (status, created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS ticket_list_items (
+    id INT NOT NULL PRIMARY KEY,
+    ticket_no VARCHAR(50) NOT NULL,
+    report_id INT NOT NULL,
+    event_type VARCHAR(100) NULL,
+    location VARCHAR(255) NULL,
+    description TEXT NULL,
+    status VARCHAR(32) NOT NULL,
+    priority VARCHAR(16) NULL,
+    assigned_to INT NULL,
+    assigned_department VARCHAR(200) NULL,
+    assigned_unit VARCHAR(200) NULL,
+    department_code VARCHAR(64) NULL,
+    unit_code VARCHAR(64) NULL,
+    images JSON NULL,
+    created_at DATETIME NULL,
+    updated_at DATETIME NULL,
+    INDEX ix_ticket_list_items_created_at (created_at),
+    INDEX idx_ticket_list_status_created (status, created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,9 @@
+-- Traffix 扩展：管理端统计计数汇总表（应用启动时 create_all 也会创建）
+-- 建表后（已有数据时）执行 python stats_rollup.py rebuild 由明细回填；统计接口只读，不会自动回填
+
+CREATE TABLE IF NOT EXISTS stat_counters (
+    scope VARCHAR(32) NOT NULL,
+    name VARCHAR(100) NOT NULL DEFAULT '',
+    value BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, name)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,6 @@
+-- Traffix 扩展：已结案工单分析字段（违规细分、事故标记），结案时写入
+-- 执行后运行 python analytics_completed.py backfill 补算存量已结案工单
+
+ALTER TABLE tickets ADD COLUMN violation_category VARCHAR(50) NULL;
+ALTER TABLE tickets ADD COLUMN is_accident TINYINT(1) NOT NULL DEFAULT 0;
+ALTER TABLE tickets ADD INDEX idx_tickets_status_violation (status, violation_category);
@@ -0,0 +1,12 @@
+-- Traffix 扩展：趋势预聚合桶（应用启动时 create_all 也会创建）
+-- 建表后执行 python trends.py rebuild 由明细回填
+
+CREATE TABLE IF NOT EXISTS trend_buckets (
+    granularity VARCHAR(8) NOT NULL,
+    metric VARCHAR(16) NOT NULL,
+    dimension VARCHAR(16) NOT NULL,
+    bucket_start DATETIME NOT NULL,
+    value VARCHAR(100) NOT NULL,
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (granularity, metric, dimension, bucket_start, value)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
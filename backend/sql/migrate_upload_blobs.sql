@@ -0,0 +1,22 @@
+-- Traffix 扩展：内容寻址上传存储（UPLOAD_CAS=true）
+-- 应用启动时 create_all 也会建表；已有库可手动执行
+
+CREATE TABLE IF NOT EXISTS upload_blobs (
+    sha256 VARCHAR(64) NOT NULL PRIMARY KEY COMMENT '内容 SHA-256',
+    object_key VARCHAR(500) NOT NULL UNIQUE COMMENT '对象 key：uploads/cas_<sha256><ext>',
+    size BIGINT NOT NULL DEFAULT 0,
+    content_type VARCHAR(100) NULL,
+    ref_count INT NOT NULL DEFAULT 0 COMMENT '引用该对象的库中路径数',
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_created_at (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS upload_refs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    image_url VARCHAR(500) NOT NULL UNIQUE COMMENT '库中路径（report_images/messages 等表的 image_url）',
+    blob_sha256 VARCHAR(64) NOT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (blob_sha256) REFERENCES upload_blobs(sha256),
+    INDEX idx_blob_sha256 (blob_sha256),
+    INDEX idx_created_at (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+管理端统计计数汇总表（stat_counters），随举报/工单写入在同一事务内增量维护。
+
+计数分组（scope -> name）：
+    reports_total / tickets_total   name 为空串
+    report_event_type               举报事件类型
+    ticket_status                   工单状态
+    reports_daily / tickets_daily   UTC 日期 YYYY-MM-DD
+
+/api/admin/statistics 一次查询读取全部计数，并在进程内短时缓存（STATS_CACHE_TTL 秒）。
+读取接口不做回填：已有数据的库建表后、批量导入或手工改库后执行 rebuild（同 list_views / trends）。
+新库从空表开始由增量维护，无需回填。
+
+执行方式：
+    cd backend
+    python stats_rollup.py rebuild
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from sqlalchemy import event, func, inspect, or_
+from sqlalchemy.orm import Session
+
+CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "5"))
+DAILY_SCOPES = ("reports_daily", "tickets_daily")
+
+logger = logging.getLogger(__name__)
+
+_models: Dict[str, Any] = {}
+_warned_empty = False
+_cache_lock = threading.Lock()
+_cache: Tuple[float, Optional[Dict[str, Dict[str, int]]]] = (0.0, None)
+
+Deltas = Dict[Tuple[str, str], int]
+
+
+def install(session_cls: Type[Session], counter_model, report_model, ticket_model) -> None:
+    """在 Session 类上注册 after_flush 钩子（同步与异步会话均生效）；由 app 在模型定义后调用。"""
+    _models.update(counter=counter_model, report=report_model, ticket=ticket_model)
+    # active_history：赋值时先加载旧值（属性已过期时也能拿到），否则状态迁移无法正确扣减
+    event.listen(report_model.event_type, "set", _keep_history, active_history=True)
+    event.listen(ticket_model.status, "set", _keep_history, active_history=True)
+    event.listen(session_cls, "after_flush", _after_flush)
+
+
+def _keep_history(target, value, oldvalue, initiator):
+    return value
+
+
+def _day(value: Optional[datetime]) -> str:
+    return (value or datetime.utcnow()).date().isoformat()
+
+
+def _history(obj, attr: str) -> Tuple[Optional[Any], Optional[Any]]:
+    """返回 (旧值, 新值)；属性未变化时返回 (None, None)。"""
+    hist = inspect(obj).attrs[attr].history
+    if not hist.has_changes():
+        return None, None
+    old = hist.deleted[0] if hist.deleted else None
+    new = hist.added[0] if hist.added else None
+    return old, new
+
+
+def _collect(session: Session) -> Deltas:
+    Report, Ticket = _models["report"], _models["ticket"]
+    deltas: Deltas = defaultdict(int)
+
+    def report_counts(r, sign: int) -> None:
+        deltas[("reports_total", "")] += sign
+        deltas[("reports_daily", _day(r.created_at))] += sign
+        if r.event_type:
+            deltas[("report_event_type", r.event_type)] += sign
+
+    def ticket_counts(t, sign: int) -> None:
+        deltas[("tickets_total", "")] += sign
+        deltas[("tickets_daily", _day(t.created_at))] += sign
+        deltas[("ticket_status", t.status or "pending")] += sign
+
+    for obj in session.new:
+        if isinstance(obj, Report):
+            report_counts(obj, 1)
+        elif isinstance(obj, Ticket):
+            ticket_counts(obj, 1)
+    for obj in session.deleted:
+        if isinstance(obj, Report):
+            report_counts(obj, -1)
+        elif isinstance(obj, Ticket):
+            ticket_counts(obj, -1)
+    for obj in session.dirty:
+        if isinstance(obj, Report):
+            old, new = _history(obj, "event_type")
+            if old != new:
+                if old:
+                    deltas[("report_event_type", old)] -= 1
+                if new:
+                    deltas[("report_event_type", new)] += 1
+        elif isinstance(obj, Ticket):
+            old, new = _history(obj, "status")
+            if old != new and old and new:
+                deltas[("ticket_status", old)] -= 1
+                deltas[("ticket_status", new)] += 1
+    return {k: v for k, v in deltas.items() if v}
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    deltas = _collect(session)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def apply_deltas(conn, deltas: Deltas) -> None:
+    """计数增量写入 stat_counters。"""
+    rows = [{"scope": s, "name": n, "value": v} for (s, n), v in sorted(deltas.items())]
+    increment(conn, _models["counter"].__table__, ("scope", "name"), rows)
+
+
+def increment(conn, table, key_cols: Tuple[str, ...], rows: List[Dict[str, Any]], value_col: str = "value") -> None:
+    """按方言执行 upsert：value = value + delta（行按主键排序后写入，减少并发死锁）。"""
+    if not rows:
+        return
+    value = table.c[value_col]
+    dialect = conn.dialect.name
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+
+        stmt = insert(table).values(rows)
+        conn.execute(stmt.on_duplicate_key_update({value_col: value + stmt.inserted[value_col]}))
+    elif dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+
+        stmt = insert(table).values(rows)
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c[k] for k in key_cols],
+            set_={value_col: value + stmt.excluded[value_col]},
+        ))
+    else:
+        for row in rows:
+            updated = conn.execute(
+                table.update()
+                .where(*(table.c[k] == row[k] for k in key_cols))
+                .values({value_col: value + row[value_col]})
+            )
+            if updated.rowcount == 0:
+                conn.execute(table.insert().values(**row))
+
+
+def snapshot(db: Session, today: Optional[date] = None) -> Dict[str, Dict[str, int]]:
+    """一次查询读取全部计数（日计数只取今天），结果在进程内缓存 CACHE_TTL 秒。只读。"""
+    global _cache, _warned_empty
+    now = time.monotonic()
+    with _cache_lock:
+        expires, cached = _cache
+    if cached is not None and expires > now:
+        return cached
+
+    Counter = _models["counter"]
+    today_key = (today or datetime.utcnow().date()).isoformat()
+    rows = (
+        db.query(Counter.scope, Counter.name, Counter.value)
+        .filter(or_(Counter.scope.notin_(DAILY_SCOPES), Counter.name == today_key))
+        .all()
+    )
+    if not rows and not _warned_empty and db.query(_models["report"].id).first() is not None:
+        # 读路径上回填会与并发写入的增量重复计数，只提示执行离线重建
+        _warned_empty = True
+        logger.warning("stat_counters 为空但已有举报数据，请执行 python stats_rollup.py rebuild")
+
+    result: Dict[str, Dict[str, int]] = defaultdict(dict)
+    for scope, name, value in rows:
+        result[scope][name] = int(value)
+    result = dict(result)
+    with _cache_lock:
+        _cache = (now + CACHE_TTL, result)
+    return result
+
+
+def rebuild(db: Session) -> int:
+    """由明细表重新计算全部计数（GROUP BY），返回写入的计数行数。"""
+    global _cache
+    Counter, Report, Ticket = _models["counter"], _models["report"], _models["ticket"]
+    deltas: Deltas = {}
+    deltas[("reports_total", "")] = db.query(func.count(Report.id)).scalar() or 0
+    deltas[("tickets_total", "")] = db.query(func.count(Ticket.id)).scalar() or 0
+    for et, n in db.query(Report.event_type, func.count(Report.id)).filter(
+        Report.event_type.isnot(None)
+    ).group_by(Report.event_type):
+        deltas[("report_event_type", et)] = n
+    for st, n in db.query(Ticket.status, func.count(Ticket.id)).group_by(Ticket.status):
+        deltas[("ticket_status", st)] = n
+    for scope, model in (("reports_daily", Report), ("tickets_daily", Ticket)):
+        day = func.date(model.created_at)
+        for d, n in db.query(day, func.count(model.id)).group_by(day):
+            if d is not None:
+                deltas[(scope, d if isinstance(d, str) else d.isoformat())] = n
+
+    db.query(Counter).delete(synchronize_session=False)
+    deltas = {k: v for k, v in deltas.items() if v}
+    if deltas:
+        apply_deltas(db.connection(), deltas)
+    db.commit()
+    with _cache_lock:
+        _cache = (0.0, None)
+    return len(deltas)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="管理端统计计数汇总表")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="由 reports / tickets 明细重建全部计数")
+    parser.parse_args()
+
+    from app import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print(f"已重建 {rebuild(db)} 条统计计数")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+后端测试：SQLite 临时库，不依赖 MySQL / MinIO / 模型服务。
+
+执行方式：
+    cd backend
+    python -m pytest -q tests
+"""
+import os
+import sys
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ["APP_ENV"] = "test"
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ["USE_MINIO"] = "false"
+os.environ["USE_LOCAL_PT"] = "false"
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    import app
+
+    return app
+
+
+@pytest.fixture
+def db(app_module):
+    session = app_module.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    """本地上传目录指向临时目录。"""
+    import object_storage
+
+    (tmp_path / "uploads").mkdir()
+    monkeypatch.setattr(object_storage, "BASE_DIR", tmp_path)
+    monkeypatch.setattr(object_storage, "UPLOAD_DIR", tmp_path / "uploads")
+    return tmp_path / "uploads"
+
+
+@pytest.fixture
+def api(app_module):
+    """在事件循环中经 ASGI 调用接口，返回 (响应, 本次请求执行的 SQL 条数)。"""
+    import asyncio
+
+    import httpx
+
+    import auth
+    from db_metrics import track_queries
+
+    def call(path, params=None, token=None, role="admin", method="GET", data=None, files=None):
+        token = token or auth.create_access_token({"sub": "1", "role": role})
+
+        async def run():
+            transport = httpx.ASGITransport(app=app_module.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                with track_queries() as stats:
+                    response = await client.request(
+                        method, path, params=params, data=data, files=files,
+                        headers={"Authorization": f"Bearer {token}"},
+                    )
+            return response, stats.count
+
+        return asyncio.run(run())
+
+    return call
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+def test_analytics_classifies_unbackfilled_tickets_without_writing(app_module, db, api):
+    user = app_module.User(username="analytics-user", phone="analytics-user", password_hash="x", role="public")
+    db.add(user)
+    db.flush()
+    report = app_module.Report(user_id=user.id, event_type="事故")
+    db.add(report)
+    db.flush()
+    # 绕过 ORM 钩子写入（模拟批量导入），violation_category 为空
+    db.execute(app_module.Ticket.__table__.insert().values(
+        report_id=report.id, ticket_no="T-ANALYTICS-1", event_type="事故", location="东门环岛",
+        description="两车剐蹭", status="closed", priority="medium", is_accident=False,
+    ))
+    db.commit()
+
+    response, _ = api("/api/admin/analytics/completed-tickets")
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    categories = {row["category"]: row["count"] for row in body["by_violation_category"]}
+    assert categories.get("校内事故风险", 0) >= 1
+    assert any(row["location"] == "东门环岛" for row in body["accident_hotspots"])
+    db.expire_all()
+    ticket = db.query(app_module.Ticket).filter_by(ticket_no="T-ANALYTICS-1").one()
+    assert ticket.violation_category is None
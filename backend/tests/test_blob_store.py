@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+
+import blob_store
+
+
+def _put(upload_dir, name, age_hours):
+    path = upload_dir / name
+    path.write_bytes(name.encode())
+    mtime = time.time() - age_hours * 3600
+    os.utime(path, (mtime, mtime))
+    return f"uploads/{name}"
+
+
+def _blob(app_module, db, name, ref_count, age_hours):
+    sha = hashlib.sha256(name.encode()).hexdigest()
+    db.add(app_module.UploadBlob(
+        sha256=sha, object_key=f"uploads/{name}", size=1, ref_count=ref_count,
+        created_at=datetime.utcnow() - timedelta(hours=age_hours),
+    ))
+    db.commit()
+    return sha
+
+
+def test_gc_sweeps_unregistered_objects_after_grace(app_module, db, upload_dir):
+    _put(upload_dir, "cas_orphan_old.jpg", 48)
+    _put(upload_dir, "cas_orphan_new.jpg", 0)
+    _put(upload_dir, "tmp_upload_old.jpg", 48)
+    _put(upload_dir, "tmp_upload_new.jpg", 0)
+    _put(upload_dir, "cas_dead.jpg", 48)
+    _put(upload_dir, "cas_live.jpg", 48)
+    _put(upload_dir, "legacy_plain.jpg", 48)
+    dead = _blob(app_module, db, "cas_dead.jpg", 0, 48)
+    live = _blob(app_module, db, "cas_live.jpg", 1, 48)
+
+    stats = blob_store.gc(grace_hours=24)
+
+    assert sorted(p.name for p in upload_dir.iterdir()) == [
+        "cas_live.jpg", "cas_orphan_new.jpg", "legacy_plain.jpg", "tmp_upload_new.jpg",
+    ]
+    assert stats["blobs_removed"] == 1
+    assert stats["orphans_removed"] == 2
+    db.expire_all()
+    assert db.get(app_module.UploadBlob, dead) is None
+    assert db.get(app_module.UploadBlob, live) is not None
+
+
+def test_gc_keeps_blob_referenced_again_before_delete(app_module, db, upload_dir):
+    _put(upload_dir, "cas_revived.jpg", 48)
+    sha = _blob(app_module, db, "cas_revived.jpg", 0, 48)
+    db.add(app_module.UploadRef(image_url="uploads/revived_upload.jpg", blob_sha256=sha))
+    db.commit()
+
+    stats = blob_store.gc(grace_hours=24)
+
+    assert stats["blobs_removed"] == 0
+    assert (upload_dir / "cas_revived.jpg").exists()
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import chat_history
+from chat_history import load_window
+
+
+def _session_with_messages(app_module, db, n):
+    session = app_module.ChatSession(title="t")
+    db.add(session)
+    db.flush()
+    for i in range(n):
+        db.add(app_module.Message(session_id=session.id, role="user" if i % 2 == 0 else "assistant", content=f"m{i}"))
+    db.commit()
+    ids = [m.id for m in db.query(app_module.Message.id).filter_by(session_id=session.id).order_by(app_module.Message.id)]
+    return session, ids
+
+
+def test_window_over_count_cap_folds_every_older_message(app_module, db):
+    n = chat_history.HISTORY_MAX_MESSAGES + 15
+    session, ids = _session_with_messages(app_module, db, n)
+
+    summary, history, evicted, upto = load_window(db, session, before_id=ids[-1] + 1)
+
+    assert summary is None
+    assert len(history) <= chat_history.HISTORY_MAX_MESSAGES
+    # 历史与待并入部分首尾相接，覆盖全部消息且不重复
+    assert [t["content"] for t in evicted + history] == [f"m{i}" for i in range(n)]
+    assert upto == ids[len(evicted) - 1]
+
+
+def test_window_after_fold_resumes_from_summary_upto_id(app_module, db):
+    n = 2 * chat_history.HISTORY_MAX_MESSAGES + 5
+    session, ids = _session_with_messages(app_module, db, n)
+    session.summary = "早先的摘要"
+    session.summary_upto_id = ids[9]
+    db.commit()
+
+    summary, history, evicted, upto = load_window(db, session, before_id=ids[-1] + 1)
+
+    assert summary == "早先的摘要"
+    assert [t["content"] for t in evicted + history] == [f"m{i}" for i in range(10, n)]
+    assert upto == ids[9 + len(evicted)]
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def image_at_10_utc(app_module):
+    db = app_module.SessionLocal()
+    try:
+        user = app_module.User(username="date-user", phone="date-user", password_hash="x", role="public")
+        db.add(user)
+        db.flush()
+        report = app_module.Report(user_id=user.id, event_type="占用消防通道", created_at=datetime(2031, 1, 1, 10, 30))
+        db.add(report)
+        db.flush()
+        db.add(app_module.ReportImage(
+            report_id=report.id, image_url="/uploads/date_filter.jpg", created_at=datetime(2031, 1, 1, 10, 30),
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("date_from,date_to,expected", [
+    ("2031-01-01T18:00:00+08:00", "2031-01-01T19:00:00+08:00", 1),
+    ("2031-01-01T10:00:00Z", "2031-01-01T11:00:00Z", 1),
+    ("2031-01-01T10:00:00", "2031-01-01T11:00:00", 1),
+    ("2031-01-01T10:00:00+08:00", "2031-01-01T11:00:00+08:00", 0),
+])
+def test_data_items_date_range_is_compared_in_utc(api, image_at_10_utc, date_from, date_to, expected):
+    response, _ = api("/api/admin/data", {"event_type": "占用消防通道", "date_from": date_from, "date_to": date_to})
+    assert response.status_code == 200, response.text
+    assert len(response.json()["items"]) == expected
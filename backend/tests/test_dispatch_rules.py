@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import uuid
+
+import pytest
+
+import dispatch_rules
+
+
+def _rule(weekdays):
+    department_code, unit_code = next(iter(dispatch_rules._NAMES))
+    return {
+        "match_mode": dispatch_rules.MATCH_MODES[0],
+        "department_code": department_code,
+        "unit_code": unit_code,
+        "start_minute": None,
+        "end_minute": None,
+        "weekdays": weekdays,
+    }
+
+
+@pytest.mark.parametrize("weekdays,stored", [
+    ("531", "135"),
+    ("1122", "12"),
+    ("7654321", "1234567"),
+    (None, None),
+])
+def test_validate_normalizes_weekdays(weekdays, stored):
+    rule = _rule(weekdays)
+    dispatch_rules.validate(rule)
+    assert rule["weekdays"] == stored
+
+
+@pytest.mark.parametrize("weekdays", ["12345671", "1112223334", "08", "1,2"])
+def test_validate_rejects_bad_weekdays(weekdays):
+    with pytest.raises(ValueError):
+        dispatch_rules.validate(_rule(weekdays))
+
+
+@pytest.mark.parametrize("minute", [0, 480, 1440])
+def test_validate_rejects_empty_window(minute):
+    rule = {**_rule(None), "start_minute": minute, "end_minute": minute}
+    with pytest.raises(ValueError):
+        dispatch_rules.validate(rule)
+
+
+def test_auto_assign_walks_tickets_in_batches(app_module, db):
+    tag = uuid.uuid4().hex[:8]
+    user = app_module.User(username=f"assign-{tag}", phone=f"a{tag}", password_hash="x", role="public")
+    db.add(user)
+    db.flush()
+    mine = []
+    for i in range(8):
+        report = app_module.Report(user_id=user.id, event_type="违章停车", location="北门", description=f"r{i}")
+        db.add(report)
+        db.flush()
+        ticket = app_module.Ticket(report_id=report.id, ticket_no=f"A{tag}{i}", status="pending",
+                                   event_type="违章停车", location="北门")
+        db.add(ticket)
+        db.flush()
+        mine.append(ticket.id)
+    db.commit()
+
+    result = dispatch_rules.auto_assign(
+        db, app_module.Ticket, app_module.TicketRecord, user.id, limit=5000, dry_run=True, batch_size=3,
+    )
+    ids = [item["ticket_id"] for item in result["items"]]
+    assert result["scanned"] >= len(mine)
+    assert ids == sorted(set(ids))
+    assert set(mine) <= set(ids)
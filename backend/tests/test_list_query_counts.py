@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""列表接口的 SQL 条数不随每页条数增长（无逐行懒加载）。"""
+import uuid
+
+import pytest
+
+import auth
+
+LIST_ENDPOINTS = [
+    ("/api/admin/tickets", {}),
+    ("/api/admin/reports", {}),
+    ("/api/admin/data", {}),
+]
+
+
+@pytest.fixture(scope="module")
+def seeded(app_module):
+    db = app_module.SessionLocal()
+    try:
+        tag = uuid.uuid4().hex[:8]
+        staff = app_module.User(username=f"staff-{tag}", phone=f"s{tag}", password_hash="x", role="admin")
+        few = app_module.User(username=f"few-{tag}", phone=f"f{tag}", password_hash="x", role="public")
+        many = app_module.User(username=f"many-{tag}", phone=f"m{tag}", password_hash="x", role="public")
+        db.add_all([staff, few, many])
+        db.flush()
+        for user, n in ((few, 5), (many, 60)):
+            for i in range(n):
+                report = app_module.Report(user_id=user.id, event_type="违章停车", location="北门", description=f"r{i}")
+                db.add(report)
+                db.flush()
+                for k in range(2):
+                    db.add(app_module.ReportImage(report_id=report.id, image_url=f"/uploads/{tag}_{report.id}_{k}.jpg", image_order=k))
+                db.add(app_module.ModelRecognitionResult(
+                    report_id=report.id, image_url=f"/uploads/{tag}_{report.id}_0.jpg",
+                    answer="违章停车", event_type_detected="违章停车", confidence=0.9,
+                ))
+                db.add(app_module.Ticket(report_id=report.id, ticket_no=f"T{tag}{report.id}", status="pending"))
+        db.commit()
+        return {
+            "staff": auth.create_access_token({"sub": str(staff.id), "role": "admin"}),
+            "few": auth.create_access_token({"sub": str(few.id), "role": "public"}),
+            "many": auth.create_access_token({"sub": str(many.id), "role": "public"}),
+        }
+    finally:
+        db.close()
+
+
+def _query_count(api, token, path, params):
+    response, count = api(path, params, token=token)
+    assert response.status_code == 200, response.text
+    return count, response.json()
+
+
+@pytest.mark.parametrize("path,params", LIST_ENDPOINTS)
+def test_list_query_count_independent_of_page_size(api, seeded, path, params):
+    small, small_body = _query_count(api, seeded["staff"], path, {**params, "page_size": 5})
+    large, large_body = _query_count(api, seeded["staff"], path, {**params, "page_size": 50})
+
+    assert len(small_body["items"]) == 5
+    assert len(large_body["items"]) == 50
+    assert 0 < small == large
+
+
+def test_my_reports_query_count_independent_of_report_count(api, seeded):
+    # /api/reports/my 不分页，比较 5 条与 60 条举报的用户
+    few, few_body = _query_count(api, seeded["few"], "/api/reports/my", {})
+    many, many_body = _query_count(api, seeded["many"], "/api/reports/my", {})
+
+    assert len(few_body) == 5
+    assert len(many_body) == 60
+    assert 0 < few == many
+
+
+@pytest.mark.parametrize("path,params", LIST_ENDPOINTS)
+@pytest.mark.parametrize("page_size,effective", [(0, 1), (-5, 1), (100000, 200)])
+def test_list_page_size_is_clamped(api, seeded, path, params, page_size, effective):
+    response, _ = api(path, {**params, "page_size": page_size, "page": 0})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["page_size"] == effective
+    assert len(body["items"]) <= effective
+
+
+def test_data_items_default_is_paged_and_cursor_walks_everything(api, seeded):
+    first, _ = api("/api/admin/data", {"count": "exact"}, token=seeded["staff"])
+    body = first.json()
+    assert len(body["items"]) == 50
+    assert body["has_more"] is True
+
+    seen = [item["id"] for item in body["items"]]
+    cursor = body["next_cursor"]
+    while cursor:
+        response, _ = api("/api/admin/data", {"cursor": cursor, "page_size": 200}, token=seeded["staff"])
+        page = response.json()
+        seen += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+    assert len(seen) == len(set(seen)) == body["total"]
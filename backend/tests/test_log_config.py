@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from log_config import HOT, SamplingFilter
+
+
+def _record(level, **extra):
+    record = logging.LogRecord("t", level, __file__, 1, "msg", None, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_sampling_drops_hot_debug_but_keeps_warnings():
+    sampler = SamplingFilter(0)
+    assert not sampler.filter(_record(logging.DEBUG, **HOT))
+    assert sampler.filter(_record(logging.DEBUG))
+    assert sampler.filter(_record(logging.WARNING, **HOT))
+    assert sampler.filter(_record(logging.ERROR, **HOT))
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import uuid
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def corpus(app_module):
+    db = app_module.SessionLocal()
+    try:
+        tag = uuid.uuid4().hex[:8]
+        user = app_module.User(username=f"search-{tag}", phone=f"q{tag}", password_hash="x", role="public")
+        db.add(user)
+        db.flush()
+        ids = {"pending": [], "closed": []}
+        for i in range(30):
+            status = "pending" if i % 3 else "closed"
+            # 每第五条只在识别结果中命中
+            text = f"井盖缺失 {tag}" if i % 5 else "其他描述"
+            report = app_module.Report(user_id=user.id, event_type="设施损坏", status=status, description=text)
+            db.add(report)
+            db.flush()
+            db.add(app_module.ModelRecognitionResult(
+                report_id=report.id, image_url=f"/uploads/{tag}_{i}.jpg", answer=f"井盖缺失 {tag}",
+            ))
+            ids[status].append(report.id)
+        db.commit()
+        return {"query": f"井盖缺失 {tag}", "ids": ids}
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("status", [None, "pending", "closed"])
+def test_search_total_is_exact_and_pages_cover_all_hits(api, corpus, status):
+    expected = set(corpus["ids"]["pending"] + corpus["ids"]["closed"]) if status is None else set(corpus["ids"][status])
+    seen = []
+    for page in range(1, 10):
+        params = {"q": corpus["query"], "page": page, "page_size": 7}
+        if status:
+            params["status"] = status
+        response, _ = api("/api/admin/search", params)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        assert body["total"] == len(expected)
+        if not body["items"]:
+            break
+        seen += [item["id"] for item in body["items"]]
+
+    assert len(seen) == len(set(seen))
+    assert set(seen) == expected
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+import stats_rollup
+
+
+def test_snapshot_is_read_only_and_rebuild_is_explicit(app_module, db, monkeypatch):
+    user = app_module.User(username="stats-user", phone="stats-user", password_hash="x", role="public")
+    db.add(user)
+    db.flush()
+    db.add(app_module.Report(user_id=user.id, event_type="违章停车"))
+    db.commit()
+    db.query(app_module.StatCounter).delete()
+    db.commit()
+    monkeypatch.setattr(stats_rollup, "_cache", (0.0, None))
+
+    assert stats_rollup.snapshot(db) == {}
+    assert db.query(app_module.StatCounter).count() == 0
+
+    stats_rollup.rebuild(db)
+    counters = stats_rollup.snapshot(db)
+    assert counters["reports_total"][""] == db.query(app_module.Report).count()
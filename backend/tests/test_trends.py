@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import trends
+
+
+@pytest.fixture(scope="module")
+def report_at_10_utc(app_module):
+    db = app_module.SessionLocal()
+    try:
+        user = app_module.User(username="trend-user", phone="trend-user", password_hash="x", role="public")
+        db.add(user)
+        db.flush()
+        db.add(app_module.Report(user_id=user.id, event_type="逆行", created_at=datetime(2030, 1, 1, 10, 30)))
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_trends_accepts_timezone_aware_range(api, report_at_10_utc):
+    response, _ = api("/api/admin/trends", {
+        "start": "2030-01-01T16:00:00+08:00",
+        "end": "2030-01-01T20:00:00+08:00",
+        "bucket": "hour",
+    })
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["timestamps"][0] == "2030-01-01T08:00:00"
+    assert body["series"]["逆行"] == [0, 0, 1, 0]
+
+
+def test_trends_aware_start_with_default_end(api):
+    start = datetime.now(timezone(timedelta(hours=8))) - timedelta(days=3)
+    response, _ = api("/api/admin/trends", {"start": start.isoformat(), "bucket": "day"})
+    assert response.status_code == 200, response.text
+
+
+@pytest.mark.parametrize("start,end", [
+    ("2030-01-02T00:00:00Z", "2030-01-01T00:00:00Z"),
+    ("2030-01-01T08:00:00+08:00", "2030-01-01T00:00:00"),
+])
+def test_trends_rejects_start_not_before_end(api, start, end):
+    response, _ = api("/api/admin/trends", {"start": start, "end": end})
+    assert response.status_code == 400
+
+
+def _buckets(db, app_module, **filters):
+    B = app_module.TrendBucket
+    query = db.query(B.granularity, B.value, B.count).filter(B.metric == "reports")
+    for key, value in filters.items():
+        query = query.filter(getattr(B, key) == value)
+    return query.all()
+
+
+def test_updates_outside_retention_do_not_recreate_hour_buckets(app_module, db):
+    created = trends.bucket_start(datetime.utcnow() - timedelta(days=trends.HOURLY_RETENTION_DAYS + 5), "hour")
+    user = app_module.User(username="trend-old", phone="trend-old", password_hash="x", role="public")
+    db.add(user)
+    db.flush()
+    report = app_module.Report(user_id=user.id, event_type="占道经营", status="pending", created_at=created)
+    db.add(report)
+    db.commit()
+    report.status = "closed"
+    db.commit()
+
+    assert _buckets(db, app_module, granularity="hour", bucket_start=created) == []
+    day = _buckets(db, app_module, granularity="day", dimension="status",
+                   bucket_start=trends.bucket_start(created, "day"))
+    assert ("day", "closed", 1) in day and ("day", "pending", 0) in day
+
+
+def test_location_dimension_is_capped(app_module, db, monkeypatch):
+    locations = trends._Locations()
+    locations.reset(["北门"])
+    monkeypatch.setattr(trends, "_locations", locations)
+    monkeypatch.setattr(trends, "LOCATION_LIMIT", 1)
+    created = datetime(2031, 3, 1, 9)
+    user = app_module.User(username="trend-loc", phone="trend-loc", password_hash="x", role="public")
+    db.add(user)
+    db.flush()
+    db.add_all([
+        app_module.Report(user_id=user.id, location="  北门 ", created_at=created),
+        app_module.Report(user_id=user.id, location="第三食堂二楼", created_at=created),
+    ])
+    db.commit()
+
+    day = _buckets(db, app_module, granularity="day", dimension="location", bucket_start=created.replace(hour=0))
+    assert sorted(day) == [("day", "其他", 1), ("day", "北门", 1)]
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""举报创建、人工复核、工单更新与对话消息（异步会话）的写入路径。"""
+import io
+
+import pytest
+from PIL import Image
+
+import auth
+
+
+@pytest.fixture
+def public_user(app_module, db):
+    user = app_module.User(username="writer", phone="13800000001", password_hash="x", role="public")
+    db.add(user)
+    db.commit()
+    return user
+
+
+def _png() -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 8), "red").save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_create_review_and_update_ticket(app_module, db, api, upload_dir, public_user):
+    token = auth.create_access_token({"sub": str(public_user.id), "role": "public"})
+    response, _ = api(
+        "/api/reports", method="POST", token=token,
+        data={"event_type": "违章停车", "location": "图书馆东侧", "description": "占道停车"},
+        files=[("images", ("a.png", _png(), "image/png"))],
+    )
+    assert response.status_code == 200, response.text
+    report_id = response.json()["id"]
+    report = db.get(app_module.Report, report_id)
+    assert report.contact_phone == "13800000001"
+    assert len(report.images) == 1
+
+    response, _ = api(f"/api/admin/reports/{report_id}/review", method="POST", data={"review_result": "approved"})
+    assert response.status_code == 200, response.text
+    db.expire_all()
+    ticket = db.query(app_module.Ticket).filter_by(report_id=report_id).one()
+    assert db.get(app_module.Report, report_id).status == "approved"
+
+    response, _ = api(
+        f"/api/admin/tickets/{ticket.id}/update", method="POST",
+        data={"status": "closed", "assigned_department": "保卫处"},
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["ticket"]["status"] == "closed"
+    db.expire_all()
+    ticket = db.get(app_module.Ticket, ticket.id)
+    assert ticket.assigned_department == "保卫处"
+    # 结案时由 analytics_completed 的 before_flush 钩子分类（异步会话同样生效）
+    assert ticket.violation_category == "停车秩序问题"
+    assert db.query(app_module.TicketRecord).filter_by(ticket_id=ticket.id).count() == 1
+
+
+def test_review_and_update_missing_rows_return_404(api):
+    response, _ = api("/api/admin/reports/999999/review", method="POST", data={"review_result": "approved"})
+    assert response.status_code == 404
+    response, _ = api("/api/admin/tickets/999999/update", method="POST", data={"status": "closed"})
+    assert response.status_code == 404
+
+
+def test_send_message_stores_both_turns(app_module, db, api):
+    session = app_module.ChatSession()
+    db.add(session)
+    db.commit()
+
+    response, _ = api(f"/api/sessions/{session.id}/messages", method="POST", data={"content": "北门怎么走"})
+
+    assert response.status_code == 200, response.text
+    assert response.json()["role"] == "assistant"
+    db.expire_all()
+    roles = [m.role for m in db.query(app_module.Message).filter_by(session_id=session.id).order_by(app_module.Message.id)]
+    assert roles == ["user", "assistant"]
+    assert db.get(app_module.ChatSession, session.id).title == "北门怎么走"
+
+    response, _ = api("/api/sessions/999999/messages", method="POST", data={"content": "x"})
+    assert response.status_code == 404
+
+
+def _user(app_module, db, name):
+    user = app_module.User(username=name, phone=f"p-{name}", password_hash="x", role="public")
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_detail_endpoints_and_data_label(app_module, db, api):
+    user = _user(app_module, db, "detail-owner")
+    report = app_module.Report(user_id=user.id, event_type="违章停车", location="北门", description="d")
+    db.add(report)
+    db.flush()
+    image = app_module.ReportImage(report_id=report.id, image_url="/uploads/detail.jpg", image_order=0)
+    ticket = app_module.Ticket(report_id=report.id, ticket_no=f"D{report.id}", status="pending")
+    db.add_all([image, ticket])
+    db.commit()
+
+    response, _ = api(f"/api/admin/tickets/{ticket.id}")
+    assert response.status_code == 200, response.text
+    assert response.json()["images"] == ["/uploads/detail.jpg"]
+    response, _ = api(f"/api/admin/reports/{report.id}")
+    assert response.status_code == 200, response.text
+    assert response.json()["username"] == "detail-owner"
+    response, _ = api("/api/admin/users", {"keyword": "detail-owner"})
+    assert [u["id"] for u in response.json()] == [user.id]
+
+    response, _ = api(f"/api/admin/data/{image.id}/label", method="POST", data={"label": "占道经营"})
+    assert response.status_code == 200, response.text
+    db.expire_all()
+    assert db.get(app_module.Report, report.id).event_type == "占道经营"
+
+    for path in ("/api/admin/tickets/999999", "/api/admin/reports/999999"):
+        assert api(path)[0].status_code == 404
+    assert api("/api/admin/data/999999/label", method="POST", data={"label": "x"})[0].status_code == 404
+
+
+def test_register_checks_duplicates_before_hashing(app_module, db, api, monkeypatch):
+    _user(app_module, db, "taken")
+    hashed = []
+
+    async def fake_hash(password):
+        hashed.append(password)
+        return "x"
+
+    monkeypatch.setattr(app_module, "get_password_hash_async", fake_hash)
+    response, _ = api("/api/auth/register", method="POST",
+                      data={"username": "taken", "phone": "13900000009", "password": "secret"})
+    assert response.status_code == 400
+    assert hashed == []
+
+    response, _ = api("/api/auth/register", method="POST",
+                      data={"username": "fresh", "phone": "13900000009", "password": "secret"})
+    assert response.status_code == 200, response.text
+    assert hashed == ["secret"]
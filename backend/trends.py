@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+趋势分析：按小时 / 按天预聚合的举报与工单计数（trend_buckets），随写入在同一事务内增量维护。
+
+维度（按记录创建时间落桶，维度取当前值；状态、类型等变化时从原维度值迁移到新值）：
+    reports  event_type / status / location
+    tickets  event_type / status / department / location
+
+小时桶默认保留 TREND_HOURLY_RETENTION_DAYS 天，可定期执行 prune 清理；增量维护同样跳过保留期外的小时桶，
+不会重建已清理的桶。上线或批量导入后执行 rebuild 由明细回填。
+
+位置为自由文本，合并空白后作为维度值，取值数以 TREND_LOCATION_LIMIT 为上限：集合未满时新位置直接加入，
+已满后新位置计入「其他」。rebuild 按明细总量取前 TREND_LOCATION_LIMIT 个位置；各进程在发现未知位置时
+至多每 TREND_LOCATION_CHECK_INTERVAL 秒从桶表重读一次集合，rebuild 后建议重启服务进程。
+
+执行方式：
+    cd backend
+    python trends.py rebuild              # 由 reports / tickets 全量重建
+    python trends.py prune                # 删除超出保留期的小时桶
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from stats_rollup import increment
+
+GRANULARITIES = ("hour", "day")
+DIMENSIONS = {
+    "reports": ("event_type", "status", "location"),
+    "tickets": ("event_type", "status", "department", "location"),
+}
+# 维度 -> 模型属性名
+_ATTRS = {"event_type": "event_type", "status": "status", "department": "assigned_department", "location": "location"}
+_EMPTY = {"event_type": "未分类", "status": "unknown", "department": "未指派部门", "location": "未填写位置"}
+
+HOURLY_RETENTION_DAYS = int(os.getenv("TREND_HOURLY_RETENTION_DAYS", "90"))
+# 自动选择粒度：跨度不超过该小时数时按小时，否则按天
+AUTO_HOURLY_MAX_HOURS = int(os.getenv("TREND_AUTO_HOURLY_MAX_HOURS", "72"))
+MAX_POINTS = 5000
+LOCATION_LIMIT = int(os.getenv("TREND_LOCATION_LIMIT", "200"))
+LOCATION_CHECK_INTERVAL = float(os.getenv("TREND_LOCATION_CHECK_INTERVAL", "60"))
+OTHER = "其他"
+
+_models: Dict[str, Any] = {}
+
+# (granularity, metric, dimension, bucket_start, value) -> delta
+Deltas = Dict[Tuple[str, str, str, datetime, str], int]
+
+
+def install(session_cls: Type[Session], bucket_model, report_model, ticket_model) -> None:
+    """在 Session 类上注册 after_flush 钩子（同步与异步会话均生效）；由 app 在模型定义后调用。"""
+    _models.update(bucket=bucket_model, reports=report_model, tickets=ticket_model)
+    for metric, dims in DIMENSIONS.items():
+        model = _models[metric]
+        for dim in dims:
+            # 赋值时先加载旧值，维度迁移才能正确扣减
+            event.listen(getattr(model, _ATTRS[dim]), "set", _keep_history, active_history=True)
+    event.listen(session_cls, "after_flush", _after_flush)
+
+
+def _keep_history(target, value, oldvalue, initiator):
+    return value
+
+
+def bucket_start(value: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _dim_value(dim: str, raw: Any) -> str:
+    text = " ".join(str(raw or "").split())[:100]
+    return text or _EMPTY[dim]
+
+
+class _Locations:
+    """位置维度已占用的取值集合（进程内缓存，首次使用时由桶表加载）。"""
+
+    def __init__(self) -> None:
+        self.values: Optional[set] = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def _load(self, conn) -> None:
+        B = _models["bucket"].__table__
+        rows = conn.execute(
+            select(B.c.value).where(B.c.dimension == "location", B.c.value != OTHER).distinct()
+        )
+        self.values = {r[0] for r in rows}
+        self.checked_at = time.monotonic()
+
+    def reset(self, values) -> None:
+        with self.lock:
+            self.values = set(values)
+            self.checked_at = time.monotonic()
+
+    def resolve(self, conn, value: str) -> str:
+        with self.lock:
+            if self.values is None:
+                self._load(conn)
+            if value in self.values:
+                return value
+            if len(self.values) >= LOCATION_LIMIT and time.monotonic() - self.checked_at >= LOCATION_CHECK_INTERVAL:
+                self._load(conn)
+                if value in self.values:
+                    return value
+            if len(self.values) < LOCATION_LIMIT:
+                self.values.add(value)
+                return value
+            return OTHER
+
+
+_locations = _Locations()
+
+
+def _bucket_value(conn, dim: str, raw: Any) -> str:
+    value = _dim_value(dim, raw)
+    return _locations.resolve(conn, value) if dim == "location" else value
+
+
+def _add(deltas: Deltas, metric: str, created_at: Optional[datetime], dim: str, value: str, sign: int) -> None:
+    created = created_at or datetime.utcnow()
+    for g in GRANULARITIES:
+        deltas[(g, metric, dim, bucket_start(created, g), value)] += sign
+
+
+def _retained(deltas: Deltas) -> Deltas:
+    """去掉零增量与保留期外的小时桶（prune 已清理的桶不再重建）。"""
+    cutoff = bucket_start(datetime.utcnow() - timedelta(days=HOURLY_RETENTION_DAYS), "hour")
+    return {k: v for k, v in deltas.items() if v and not (k[0] == "hour" and k[3] < cutoff)}
+
+
+def _collect(session: Session) -> Deltas:
+    conn = session.connection()
+    deltas: Deltas = defaultdict(int)
+    for metric, dims in DIMENSIONS.items():
+        model = _models[metric]
+        for objs, sign in ((session.new, 1), (session.deleted, -1)):
+            for obj in objs:
+                if isinstance(obj, model):
+                    for dim in dims:
+                        value = _bucket_value(conn, dim, getattr(obj, _ATTRS[dim]))
+                        _add(deltas, metric, obj.created_at, dim, value, sign)
+        for obj in session.dirty:
+            if not isinstance(obj, model):
+                continue
+            attrs = inspect(obj).attrs
+            for dim in dims:
+                hist = attrs[_ATTRS[dim]].history
+                if not hist.has_changes():
+                    continue
+                old = _bucket_value(conn, dim, hist.deleted[0] if hist.deleted else None)
+                new = _bucket_value(conn, dim, hist.added[0] if hist.added else None)
+                if old != new:
+                    _add(deltas, metric, obj.created_at, dim, old, -1)
+                    _add(deltas, metric, obj.created_at, dim, new, 1)
+    return _retained(deltas)
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    deltas = _collect(session)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def apply_deltas(conn, deltas: Deltas) -> None:
+    rows = [
+        {"granularity": g, "metric": m, "dimension": d, "bucket_start": b, "value": v, "count": n}
+        for (g, m, d, b, v), n in sorted(deltas.items())
+    ]
+    increment(
+        conn,
+        _models["bucket"].__table__,
+        ("granularity", "metric", "dimension", "bucket_start", "value"),
+        rows,
+        value_col="count",
+    )
+
+
+def pick_granularity(start: datetime, end: datetime, granularity: str = "auto") -> str:
+    if granularity in GRANULARITIES:
+        return granularity
+    if granularity != "auto":
+        raise ValueError(f"bucket 取值应为 auto, {', '.join(GRANULARITIES)}")
+    return "hour" if end - start <= timedelta(hours=AUTO_HOURLY_MAX_HOURS) else "day"
+
+
+def query_series(
+    db: Session,
+    metric: str,
+    dimension: str,
+    start: datetime,
+    end: datetime,
+    granularity: str = "auto",
+    top: int = 10,
+) -> Dict[str, Any]:
+    """区间查询（左闭右开），返回列式结构：timestamps 与各维度值的等长计数数组（空桶补 0）。
+
+    start / end 为 naive UTC（与桶的 bucket_start 一致），带时区的值由调用方先换算。
+
+    维度值按区间总量取前 top 个，其余合并为「其他」。
+    """
+    if metric not in DIMENSIONS:
+        raise ValueError(f"metric 取值应为 {', '.join(DIMENSIONS)}")
+    if dimension not in DIMENSIONS[metric]:
+        raise ValueError(f"{metric} 的 dimension 取值应为 {', '.join(DIMENSIONS[metric])}")
+    if start.tzinfo is not None or end.tzinfo is not None:
+        raise ValueError("start / end 需为 naive UTC 时间")
+    if end <= start:
+        raise ValueError("end 需晚于 start")
+    g = pick_granularity(start, end, granularity)
+    step = timedelta(hours=1) if g == "hour" else timedelta(days=1)
+    if (end - bucket_start(start, g)) / step > MAX_POINTS:
+        raise ValueError(f"区间过长：按{'小时' if g == 'hour' else '天'}最多 {MAX_POINTS} 个桶")
+
+    B = _models["bucket"]
+    rows = (
+        db.query(B.bucket_start, B.value, B.count)
+        .filter(
+            B.granularity == g,
+            B.metric == metric,
+            B.dimension == dimension,
+            B.bucket_start >= bucket_start(start, g),
+            B.bucket_start < end,
+        )
+        .all()
+    )
+
+    timestamps: List[datetime] = []
+    cursor = bucket_start(start, g)
+    while cursor < end:
+        timestamps.append(cursor)
+        cursor += step
+    index = {ts: i for i, ts in enumerate(timestamps)}
+
+    totals: Dict[str, int] = defaultdict(int)
+    for _, value, count in rows:
+        totals[value] += int(count)
+    ranked = sorted((v for v, n in totals.items() if n), key=lambda v: (-totals[v], v))
+    keep = set(ranked[:top])
+
+    series: Dict[str, List[int]] = {v: [0] * len(timestamps) for v in ranked[:top]}
+    if len(ranked) > top:
+        series["其他"] = [0] * len(timestamps)
+    for ts, value, count in rows:
+        i = index.get(ts)
+        if i is None or not count:
+            continue
+        series[value if value in keep else "其他"][i] += int(count)
+
+    return {
+        "metric": metric,
+        "dimension": dimension,
+        "bucket": g,
+        "start": timestamps[0].isoformat() if timestamps else None,
+        "end": end.isoformat(),
+        "timestamps": [ts.isoformat() for ts in timestamps],
+        "series": series,
+        "totals": {v: sum(counts) for v, counts in series.items()},
+    }
+
+
+def rebuild(db: Session, batch_size: int = 1000) -> int:
+    """由明细表全量重建（流式读取，按批累加），返回写入的桶数。"""
+    B = _models["bucket"]
+    # 先按明细总量选定位置集合（前 LOCATION_LIMIT 个），其余位置计入「其他」
+    totals: Dict[str, int] = defaultdict(int)
+    for metric in DIMENSIONS:
+        model = _models[metric]
+        for raw, n in db.query(model.location, func.count()).group_by(model.location):
+            totals[_dim_value("location", raw)] += n
+    _locations.reset(sorted(totals, key=lambda v: (-totals[v], v))[:LOCATION_LIMIT])
+
+    conn = db.connection()
+    deltas: Deltas = defaultdict(int)
+    for metric, dims in DIMENSIONS.items():
+        model = _models[metric]
+        cols = [model.created_at] + [getattr(model, _ATTRS[d]) for d in dims]
+        for row in db.query(*cols).yield_per(batch_size):
+            for dim, raw in zip(dims, row[1:]):
+                _add(deltas, metric, row[0], dim, _bucket_value(conn, dim, raw), 1)
+
+    deltas = _retained(deltas)
+    db.query(B).delete(synchronize_session=False)
+    items = sorted(deltas.items())
+    for i in range(0, len(items), batch_size):
+        apply_deltas(db.connection(), dict(items[i:i + batch_size]))
+    db.commit()
+    return len(deltas)
+
+
+def prune(db: Session, days: Optional[int] = None) -> int:
+    """删除超出保留期的小时桶（天桶长期保留），返回删除行数。"""
+    B = _models["bucket"]
+    cutoff = datetime.utcnow() - timedelta(days=days if days is not None else HOURLY_RETENTION_DAYS)
+    removed = (
+        db.query(B)
+        .filter(B.granularity == "hour", B.bucket_start < bucket_start(cutoff, "hour"))
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return removed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="趋势预聚合桶：重建与清理")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_rebuild = sub.add_parser("rebuild", help="由 reports / tickets 明细全量重建")
+    p_rebuild.add_argument("--batch-size", type=int, default=1000)
+    p_prune = sub.add_parser("prune", help="删除超出保留期的小时桶")
+    p_prune.add_argument("--days", type=int, default=None, help=f"保留天数，默认 {HOURLY_RETENTION_DAYS}")
+    args = parser.parse_args()
+
+    from app import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            print(f"已重建 {rebuild(db, batch_size=args.batch_size)} 个趋势桶")
+        else:
+            print(f"已删除 {prune(db, days=args.days)} 个小时桶")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -254,6 +254,34 @@ export const getStatistics = async (): Promise<any> => {
   return response.data
 }
 
+// 全文检索：返回 { total, items: [{ type, id, score, snippet(含 <mark>), matched_in, ... }] }
+export const searchRecords = async (params: {
+  q: string
+  scope?: 'reports' | 'tickets'
+  status?: string
+  event_type?: string
+  date_from?: string
+  date_to?: string
+  page?: number
+  page_size?: number
+}): Promise<any> => {
+  const response = await api.get('/admin/search', { params })
+  return response.data
+}
+
+// 趋势数据：列式返回 { bucket, timestamps: string[], series: { 维度值: number[] }, totals }
+export const getTrends = async (params: {
+  metric?: 'reports' | 'tickets'
+  dimension?: 'event_type' | 'status' | 'department' | 'location'
+  start?: string
+  end?: string
+  bucket?: 'auto' | 'hour' | 'day'
+  top?: number
+} = {}): Promise<any> => {
+  const response = await api.get('/admin/trends', { params })
+  return response.data
+}
+
 // ==================== 新增API：举报列表（支持分页和筛选） ====================
 
 export const getReports = async (status?: string, page: number = 1, pageSize: number = 10): Promise<any> => {
@@ -311,8 +339,10 @@ export const updateUserRole = async (userId: number, role: string) => {
   return response.data
 }
 
-export const getDepartments = async (eventType?: string) => {
-  const params = eventType ? { event_type: eventType } : {}
+export const getDepartments = async (eventType?: string, location?: string) => {
+  const params: Record<string, string> = {}
+  if (eventType) params.event_type = eventType
+  if (location) params.location = location
   // 不用带默认 Content-Type: application/json 的 api 实例，避免个别环境下 GET 异常
   const token = localStorage.getItem('token')
   const response = await axios.get('/api/admin/departments', {
@@ -333,10 +363,68 @@ export const getDepartments = async (eventType?: string) => {
       unit_code: string
       department_name: string
       unit_name: string
+      rule_id?: number | null
     }
   }
 }
 
+export interface DispatchRule {
+  id: number
+  event_type: string | null
+  match_mode: 'exact' | 'contains'
+  location_pattern: string | null
+  start_minute: number | null
+  end_minute: number | null
+  weekdays: string | null
+  department_code: string
+  unit_code: string
+  priority: number
+  enabled: boolean
+  updated_at: string | null
+}
+
+export const getDispatchRules = async () => {
+  const response = await api.get('/admin/dispatch-rules')
+  return response.data as { items: DispatchRule[]; version: number }
+}
+
+export const saveDispatchRule = async (rule: Partial<DispatchRule> & { department_code: string; unit_code: string }) => {
+  const fd = new FormData()
+  Object.entries(rule).forEach(([key, value]) => {
+    if (key === 'id') {
+      if (value) fd.append('rule_id', String(value))
+    } else if (value !== null && value !== undefined && key !== 'updated_at') {
+      fd.append(key, String(value))
+    }
+  })
+  const token = localStorage.getItem('token')
+  const response = await axios.post('/api/admin/dispatch-rules', fd, {
+    headers: token ? { Authorization: `Bearer ${token}` } : {},
+  })
+  return response.data as DispatchRule
+}
+
+export const deleteDispatchRule = async (ruleId: number) => {
+  const response = await api.delete(`/admin/dispatch-rules/${ruleId}`)
+  return response.data
+}
+
+export const autoAssignTickets = async (limit = 500, dryRun = false) => {
+  const fd = new FormData()
+  fd.append('limit', String(limit))
+  fd.append('dry_run', String(dryRun))
+  const token = localStorage.getItem('token')
+  const response = await axios.post('/api/admin/tickets/auto-assign', fd, {
+    headers: token ? { Authorization: `Bearer ${token}` } : {},
+  })
+  return response.data as {
+    scanned: number
+    assigned: number
+    dry_run: boolean
+    items: Array<{ ticket_id: number; department_code: string; unit_code: string; department_name: string; unit_name: string; rule_id: number | null }>
+  }
+}
+
 export const getCompletedTicketsAnalytics = async () => {
   const response = await api.get('/admin/analytics/completed-tickets')
   return response.data as {
@@ -352,9 +440,20 @@ export const getCompletedTicketsAnalytics = async () => {
 
 // ==================== 新增API：数据管理 ====================
 
-export const getDataItems = async (eventType?: string): Promise<any[]> => {
-  const url = eventType ? `/admin/data?event_type=${eventType}` : '/admin/data'
-  const response = await api.get(url)
+// 数据项按游标分页：首页不传 cursor，下一页传上次返回的 next_cursor
+export const getDataItems = async (eventType?: string, cursor?: string | null): Promise<{
+  items: any[]
+  next_cursor: string | null
+  has_more: boolean
+}> => {
+  const params: any = {}
+  if (eventType) {
+    params.event_type = eventType
+  }
+  if (cursor) {
+    params.cursor = cursor
+  }
+  const response = await api.get('/admin/data', { params })
   return response.data
 }
 
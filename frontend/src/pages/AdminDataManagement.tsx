@@ -15,6 +15,7 @@ interface DataItem {
   id: number
   report_id?: number
   image_url: string
+  thumbnail_url?: string
   event_type?: string
   label?: string
   confidence?: number
@@ -63,6 +64,8 @@ const parseStructuredData = (value: DataItem['model_structured_data']) => {
 const AdminDataManagement: React.FC = () => {
   const [dataItems, setDataItems] = useState<DataItem[]>([])
   const [loading, setLoading] = useState(true)
+  const [loadingMore, setLoadingMore] = useState(false)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
   const [filterType, setFilterType] = useState('')
   const [selectedItem, setSelectedItem] = useState<DataItem | null>(null)
 
@@ -80,15 +83,31 @@ const AdminDataManagement: React.FC = () => {
     try {
       setLoading(true)
       const data = await getDataItems(filterType || undefined)
-      setDataItems(data)
+      setDataItems(data.items)
+      setNextCursor(data.next_cursor)
     } catch (error) {
       console.error('加载数据失败:', error)
       setDataItems([])
+      setNextCursor(null)
     } finally {
       setLoading(false)
     }
   }
 
+  const loadMoreDataItems = async () => {
+    if (!nextCursor || loadingMore) return
+    try {
+      setLoadingMore(true)
+      const data = await getDataItems(filterType || undefined, nextCursor)
+      setDataItems((items) => [...items, ...data.items])
+      setNextCursor(data.next_cursor)
+    } catch (error) {
+      console.error('加载更多数据失败:', error)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const selectedStructured = useMemo(
     () => parseStructuredData(selectedItem?.model_structured_data),
     [selectedItem]
@@ -146,7 +165,7 @@ const AdminDataManagement: React.FC = () => {
                   className={`result-row ${selectedItem?.id === item.id ? 'active' : ''}`}
                   onClick={() => setSelectedItem(item)}
                 >
-                  <img src={uploadPublicUrl(item.image_url)} alt={`识别图片${item.id}`} />
+                  <img src={uploadPublicUrl(item.thumbnail_url || item.image_url)} alt={`识别图片${item.id}`} loading="lazy" />
                   <span className="result-main">
                     <span className="result-title">
                       {item.model_event_type || item.event_type || '未识别'}
@@ -162,6 +181,16 @@ const AdminDataManagement: React.FC = () => {
                 </button>
               ))
             )}
+            {nextCursor && (
+              <button
+                type="button"
+                className="load-more"
+                onClick={loadMoreDataItems}
+                disabled={loadingMore}
+              >
+                {loadingMore ? '加载中...' : '加载更多'}
+              </button>
+            )}
           </section>
 
           <aside className="model-result-detail">
@@ -13,6 +13,7 @@ interface ReviewItem {
   description?: string
   status: string
   images: string[]
+  thumbnails?: string[]
   recognition_results?: Array<{
     question: string
     answer: string
@@ -301,12 +302,13 @@ const AdminReview: React.FC = () => {
                   <h3>上报图片</h3>
                   <div className="image-grid">
                     {selectedReport.images.map((img, idx) => (
-                      <img
-                        key={idx}
-                        src={getImageUrl(img)}
-                        alt={`图片${idx + 1}`}
-                        className="review-image"
-                      />
+                      <a key={idx} href={getImageUrl(img)} target="_blank" rel="noreferrer">
+                        <img
+                          src={getImageUrl(selectedReport.thumbnails?.[idx] || img)}
+                          alt={`图片${idx + 1}`}
+                          className="review-image"
+                        />
+                      </a>
                     ))}
                   </div>
                 </div>
@@ -49,6 +49,7 @@ export interface Ticket {
   department_code?: string | null
   unit_code?: string | null
   images: string[]
+  thumbnails?: string[]
   created_at: string
   updated_at: string
 }